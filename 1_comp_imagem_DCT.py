@@ -1,19 +1,177 @@
 import numpy as np
 import cv2
 import os
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
 import matplotlib.pyplot as plt
 from skimage.metrics import peak_signal_noise_ratio as psnr
 from skimage.metrics import structural_similarity as ssim
 
+import dct_bitstream
+from cache_resultados import ResultCache
+from imagem_io import create_image_memmap, iter_strips, open_image_memmap
 
-def print_stats(image, title, original_size=None):
+
+class StreamingStats:
+    """
+    Estatísticas de pixels acumuladas em uma única passagem, pedaço a pedaço
+
+    Para imagens uint8 basta um np.bincount por pedaço: mínimo, máximo, média,
+    variância, mediana exata e qualquer histograma saem das 256 contagens.
+    Para outros tipos são combinados contagem, média e soma dos quadrados dos
+    desvios de cada pedaço (Chan et al.) e um histograma cuja faixa começa na do
+    primeiro pedaço e dobra (juntando classes vizinhas) quando chega um valor
+    fora dela; a mediana e o histograma acompanham assim a faixa real dos dados,
+    seja a imagem em [0, 255], [0, 1] ou outra. A faixa e o histograma são
+    calculados em float64, inclusive a partir de pedaços constantes em float32.
+
+    >>> stats = StreamingStats()
+    >>> stats.update(np.full((4, 4), 0.7, dtype=np.float32))
+    >>> stats.update(np.float32([200.5]))
+    >>> result = stats.result()
+    >>> abs(result['median'] - 0.7) < 0.1, int(result['histogram'][0].sum())
+    (True, 17)
+    """
+
+    def __init__(self, value_range=None, histogram_bins=4096):
+        """
+        :param value_range: faixa fixa do histograma usado para dados não uint8
+                            (valores fora dela não entram no histograma);
+                            None ajusta a faixa aos dados
+        :param histogram_bins: número de classes desse histograma (par)
+        """
+        if histogram_bins < 2 or histogram_bins % 2:
+            raise ValueError(f"histogram_bins deve ser par, recebido {histogram_bins}")
+        self.value_range = value_range
+        self.fixed_range = value_range is not None
+        self.histogram_bins = histogram_bins
+        self.counts = None
+        self.is_uint8 = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def _cover(self, low, high):
+        """Dobra a faixa do histograma (juntando pares de classes) até conter [low, high]"""
+        if self.value_range is None:
+            self.value_range = (low, high) if high > low else (low, low + max(abs(low), 1.0) * 2.0 ** -20)
+            return
+        half = self.histogram_bins // 2
+        start, end = self.value_range
+        while low < start or high > end:
+            merged = self.counts.reshape(half, 2).sum(axis=1)
+            zeros = np.zeros(half, dtype=np.int64)
+            if low < start:
+                self.counts = np.concatenate([zeros, merged])
+                start -= end - start
+            else:
+                self.counts = np.concatenate([merged, zeros])
+                end += end - start
+        self.value_range = (start, end)
+
+    def update(self, chunk):
+        """Acrescenta um pedaço da imagem (qualquer formato) às estatísticas"""
+        chunk = np.asarray(chunk)
+        if chunk.size == 0:
+            return
+        if self.is_uint8 is None:
+            self.is_uint8 = chunk.dtype == np.uint8
+            self.counts = np.zeros(256 if self.is_uint8 else self.histogram_bins, dtype=np.int64)
+        if self.is_uint8 != (chunk.dtype == np.uint8):
+            raise TypeError("Todos os pedaços devem ter o mesmo tipo (uint8 ou não)")
+
+        if self.is_uint8:
+            self.counts += np.bincount(chunk.reshape(-1), minlength=256)
+            return
+
+        n = chunk.size
+        chunk_mean = float(np.mean(chunk, dtype=np.float64))
+        chunk_m2 = float(np.var(chunk, dtype=np.float64)) * n
+        delta = chunk_mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        chunk_min, chunk_max = float(np.min(chunk)), float(np.max(chunk))
+        self.minimum = min(self.minimum, chunk_min)
+        self.maximum = max(self.maximum, chunk_max)
+        if not self.fixed_range:
+            self._cover(chunk_min, chunk_max)
+        # Limites em float64: com float32 a faixa estreita de um pedaço constante colapsaria
+        self.counts += np.histogram(chunk, bins=self.histogram_bins, range=np.array(self.value_range, np.float64))[0]
+
+    def result(self, bins=5):
+        """
+        :param bins: número de classes do histograma resumido (entre mínimo e máximo)
+        :return: dicionário com count, min, max, mean, variance, std, median e histogram
+        """
+        if self.is_uint8 is None:
+            raise ValueError("Nenhum valor acumulado: chame update com dados antes de result")
+        if self.is_uint8:
+            values = np.arange(256)
+            present = np.nonzero(self.counts)[0]
+            count = int(self.counts.sum())
+            minimum, maximum = float(present[0]), float(present[-1])
+            mean = float(np.dot(values, self.counts) / count)
+            variance = float(np.dot((values - mean) ** 2, self.counts) / count)
+            weights = self.counts
+        else:
+            count, minimum, maximum = self.count, self.minimum, self.maximum
+            mean, variance = self.mean, self.m2 / count
+            edges = np.linspace(*self.value_range, self.histogram_bins + 1)
+            values = np.clip((edges[:-1] + edges[1:]) / 2, minimum, maximum)  # centro de cada classe
+            weights = self.counts
+
+        # Mediana: média dos dois valores centrais, como np.median (exata para uint8)
+        cumulative = np.cumsum(weights)
+        last = len(values) - 1  # com faixa fixa, valores fora dela não estão no histograma
+        lower = values[min(np.searchsorted(cumulative, (count - 1) // 2, side='right'), last)]
+        upper = values[min(np.searchsorted(cumulative, count // 2, side='right'), last)]
+
+        hist, bin_edges = np.histogram(values, bins=bins, range=(minimum, maximum), weights=weights)
+        return {
+            'count': count,
+            'min': minimum,
+            'max': maximum,
+            'mean': mean,
+            'variance': variance,
+            'std': float(np.sqrt(variance)),
+            'median': float((lower + upper) / 2),
+            'histogram': (hist.astype(np.int64), bin_edges),
+        }
+
+
+def image_statistics(image, chunk_rows=1024, bins=5):
+    """
+    Estatísticas da imagem calculadas em uma passagem, em faixas de linhas
+    :param image: array numpy (ou np.memmap) da imagem
+    :param chunk_rows: linhas processadas por vez
+    :param bins: número de classes do histograma resumido
+    :return: dicionário de StreamingStats.result
+    """
+    stats = StreamingStats()
+    for y in range(0, image.shape[0], chunk_rows):
+        stats.update(image[y:y + chunk_rows])
+    return stats.result(bins)
+
+
+def print_stats(image, title, original_size=None, stats=None):
     """
     Exibe estatísticas detalhadas da imagem no terminal
     :param image: imagem numpy array (pode ser original ou comprimida)
     :param title: título para identificar a imagem
     :param original_size: tamanho do arquivo original em KB (opcional)
+    :param stats: estatísticas já calculadas (image_statistics); calculadas aqui se ausentes
+    :return: as estatísticas exibidas
     """
+    if stats is None:
+        stats = image_statistics(image)
+
     # Cabeçalho com borda decorativa
     print(f"\n{'=' * 50}")
     print(f"{title.upper():^50}")
@@ -35,15 +193,15 @@ def print_stats(image, title, original_size=None):
 
     # Estatísticas de intensidade dos pixels
     print(f"\n{' DISTRIBUIÇÃO DE PIXELS ':-^50}")
-    print(f"| {'Mínimo:':<25} | {np.min(image):>18.4f} |")
-    print(f"| {'Máximo:':<25} | {np.max(image):>18.4f} |")
-    print(f"| {'Média:':<25} | {np.mean(image):>18.4f} |")
-    print(f"| {'Mediana:':<25} | {np.median(image):>18.4f} |")
-    print(f"| {'Desvio padrão:':<25} | {np.std(image):>18.4f} |")
+    print(f"| {'Mínimo:':<25} | {stats['min']:>18.4f} |")
+    print(f"| {'Máximo:':<25} | {stats['max']:>18.4f} |")
+    print(f"| {'Média:':<25} | {stats['mean']:>18.4f} |")
+    print(f"| {'Mediana:':<25} | {stats['median']:>18.4f} |")
+    print(f"| {'Desvio padrão:':<25} | {stats['std']:>18.4f} |")
 
     # Histograma simplificado no terminal
     if len(image.shape) == 2:  # Apenas para imagens em tons de cinza
-        hist, bins = np.histogram(image, bins=5)
+        hist, bins = stats['histogram']
         print(f"\n{' HISTOGRAMA (SIMPLIFICADO) ':-^50}")
         for i in range(len(hist)):
             bin_range = f"{bins[i]:.2f}-{bins[i + 1]:.2f}"
@@ -51,42 +209,90 @@ def print_stats(image, title, original_size=None):
             print(f"| {bin_range:<15} | {hist[i]:>8} pixels | {bar:<20} |")
 
     print(f"\n{'=' * 50}\n")
+    return stats
 
 
-def dct_compress(image_path, quality=50, block_size=8, show_stats=True):
+@lru_cache(maxsize=None)
+def dct_basis(block_size=8):
     """
-    Implementa compressão de imagem usando DCT similar ao JPEG
-    :param image_path: caminho para a imagem original
-    :param quality: qualidade da compressão (1-100)
-    :param block_size: tamanho do bloco para DCT (tipicamente 8)
-    :param show_stats: mostra estatísticas detalhadas no terminal
-    :return: imagem comprimida, razão de compressão, métricas de qualidade
+    Matriz da DCT-II ortonormal (a mesma convenção usada por cv2.dct),
+    calculada uma vez por tamanho de bloco
+    :param block_size: tamanho do bloco (N)
+    :return: matriz C (N x N), somente leitura, tal que DCT(B) = C @ B @ C.T
     """
-    start_time = time.time()
+    n = np.arange(block_size)
+    C = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * block_size))
+    C[0, :] *= np.sqrt(1 / block_size)
+    C[1:, :] *= np.sqrt(2 / block_size)
+    C.flags.writeable = False
+    return C
 
-    # 1. Carregar imagem
-    original_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if original_image is None:
-        raise FileNotFoundError(f"Imagem não encontrada em {image_path}")
 
-    original_size = os.path.getsize(image_path) / 1024  # Tamanho em KB
-    original_image = original_image.astype(np.float32)
-    height, width = original_image.shape
+# Tabelas de quantização padrão do JPEG (luminância e crominância)
+LUMINANCE_QUANTIZATION = np.array([
+    [16, 11, 10, 16, 24, 40, 51, 61],
+    [12, 12, 14, 19, 26, 58, 60, 55],
+    [14, 13, 16, 24, 40, 57, 69, 56],
+    [14, 17, 22, 29, 51, 87, 80, 62],
+    [18, 22, 37, 56, 68, 109, 103, 77],
+    [24, 35, 55, 64, 81, 104, 113, 92],
+    [49, 64, 78, 87, 103, 121, 120, 101],
+    [72, 92, 95, 98, 112, 100, 103, 99]
+], dtype=np.float32)
 
-    if show_stats:
-        print_stats(original_image, "Imagem Original", original_size)
+CHROMINANCE_QUANTIZATION = np.array([
+    [17, 18, 24, 47, 99, 99, 99, 99],
+    [18, 21, 26, 66, 99, 99, 99, 99],
+    [24, 26, 56, 99, 99, 99, 99, 99],
+    [47, 66, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99]
+], dtype=np.float32)
 
-    # 2. Definir matriz de quantização (standard JPEG luminance quantization table)
-    Q = np.array([
-        [16, 11, 10, 16, 24, 40, 51, 61],
-        [12, 12, 14, 19, 26, 58, 60, 55],
-        [14, 13, 16, 24, 40, 57, 69, 56],
-        [14, 17, 22, 29, 51, 87, 80, 62],
-        [18, 22, 37, 56, 68, 109, 103, 77],
-        [24, 35, 55, 64, 81, 104, 113, 92],
-        [49, 64, 78, 87, 103, 121, 120, 101],
-        [72, 92, 95, 98, 112, 100, 103, 99]
-    ], dtype=np.float32)
+# Fatores de subamostragem da crominância: (horizontal, vertical)
+CHROMA_SUBSAMPLING = {
+    '4:4:4': (1, 1),
+    '4:2:2': (2, 1),
+    '4:2:0': (2, 2),
+}
+
+
+@lru_cache(maxsize=None)
+def base_quantization_table(block_size=8, chroma=False):
+    """
+    Tabela padrão do JPEG adaptada para blocos N x N
+
+    A frequência u de um bloco N x N corresponde à frequência u * 8 / N do
+    bloco 8 x 8, então a tabela é interpolada (bilinear) nessas posições.
+    Blocos maiores que 8 repetem a última linha/coluna nas frequências mais altas.
+    :param block_size: tamanho do bloco (N)
+    :param chroma: usa a tabela de crominância em vez da de luminância
+    :return: tabela N x N (float32, somente leitura)
+    """
+    table = CHROMINANCE_QUANTIZATION if chroma else LUMINANCE_QUANTIZATION
+    if block_size != 8:
+        positions = np.arange(block_size) * 8 / block_size
+        grid = np.arange(8)
+        table = np.array([np.interp(positions, grid, row) for row in table])  # colunas
+        table = np.array([np.interp(positions, grid, col) for col in table.T]).T  # linhas
+        table = table.astype(np.float32)
+    else:
+        table = table.copy()
+    table.flags.writeable = False
+    return table
+
+
+def quantization_matrix(quality, chroma=False, block_size=8):
+    """
+    Tabela de quantização do JPEG escalada pela qualidade
+    :param quality: qualidade da compressão (1-100)
+    :param chroma: usa a tabela de crominância em vez da de luminância
+    :param block_size: tamanho do bloco (ver base_quantization_table)
+    :return: qualidade ajustada ao intervalo válido e a matriz Q
+    """
+    Q = base_quantization_table(block_size, chroma)
 
     # Ajustar qualidade (1-100)
     if quality < 1:
@@ -101,41 +307,402 @@ def dct_compress(image_path, quality=50, block_size=8, show_stats=True):
 
     Q = np.floor((Q * scaling_factor + 50) / 100)
     Q[Q < 1] = 1
+    return quality, Q
+
+
+def bgr_to_ycbcr(image):
+    """
+    Converte uma imagem BGR (ordem do OpenCV) para YCbCr (JFIF, faixa completa)
+    :return: array float32 (H, W, 3) com os planos Y, Cb e Cr
+    """
+    b, g, r = [image[..., i].astype(np.float32) for i in range(3)]
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = 128 - 0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 128 + 0.5 * r - 0.418688 * g - 0.081312 * b
+    return np.stack([y, cb, cr], axis=-1)
+
+
+def ycbcr_to_bgr(image):
+    """Operação inversa de bgr_to_ycbcr (resultado float32, sem arredondamento)"""
+    y, cb, cr = image[..., 0], image[..., 1] - 128, image[..., 2] - 128
+    r = y + 1.402 * cr
+    g = y - 0.344136 * cb - 0.714136 * cr
+    b = y + 1.772 * cb
+    return np.stack([b, g, r], axis=-1).astype(np.float32)
+
+
+def subsample(plane, factors):
+    """
+    Reduz um plano de crominância pela média de cada grupo de pixels
+    :param plane: plano (H, W)
+    :param factors: fatores (horizontal, vertical), por exemplo (2, 2) no 4:2:0
+    :return: plano (ceil(H / vertical), ceil(W / horizontal))
+    """
+    h_factor, v_factor = factors
+    if (h_factor, v_factor) == (1, 1):
+        return plane
+    height, width = plane.shape
+    pad_y, pad_x = -height % v_factor, -width % h_factor
+    padded = np.pad(plane, ((0, pad_y), (0, pad_x)), mode='edge')
+    rows, cols = padded.shape[0] // v_factor, padded.shape[1] // h_factor
+    return padded.reshape(rows, v_factor, cols, h_factor).mean(axis=(1, 3), dtype=np.float32)
+
+
+def pad_to_blocks(plane, block_size=8):
+    """Completa o plano repetindo a última linha/coluna até um múltiplo do tamanho do bloco"""
+    pad_y, pad_x = -plane.shape[0] % block_size, -plane.shape[1] % block_size
+    if pad_y == 0 and pad_x == 0:
+        return plane
+    return np.pad(plane, ((0, pad_y), (0, pad_x)), mode='edge')
 
-    # 3. Processar a imagem em blocos
-    compressed_image = np.zeros_like(original_image)
+
+def upsample(plane, shape):
+    """Amplia um plano subamostrado de volta para shape (H, W) com interpolação linear"""
+    if plane.shape == tuple(shape):
+        return plane
+    return cv2.resize(plane, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR)
+
+
+def image_to_blocks(image, block_size=8):
+    """
+    Reorganiza a imagem em um tensor de blocos (H/N, W/N, N, N) sem copiar
+    os pixels. Linhas e colunas que não completam um bloco são descartadas.
+    """
+    rows, cols = image.shape[0] // block_size, image.shape[1] // block_size
+    cropped = image[:rows * block_size, :cols * block_size]
+    return cropped.reshape(rows, block_size, cols, block_size).swapaxes(1, 2)
+
+
+def blocks_to_image(blocks):
+    """Operação inversa de image_to_blocks: (H/N, W/N, N, N) -> (H, W)"""
+    rows, cols, block_size, _ = blocks.shape
+    return blocks.swapaxes(1, 2).reshape(rows * block_size, cols * block_size)
+
+
+def forward_dct_blocks(image, block_size=8):
+    """
+    DCT de todos os blocos de uma vez, como produtos com a matriz base
+    :param image: imagem float (H, W) com pixels em [0, 255]
+    :return: coeficientes DCT no formato (H/N, W/N, N, N)
+    """
+    C = dct_basis(block_size)
+    blocks = image_to_blocks(image, block_size).astype(np.float64) - 128
+    # O produto é feito em float64 e arredondado para float32, como no cv2.dct
+    return (C @ blocks @ C.T).astype(np.float32)
+
+
+def inverse_dct_blocks(coefficients):
+    """
+    IDCT de todos os blocos de uma vez (inversa de forward_dct_blocks)
+    :return: blocos reconstruídos em [0, 255] no formato (H/N, W/N, N, N)
+    """
+    C = dct_basis(coefficients.shape[-1])
+    return (C.T @ coefficients.astype(np.float64) @ C).astype(np.float32) + 128
+
+
+def quantize(coefficients, Q):
+    """Quantiza os coeficientes DCT pela matriz Q (inteiros com sinal)"""
+    return np.round(coefficients / Q).astype(np.int32)
+
+
+def dequantize(quantized, Q):
+    """Reconstrói os coeficientes DCT a partir dos valores quantizados"""
+    return quantized * Q.astype(np.float32)
+
+
+def dct_blocks_vectorized(image, Q, block_size=8):
+    """
+    Compressão/reconstrução de todos os blocos com operações vetorizadas
+    :param image: imagem float32 (H, W)
+    :param Q: matriz de quantização (N x N)
+    :return: imagem reconstruída (float32), blocos incompletos das bordas ficam em zero
+    """
+    quantized = quantize(forward_dct_blocks(image, block_size), Q)
+    return reconstruct_image(quantized, Q, image.shape)
+
+
+def reconstruct_image(quantized, Q, shape):
+    """
+    Reconstrói a imagem a partir dos coeficientes quantizados
+    :param quantized: coeficientes quantizados (H/N, W/N, N, N)
+    :param Q: matriz de quantização (N x N)
+    :param shape: dimensões (H, W) da imagem original
+    :return: imagem reconstruída (float32), blocos incompletos das bordas ficam em zero
+    """
+    compressed_image = np.zeros(shape, dtype=np.float32)
+    reconstructed = blocks_to_image(inverse_dct_blocks(dequantize(quantized, Q)))[:shape[0], :shape[1]]
+    compressed_image[:reconstructed.shape[0], :reconstructed.shape[1]] = reconstructed
+    return compressed_image
+
+
+def _dct_stripe(image, quantized_out, compressed_out, Q, block_size, first_row, last_row):
+    """Processa as linhas de blocos [first_row, last_row) gravando nos buffers de saída"""
+    strip = image[first_row * block_size:last_row * block_size]
+    quantized = quantize(forward_dct_blocks(strip, block_size), Q)
+    quantized_out[first_row:last_row] = quantized
+    reconstructed = blocks_to_image(inverse_dct_blocks(dequantize(quantized, Q)))
+    compressed_out[first_row * block_size:last_row * block_size, :reconstructed.shape[1]] = reconstructed
+
+
+def _dct_stripe_worker(buffers, Q, block_size, first_row, last_row):
+    """Executado em outro processo: acessa os buffers pelo nome da memória compartilhada"""
+    attached = [shared_memory.SharedMemory(name=name) for name, _, _ in buffers]
+    try:
+        image, quantized_out, compressed_out = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for shm, (_, shape, dtype) in zip(attached, buffers)
+        ]
+        _dct_stripe(image, quantized_out, compressed_out, Q, block_size, first_row, last_row)
+        del image, quantized_out, compressed_out
+    finally:
+        for shm in attached:
+            shm.close()
+
+
+def dct_blocks_parallel(image, Q, block_size=8, workers=None, backend='process'):
+    """
+    Compressão/reconstrução vetorizada dividida em faixas de linhas de blocos
+    processadas em paralelo
+    :param image: imagem float32 (H, W)
+    :param Q: matriz de quantização (N x N)
+    :param workers: número de processos/threads (padrão: número de CPUs)
+    :param backend: 'process' (memória compartilhada entre processos) ou 'thread'
+    :return: imagem reconstruída (float32) e coeficientes quantizados (H/N, W/N, N, N)
+    """
+    workers = workers or os.cpu_count()
+    height, width = image.shape
+    block_rows, block_cols = height // block_size, width // block_size
+    quantized_shape = (block_rows, block_cols, block_size, block_size)
+
+    # Divide as linhas de blocos em faixas contíguas, algumas por worker
+    n_stripes = min(block_rows, workers * 4) or 1
+    bounds = np.linspace(0, block_rows, n_stripes + 1).astype(int)
+    stripes = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    if backend == 'thread':
+        # numpy libera o GIL nos produtos de matrizes: as threads escrevem direto nos arrays
+        quantized = np.empty(quantized_shape, dtype=np.int32)
+        compressed_image = np.zeros_like(image, dtype=np.float32)
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(_dct_stripe, image, quantized, compressed_image, Q, block_size, a, b)
+                       for a, b in stripes]
+            for future in futures:
+                future.result()
+        return compressed_image, quantized
+
+    if backend != 'process':
+        raise ValueError(f"Backend desconhecido: {backend!r} (use 'process' ou 'thread')")
+
+    # Entrada e saídas em memória compartilhada: nenhum array é serializado
+    specs = [((height, width), np.float32), (quantized_shape, np.int32), ((height, width), np.float32)]
+    segments = [shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+                for shape, dtype in specs]
+    try:
+        shared_image, shared_quantized, shared_compressed = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf) for shm, (shape, dtype) in zip(segments, specs)
+        ]
+        shared_image[:] = image
+        shared_compressed[:] = 0
+        buffers = [(shm.name, shape, np.dtype(dtype).str) for shm, (shape, dtype) in zip(segments, specs)]
+
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_dct_stripe_worker, buffers, Q, block_size, a, b) for a, b in stripes]
+            for future in futures:
+                future.result()
+
+        compressed_image, quantized = shared_compressed.copy(), shared_quantized.copy()
+        del shared_image, shared_quantized, shared_compressed
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+    return compressed_image, quantized
+
+
+def dct_blocks_loop(image, Q, block_size=8):
+    """
+    Implementação de referência: um cv2.dct/cv2.idct por bloco
+
+    Usa a mesma aritmética do modo vetorizado (transformadas em float64
+    arredondadas para float32, quantização em float32), de modo que os
+    coeficientes quantizados e a imagem reconstruída são idênticos bit a bit.
+    :param image: imagem float32 (H, W)
+    :param Q: matriz de quantização (N x N)
+    :return: imagem reconstruída (float32), blocos incompletos das bordas ficam em zero,
+             e coeficientes quantizados (H/N, W/N, N, N)
+    """
+    height, width = image.shape
+    compressed_image = np.zeros_like(image)
+    quantized = np.zeros((height // block_size, width // block_size, block_size, block_size), dtype=np.int32)
+    Q = np.asarray(Q, dtype=np.float32)
 
     for y in range(0, height - block_size + 1, block_size):
         for x in range(0, width - block_size + 1, block_size):
-            # Extrair bloco
-            block = original_image[y:y + block_size, x:x + block_size]
+            # Extrair bloco e subtrair 128 para centralizar em zero
+            # (a subtração gera uma cópia, preservando a imagem original)
+            block = image[y:y + block_size, x:x + block_size].astype(np.float64) - 128
 
-            # Subtrair 128 para centralizar em zero
-            block -= 128
-
-            # Aplicar DCT
-            dct_block = cv2.dct(block)
+            # Aplicar DCT (em float64, arredondada para float32)
+            dct_block = cv2.dct(block).astype(np.float32)
 
             # Quantização
-            quantized_block = np.round(dct_block / Q)
+            quantized_block = np.round(dct_block / Q).astype(np.int32)
+            quantized[y // block_size, x // block_size] = quantized_block
 
             # Reconstrução (inversa)
             reconstructed_block = quantized_block * Q
-            idct_block = cv2.idct(reconstructed_block)
+            idct_block = cv2.idct(reconstructed_block.astype(np.float64)).astype(np.float32)
 
             # Adicionar 128 de volta
             compressed_image[y:y + block_size, x:x + block_size] = idct_block + 128
 
-    # 4. Calcular métricas
+    return compressed_image, quantized
+
+
+def check_modes(plane, Q, block_size=8):
+    """
+    Confere que o modo vetorizado e o laço de referência dão os mesmos
+    coeficientes quantizados e a mesma reconstrução, bit a bit
+    :raise AssertionError: se os dois modos divergirem
+    """
+    padded = pad_to_blocks(np.asarray(plane, dtype=np.float32), block_size)
+    loop_image, loop_quantized = dct_blocks_loop(padded, Q, block_size)
+    quantized = quantize(forward_dct_blocks(padded, block_size), Q)
+    assert np.array_equal(quantized, loop_quantized), "Coeficientes diferentes entre os modos 'loop' e 'vectorized'"
+    assert np.array_equal(reconstruct_image(quantized, Q, padded.shape), loop_image), \
+        "Reconstrução diferente entre os modos 'loop' e 'vectorized'"
+
+
+def compress_plane(plane, Q, block_size=8, mode='vectorized', workers=1, parallel_backend='process'):
+    """
+    Comprime um plano (tons de cinza ou um componente YCbCr) com o modo escolhido
+
+    O plano é completado (repetindo as bordas) até um múltiplo do tamanho do bloco,
+    de modo que os blocos parciais da direita e de baixo também são comprimidos.
+    :return: plano reconstruído (float32, mesmas dimensões da entrada) e
+             coeficientes quantizados (ceil(H/N), ceil(W/N), N, N)
+    """
+    height, width = plane.shape
+    padded = pad_to_blocks(plane, block_size)
+
+    if mode == 'vectorized' and workers > 1:
+        reconstructed, quantized = dct_blocks_parallel(padded, Q, block_size, workers, parallel_backend)
+    elif mode == 'vectorized':
+        quantized = quantize(forward_dct_blocks(padded, block_size), Q)
+        reconstructed = reconstruct_image(quantized, Q, padded.shape)
+    elif mode == 'loop':
+        reconstructed, quantized = dct_blocks_loop(padded, Q, block_size)
+    else:
+        raise ValueError(f"Modo desconhecido: {mode!r} (use 'vectorized' ou 'loop')")
+    return reconstructed[:height, :width], quantized
+
+
+def dct_compress(image_path, quality=50, block_size=8, show_stats=True, mode='vectorized',
+                 output_path=None, workers=1, parallel_backend='process', color=False,
+                 subsampling='4:2:0', show_plot=True, cache_dir=None, cache_max_bytes=1 << 30):
+    """
+    Implementa compressão de imagem usando DCT similar ao JPEG
+    :param image_path: caminho para a imagem original
+    :param quality: qualidade da compressão (1-100)
+    :param block_size: tamanho do bloco para DCT (tipicamente 8; 4, 16 e 32 usam a
+                       tabela de quantização interpolada de base_quantization_table)
+    :param show_stats: mostra estatísticas detalhadas no terminal
+    :param mode: 'vectorized' processa todos os blocos de uma vez;
+                 'loop' usa a implementação de referência bloco a bloco (mesmo
+                 resultado, bit a bit, ver check_modes)
+    :param output_path: caminho do arquivo DCTB com os coeficientes codificados (opcional);
+                        sem ele o bitstream é gerado apenas em memória para medir o tamanho
+    :param workers: com mais de 1, o modo 'vectorized' divide a imagem em faixas
+                    processadas em paralelo
+    :param parallel_backend: 'process' ou 'thread' (ver dct_blocks_parallel)
+    :param color: comprime a imagem colorida em YCbCr (resultado em BGR, como no OpenCV)
+    :param subsampling: subamostragem da crominância no modo colorido: '4:4:4', '4:2:2' ou '4:2:0'
+    :param show_plot: mostra a comparação com o matplotlib; False não usa nenhum backend gráfico
+    :param cache_dir: diretório do cache de resultados (ver cache_resultados); num acerto
+                      o arquivo DCTB e as métricas vêm do cache e a imagem é só decodificada,
+                      sem estatísticas nem gráfico ('cached' indica o acerto)
+    :param cache_max_bytes: tamanho máximo do cache
+    :return: imagem comprimida, razão de compressão, métricas de qualidade
+    """
+    start_time = time.time()
+
+    cache = key = None
+    if cache_dir:
+        # mode, workers e parallel_backend não mudam o resultado (ver check_modes)
+        cache = ResultCache(cache_dir, cache_max_bytes)
+        key = cache.key(image_path, 'dct', {'quality': quality, 'block_size': block_size, 'color': color,
+                                            'subsampling': subsampling if color else None})
+        result = _cached_dct_result(cache, key, output_path)
+        if result is not None:
+            result['compression_time'] = time.time() - start_time
+            return result
+
+    # 1. Carregar imagem
+    original_image = cv2.imread(image_path, cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE)
+    if original_image is None:
+        raise FileNotFoundError(f"Imagem não encontrada em {image_path}")
+    if color and subsampling not in CHROMA_SUBSAMPLING:
+        raise ValueError(f"Subamostragem desconhecida: {subsampling!r} (use {', '.join(CHROMA_SUBSAMPLING)})")
+
+    original_size = os.path.getsize(image_path) / 1024  # Tamanho em KB
+
+    if show_stats:
+        # Estatísticas sobre os pixels uint8 carregados (uma única passagem)
+        print_stats(original_image, "Imagem Original", original_size)
+
+    original_image = original_image.astype(np.float32)
+    height, width = original_image.shape[:2]
+
+    # 2. Definir matriz de quantização (standard JPEG luminance quantization table)
+    quality, Q = quantization_matrix(quality, block_size=block_size)
+
+    # 3. Processar a imagem em blocos
+    if color:
+        # Y com a tabela de luminância; Cb e Cr subamostrados e com a tabela de crominância
+        _, Q_chroma = quantization_matrix(quality, chroma=True, block_size=block_size)
+        factors = [(1, 1)] + [CHROMA_SUBSAMPLING[subsampling]] * 2
+        ycbcr = bgr_to_ycbcr(original_image)
+        components, planes = [], []
+        for index, plane_factors in enumerate(factors):
+            plane = subsample(ycbcr[..., index], plane_factors)
+            plane_Q = Q if index == 0 else Q_chroma
+            reconstructed, quantized = compress_plane(plane, plane_Q, block_size, mode, workers, parallel_backend)
+            components.append((quantized, plane_Q))
+            planes.append(upsample(reconstructed, (height, width)))
+        compressed_image = ycbcr_to_bgr(np.stack(planes, axis=-1))
+    else:
+        compressed_image, quantized = compress_plane(original_image, Q, block_size, mode, workers, parallel_backend)
+        components, factors = [(quantized, Q)], [(1, 1)]
+
+    # 4. Codificar os coeficientes (zigue-zague, DC diferencial, run-length e Huffman)
+    bitstream_path = output_path
+    if cache is not None and not output_path:
+        fd, bitstream_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-', suffix='.dctb')
+        os.close(fd)
+    if bitstream_path:
+        compressed_bytes = dct_bitstream.write_dct_file(
+            bitstream_path, height, width, block_size, quality, components, factors)
+    else:
+        compressed_bytes = sum(len(dct_bitstream.encode_segment(quantized, component=index))
+                               for index, (quantized, _) in enumerate(components))
+    compressed_size = compressed_bytes / 1024  # Tamanho em KB
+
+    # 5. Calcular métricas
     compressed_image = np.clip(compressed_image, 0, 255).astype(np.uint8)
     original_image_uint8 = np.clip(original_image, 0, 255).astype(np.uint8)
 
     # Calcular PSNR e SSIM
     psnr_value = psnr(original_image_uint8, compressed_image)
-    ssim_value = ssim(original_image_uint8, compressed_image)
+    ssim_value = ssim(original_image_uint8, compressed_image, channel_axis=2 if color else None)
     compression_time = time.time() - start_time
 
-    # 5. Mostrar estatísticas da imagem comprimida
+    if cache is not None:
+        cache.put(key, bitstream_path, {'psnr': float(psnr_value), 'ssim': float(ssim_value),
+                                        'original_size': original_size, 'compression_time': compression_time})
+        if bitstream_path != output_path:
+            os.remove(bitstream_path)
+
+    # 6. Mostrar estatísticas da imagem comprimida
     if show_stats:
         print_stats(compressed_image, "Imagem Comprimida", original_size)
 
@@ -146,28 +713,29 @@ def dct_compress(image_path, quality=50, block_size=8, show_stats=True):
         print(f"| {'Tempo de compressão:':<25} | {compression_time:>18.2f} s |")
 
         # Cálculo da taxa de compressão
-        compressed_size = os.path.getsize('compressed_dct.jpg') / 1024 if os.path.exists('compressed_dct.jpg') else 0
         if compressed_size > 0:
             print(f"| {'Taxa de compressão:':<25} | {(original_size / compressed_size):>18.2f}x |")
             print(f"| {'Redução de tamanho:':<25} | {(1 - (compressed_size / original_size)) * 100:>17.2f}% |")
         print(f"{'=' * 50}\n")
 
-    # 6. Visualização
-    plt.figure(figsize=(12, 6))
-    plt.subplot(1, 2, 1)
-    plt.imshow(original_image_uint8, cmap='gray')
-    plt.title('Original')
-    plt.axis('off')
+    # 7. Visualização (matplotlib espera RGB)
+    if show_plot:
+        to_display = (lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2RGB)) if color else (lambda img: img)
+        plt.figure(figsize=(12, 6))
+        plt.subplot(1, 2, 1)
+        plt.imshow(to_display(original_image_uint8), cmap='gray')
+        plt.title('Original')
+        plt.axis('off')
 
-    plt.subplot(1, 2, 2)
-    plt.imshow(compressed_image, cmap='gray')
-    plt.title(f'Comprimida (Qualidade: {quality})')
-    plt.axis('off')
+        plt.subplot(1, 2, 2)
+        plt.imshow(to_display(compressed_image), cmap='gray')
+        plt.title(f'Comprimida (Qualidade: {quality})')
+        plt.axis('off')
 
-    plt.tight_layout()
-    plt.show()
+        plt.tight_layout()
+        plt.show()
 
-    # 7. Retornar resultados
+    # 8. Retornar resultados
     return {
         'compressed_image': compressed_image,
         'quality': quality,
@@ -177,21 +745,370 @@ def dct_compress(image_path, quality=50, block_size=8, show_stats=True):
         'quantization_matrix': Q,
         'compression_time': compression_time,
         'original_size': original_size,
-        'compressed_size': os.path.getsize('compressed_dct.jpg') / 1024 if os.path.exists('compressed_dct.jpg') else 0
+        'compressed_size': compressed_size,
+        'bitstream_path': output_path,
+        'subsampling': subsampling if color else None,
+        'quantized_components': components,
+        'cached': False
+    }
+
+
+def _cached_dct_result(cache, key, output_path=None):
+    """
+    Resultado de dct_compress a partir de uma entrada do cache
+    :return: dicionário como o de dct_compress, ou None se a entrada não existe
+    """
+    path = output_path
+    if not path:
+        fd, path = tempfile.mkstemp(dir=cache.cache_dir, prefix='.tmp-', suffix='.dctb')
+        os.close(fd)
+    try:
+        metrics = cache.fetch(key, path)
+        if metrics is None:
+            return None
+        header = dct_bitstream.read_dct_file(path)
+        compressed_bytes = os.path.getsize(path)
+    finally:
+        if path != output_path and os.path.exists(path):
+            os.remove(path)
+
+    components = [(component['quantized'], component['Q']) for component in header['components']]
+    color = len(components) == 3
+    return {
+        'compressed_image': decode_components(header),
+        'quality': header['quality'],
+        'psnr': metrics['psnr'],
+        'ssim': metrics['ssim'],
+        'block_size': header['block_size'],
+        'quantization_matrix': components[0][1],
+        'original_size': metrics['original_size'],
+        'compressed_size': compressed_bytes / 1024,
+        'bitstream_path': output_path,
+        'subsampling': (next(name for name, factors in CHROMA_SUBSAMPLING.items()
+                             if factors == header['components'][1]['subsampling']) if color else None),
+        'quantized_components': components,
+        'cached': True
+    }
+
+
+def dct_decompress(path):
+    """
+    Decodifica um arquivo DCTB gravado por dct_compress
+    :param path: caminho do arquivo
+    :return: imagem reconstruída (uint8), em BGR se o arquivo for colorido
+    """
+    return decode_components(dct_bitstream.read_dct_file(path))
+
+
+def decode_components(header):
+    """
+    Reconstrói a imagem a partir do cabeçalho e dos coeficientes de read_dct_file
+    :return: imagem uint8, em BGR se houver três componentes
+    """
+    height, width = header['height'], header['width']
+    planes = []
+    for component in header['components']:
+        h_factor, v_factor = component['subsampling']
+        plane_shape = (-(-height // v_factor), -(-width // h_factor))
+        plane = reconstruct_image(component['quantized'], component['Q'], plane_shape)
+        planes.append(upsample(plane, (height, width)))
+
+    image = planes[0] if len(planes) == 1 else ycbcr_to_bgr(np.stack(planes, axis=-1))
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=8)
+def _cached_forward_dct(image_path, modified_time, block_size):
+    """Coeficientes DCT de uma imagem, reaproveitados enquanto o arquivo não mudar"""
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise FileNotFoundError(f"Imagem não encontrada em {image_path}")
+    coefficients = forward_dct_blocks(pad_to_blocks(image.astype(np.float32), block_size), block_size)
+    coefficients.flags.writeable = False
+    return coefficients, image.shape
+
+
+def forward_dct_cached(image_path, block_size=8):
+    """
+    Coeficientes DCT da imagem (em tons de cinza), calculados uma única vez
+    por arquivo e tamanho de bloco
+    :return: coeficientes (ceil(H/N), ceil(W/N), N, N) e dimensões da imagem
+    """
+    return _cached_forward_dct(os.path.abspath(image_path), os.path.getmtime(image_path), block_size)
+
+
+def rate_distortion_point(coefficients, Q):
+    """
+    Tamanho e PSNR de uma quantização, sem transformada inversa
+
+    Como a DCT é ortonormal, o erro quadrático dos pixels de cada bloco é igual
+    ao erro quadrático dos coeficientes (teorema de Parseval). O tamanho vem das
+    tabelas de Huffman, sem empacotar os bits.
+    :return: (tamanho do arquivo em bytes, PSNR estimado em dB)
+    """
+    quantized = quantize(coefficients, Q)
+    error = coefficients - dequantize(quantized, Q)
+    mse = np.mean(np.square(error, dtype=np.float64))
+    size = dct_bitstream.header_size(Q.shape[0]) + dct_bitstream.estimate_size(quantized)
+    return size, (10 * np.log10(255 ** 2 / mse) if mse > 0 else float('inf'))
+
+
+def dct_rate_distortion_search(image_path, target_bytes=None, target_psnr=None, block_size=8,
+                               search='quality', iterations=20):
+    """
+    Procura a quantização que atinge um tamanho máximo ou um PSNR mínimo
+
+    A DCT direta é calculada uma única vez (e fica em cache); cada ponto da busca
+    refaz apenas a quantização e as métricas baratas de rate_distortion_point.
+    :param image_path: caminho da imagem (tons de cinza)
+    :param target_bytes: tamanho máximo do arquivo DCTB em bytes
+    :param target_psnr: PSNR mínimo em dB (informe apenas um dos dois alvos)
+    :param block_size: tamanho do bloco para DCT
+    :param search: 'quality' busca binária na qualidade inteira (1-100);
+                   'scale' bissecção contínua de um fator que multiplica a tabela Q
+    :param iterations: número de passos da bissecção no modo 'scale'
+    :return: ponto escolhido (qualidade ou escala, Q, tamanho, PSNR) e a curva explorada
+    """
+    if (target_bytes is None) == (target_psnr is None):
+        raise ValueError("Informe exatamente um alvo: target_bytes ou target_psnr")
+
+    coefficients, shape = forward_dct_cached(image_path, block_size)
+    curve = {}
+
+    def evaluate(parameter):
+        if parameter not in curve:
+            if search == 'quality':
+                _, Q = quantization_matrix(parameter, block_size=block_size)
+            else:
+                Q = np.maximum(np.round(base_quantization_table(block_size) * parameter), 1)
+            size, psnr_value = rate_distortion_point(coefficients, Q)
+            curve[parameter] = {'parameter': parameter, 'Q': Q, 'size': size, 'psnr': psnr_value}
+        return curve[parameter]
+
+    def meets(point):
+        if target_bytes is not None:
+            return point['size'] <= target_bytes
+        return point['psnr'] >= target_psnr
+
+    # Tamanho e PSNR crescem com a qualidade (e diminuem com a escala de Q).
+    # Com target_bytes buscamos a maior qualidade que cabe no orçamento;
+    # com target_psnr, a menor qualidade que ainda atinge o PSNR.
+    if search == 'quality':
+        low, high = 1, 100
+        while low < high:
+            if target_bytes is not None:
+                middle = (low + high + 1) // 2
+                if meets(evaluate(middle)):
+                    low = middle
+                else:
+                    high = middle - 1
+            else:
+                middle = (low + high) // 2
+                if meets(evaluate(middle)):
+                    high = middle
+                else:
+                    low = middle + 1
+        best = evaluate(low)
+    elif search == 'scale':
+        # Bissecção em escala logarítmica entre Q/100 e 50 * Q. Escala maior é
+        # quantização mais grossa: com target_bytes o lado que atende é o de cima
+        # (buscamos a menor escala que cabe); com target_psnr, o de baixo (a
+        # maior escala que ainda atinge o PSNR).
+        low, high = np.log(0.01), np.log(50.0)
+        for _ in range(iterations):
+            middle = (low + high) / 2
+            if meets(evaluate(float(np.exp(middle)))) == (target_bytes is not None):
+                high = middle
+            else:
+                low = middle
+        best = evaluate(float(np.exp(high if target_bytes is not None else low)))
+    else:
+        raise ValueError(f"Busca desconhecida: {search!r} (use 'quality' ou 'scale')")
+
+    return {
+        search: best['parameter'],
+        'quantization_matrix': best['Q'],
+        'compressed_size': best['size'],
+        'psnr': best['psnr'],
+        'target_met': meets(best),
+        'image_shape': shape,
+        'curve': sorted(({search: p['parameter'], 'size': p['size'], 'psnr': p['psnr']}
+                         for p in curve.values()), key=lambda p: p[search])
+    }
+
+
+def dct_preview(quantized, Q, scale=8, shape=None):
+    """
+    Miniatura a partir das baixas frequências de cada bloco, sem decodificar a imagem inteira
+
+    Com scale == N (1/8 para blocos 8 x 8) cada bloco vira um pixel calculado só
+    pelo coeficiente DC (DC / N + 128), sem nenhuma transformada inversa. Escalas
+    menores usam o canto k x k de baixas frequências (k = N / scale) com uma IDCT
+    k x k, resultando em k x k pixels por bloco.
+    :param quantized: coeficientes quantizados (linhas, colunas, N, N)
+    :param Q: matriz de quantização (N x N)
+    :param scale: fator de redução (N, N/2, N/4, ...)
+    :param shape: dimensões (H, W) da imagem original, para cortar o preenchimento
+    :return: miniatura float32 com aproximadamente (H / scale, W / scale) pixels
+    """
+    block_size = quantized.shape[-1]
+    if scale < 1 or block_size % scale:
+        raise ValueError(f"A escala deve dividir o tamanho do bloco ({block_size}), recebido {scale}")
+    k = block_size // scale
+
+    if k == 1:
+        preview = quantized[..., 0, 0] * Q[0, 0] / block_size + 128
+    else:
+        low = quantized[..., :k, :k] * Q[:k, :k]
+        C = dct_basis(k)
+        preview = blocks_to_image(C.T @ low @ C * (k / block_size) + 128)
+
+    preview = preview.astype(np.float32)
+    if shape is not None:
+        preview = preview[:-(-shape[0] // scale), :-(-shape[1] // scale)]
+    return preview
+
+
+def dct_progressive_previews(quantized, Q, shape=None):
+    """
+    Miniaturas cada vez maiores (1/N, 2/N, 4/N, ...) acrescentando as faixas AC de baixa frequência
+    :return: gerador de (escala, miniatura float32)
+    """
+    scale = quantized.shape[-1]
+    while scale > 1:
+        yield scale, dct_preview(quantized, Q, scale, shape)
+        scale //= 2
+
+
+def dct_preview_file(path, scale=8):
+    """
+    Miniatura de um arquivo DCTB (tons de cinza ou colorido)
+
+    Só os segmentos das bandas de frequência usadas pela miniatura são
+    decodificados (o DC para scale == N); os das outras são pulados.
+    :param path: arquivo gravado por dct_compress
+    :param scale: fator de redução (ver dct_preview)
+    :return: miniatura uint8, em BGR se o arquivo for colorido
+    """
+    header = dct_bitstream.read_dct_file(path, scale)
+    height, width = header['height'], header['width']
+    preview_shape = (-(-height // scale), -(-width // scale))
+    planes = []
+    for component in header['components']:
+        h_factor, v_factor = component['subsampling']
+        plane_shape = (-(-height // v_factor), -(-width // h_factor))
+        plane = dct_preview(component['quantized'], component['Q'], scale, plane_shape)
+        planes.append(upsample(plane, preview_shape))
+
+    preview = planes[0] if len(planes) == 1 else ycbcr_to_bgr(np.stack(planes, axis=-1))
+    return np.clip(preview, 0, 255).astype(np.uint8)
+
+
+def dct_compress_stream(input_path, output_path, shape=None, quality=50, block_size=8,
+                        strip_rows=1024, reconstructed_path=None):
+    """
+    Compressão DCT em faixas horizontais, para imagens maiores que a memória
+    :param input_path: imagem em tons de cinza (.npy ou raw uint8)
+    :param output_path: arquivo DCTB de saída, gravado faixa a faixa
+    :param shape: (altura, largura), obrigatório para arquivos raw
+    :param quality: qualidade da compressão (1-100)
+    :param block_size: tamanho do bloco para DCT
+    :param strip_rows: linhas por faixa (arredondado para múltiplo de block_size);
+                       o pico de memória é proporcional a strip_rows * largura
+    :param reconstructed_path: grava a imagem reconstruída (.npy ou raw), opcional
+    :return: tamanhos, PSNR, tempo de compressão e estatísticas (image_statistics)
+             da imagem original e da reconstruída
+    """
+    start_time = time.time()
+    image = open_image_memmap(input_path, shape)
+    height, width = image.shape
+    quality, Q = quantization_matrix(quality, block_size=block_size)
+    block_rows, block_cols = -(-height // block_size), -(-width // block_size)
+
+    reconstructed = None
+    if reconstructed_path:
+        reconstructed = create_image_memmap(reconstructed_path, (height, width))
+
+    squared_error = 0.0
+    original_stats, compressed_stats = StreamingStats(), StreamingStats()
+    with open(output_path, 'wb') as f:
+        dct_bitstream.write_header(f, height, width, block_size, quality, [(block_rows, block_cols, Q)])
+
+        for y, strip in iter_strips(image, strip_rows, align=block_size):
+            original_stats.update(strip)
+            strip = np.asarray(strip, dtype=np.float32)
+            quantized = quantize(forward_dct_blocks(pad_to_blocks(strip, block_size), block_size), Q)
+            f.write(dct_bitstream.encode_segment(quantized, first_block_row=y // block_size))
+
+            strip_out = np.clip(reconstruct_image(quantized, Q, strip.shape), 0, 255).astype(np.uint8)
+            squared_error += np.sum((strip - strip_out) ** 2, dtype=np.float64)
+            compressed_stats.update(strip_out)
+            if reconstructed is not None:
+                reconstructed[y:y + strip.shape[0]] = strip_out
+
+        compressed_bytes = f.tell()
+
+    if reconstructed is not None:
+        reconstructed.flush()
+
+    mse = squared_error / (height * width)
+    return {
+        'quality': quality,
+        'psnr': 10 * np.log10(255 ** 2 / mse) if mse > 0 else float('inf'),
+        'block_size': block_size,
+        'quantization_matrix': Q,
+        'compression_time': time.time() - start_time,
+        'original_size': os.path.getsize(input_path) / 1024,
+        'compressed_size': compressed_bytes / 1024,
+        'bitstream_path': output_path,
+        'original_stats': original_stats.result(),
+        'compressed_stats': compressed_stats.result()
     }
 
 
+def dct_decompress_stream(path, output_path):
+    """
+    Decodifica um arquivo DCTB segmento a segmento, gravando direto no disco
+    :param path: arquivo DCTB
+    :param output_path: imagem reconstruída (.npy ou raw uint8)
+    :return: array mapeado com a imagem reconstruída
+    """
+    with open(path, 'rb') as f:
+        data = f.read()  # apenas os bytes comprimidos, não os pixels
+
+    header, offset = dct_bitstream.read_header(data)
+    block_size = header['block_size']
+    component = header['components'][0]
+    height, width = header['height'], header['width']
+    output = create_image_memmap(output_path, (height, width))
+    output[:] = 0
+
+    for _, first_row, quantized in dct_bitstream.iter_segments(data, offset, header):
+        y = first_row * block_size
+        rows = min(quantized.shape[0] * block_size, height - y)  # a última faixa pode ter blocos completados
+        strip = reconstruct_image(quantized, component['Q'], (rows, width))
+        output[y:y + rows] = np.clip(strip, 0, 255).astype(np.uint8)
+
+    output.flush()
+    return output
+
 
 if __name__ == "__main__":
     # Configurações
     IMAGE_PATH = 'imgs/kelry.jpeg'  # caminho da sua imagem
     QUALITY = 10  # Qualidade desejada (1-100)
 
-    # Executar compressão
-    results = dct_compress(IMAGE_PATH, quality=QUALITY)
+    OUTPUT_PATH = 'output/compressed_dct.dctb'  # coeficientes codificados
+
+    # Executar compressão (o arquivo DCTB é o resultado comprimido)
+    os.makedirs('output', exist_ok=True)
+    results = dct_compress(IMAGE_PATH, quality=QUALITY, output_path=OUTPUT_PATH)
+
+    # O laço de referência deve reproduzir o modo vetorizado bit a bit
+    check_modes(cv2.imread(IMAGE_PATH, cv2.IMREAD_GRAYSCALE), quantization_matrix(QUALITY)[1])
 
-    # Salvar imagem comprimida
-    cv2.imwrite('output/compressed_dct.jpg', results['compressed_image'])
+    # Salvar a reconstrução sem perdas adicionais, apenas para visualização
+    cv2.imwrite('output/reconstructed_dct.png', dct_decompress(OUTPUT_PATH))
     print("\nRESUMO FINAL:")
     print(f"- Qualidade configurada: {results['quality']}")
     print(f"- PSNR: {results['psnr']:.2f} dB (maior é melhor)")
@@ -202,4 +1119,4 @@ if __name__ == "__main__":
         print(f"- Tamanho comprimido: {results['compressed_size']:.2f} KB")
         print(f"- Taxa de compressão: {results['original_size'] / results['compressed_size']:.2f}x")
         print(f"- Redução: {(1 - (results['compressed_size'] / results['original_size'])) * 100:.2f}%")
-    print("\nProcesso concluído. Imagem comprimida salva como 'compressed_dct.jpg'")
\ No newline at end of file
+    print(f"\nProcesso concluído. Imagem comprimida salva como '{OUTPUT_PATH}'")
\ No newline at end of file
@@ -11,12 +11,197 @@ matplotlib.pyplot: Para visualização dos resultados
 
 import numpy as np
 import cv2
+import hashlib
+import json
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
+from skimage.metrics import peak_signal_noise_ratio as psnr
+from skimage.metrics import structural_similarity as ssim
 
+from cache_resultados import ResultCache
+from imagem_io import create_image_memmap, iter_strips, open_image_memmap
+from pca_backend import pca_fit, principal_components, resolve_backend
+from pca_container import PRECISIONS, column_scales, layout, quantize, read_pca_file, reconstruct, write_pca_file
 
-def pca_compress(image_path, k_components=30, output_dir='output'):
-    """Compressão de imagem com PCA e salvamento dos resultados"""
+# Erro médio quadrático da conversão final para uint8 (truncamento: 1/3 de nível de cinza ao quadrado)
+UINT8_MSE = (1 / 3) / 255 ** 2
+
+
+def quantization_mse(components, scores, precision='int8'):
+    """
+    Erro médio quadrático (por pixel, valores em [0, 1]) que a quantização do
+    arquivo acrescenta com cada componente mantido
+
+    No int8, o erro de arredondamento de cada valor é uniforme, com variância
+    escala² / 12 (escalas por coluna de pca_container.column_scales). Como os
+    componentes são ortonormais, o erro dos scores da coluna j contribui com
+    escala_j² / 12 / W por pixel, e o dos componentes com média(score_j²) *
+    escala_j² / 12. Nas precisões float esse erro é desprezível (zero aqui).
+    :param components: componentes (W x k)
+    :param scores: scores (H x k)
+    :return: array (k,) com a contribuição de cada componente
+    """
+    if precision != 'int8':
+        return np.zeros(components.shape[1])
+    width = components.shape[0]
+    score_scales = column_scales(scores, precision).astype(np.float64)
+    component_scales = column_scales(components, precision).astype(np.float64)
+    mean_square = np.mean(np.square(scores, dtype=np.float64), axis=0)
+    return (score_scales ** 2 / width + mean_square * component_scales ** 2) / 12
+
+
+def select_components(eigenvalues, height, width, target_variance=None, target_psnr=None, max_bytes=None,
+                      precision='int8', total_variance=None, quantization_errors=None):
+    """
+    Escolhe o número de componentes a partir do espectro (sem novas decomposições)
+
+    A soma dos autovalores descartados dá o erro de reconstrução: com k
+    componentes, a soma dos quadrados dos resíduos é (H - 1) * soma(autovalores[k:]).
+    Somando o erro da quantização do arquivo (quantization_mse) e o da conversão
+    para uint8, isso estima o PSNR de cada k; compress_plane confere o PSNR real.
+    O tamanho do arquivo vem do layout do formato PCAQ (exato).
+
+    :param eigenvalues: autovalores da covariância em ordem decrescente (espectro completo)
+    :param height: número de linhas da imagem (amostras)
+    :param width: número de colunas da imagem
+    :param target_variance: fração mínima da variância explicada (ex.: 0.99)
+    :param target_psnr: PSNR mínimo estimado, em dB
+    :param max_bytes: tamanho máximo do arquivo comprimido
+    :param precision: precisão do arquivo, usada com max_bytes
+    :param total_variance: soma de todos os autovalores, quando eigenvalues traz só os primeiros
+    :param quantization_errors: contribuição de cada componente para o erro da
+                                quantização (quantization_mse); None ignora esse erro
+    :return: k escolhido: o menor que atinge as metas, limitado por max_bytes
+             (só com max_bytes, o maior k que cabe no tamanho)
+    """
+    eigenvalues = np.clip(np.asarray(eigenvalues, dtype=np.float64), 0, None)
+    total_variance = np.sum(eigenvalues) if total_variance is None else total_variance
+    n_available = len(eigenvalues)
+    k_values = np.arange(1, n_available + 1)
+    feasible = np.ones(n_available, dtype=bool)
+
+    if target_variance is not None:
+        feasible &= np.cumsum(eigenvalues) / total_variance >= target_variance - 1e-12
+    if target_psnr is not None:
+        discarded = total_variance - np.cumsum(eigenvalues)
+        mse = np.clip(discarded, 0, None) * (height - 1) / (height * width) + UINT8_MSE
+        if quantization_errors is not None:
+            mse += np.cumsum(quantization_errors)[:n_available]
+        feasible &= 10 * np.log10(1 / mse) >= target_psnr
+
+    has_target = target_variance is not None or target_psnr is not None
+    k_components = k_values[feasible][0] if has_target and feasible.any() else n_available
+    if max_bytes is not None:
+        sizes = np.array([layout(height, width, k, precision)[1] for k in k_values])
+        if sizes[0] > max_bytes:
+            raise ValueError(f"Nem com 1 componente o arquivo cabe em {max_bytes} bytes ({sizes[0]} bytes)")
+        k_components = min(k_components, k_values[sizes <= max_bytes][-1])
+    return int(k_components)
+
+
+def quantized_psnr(img_float, mean, components, scores, precision='int8'):
+    """
+    PSNR (dB) da reconstrução uint8 que o arquivo PCAQ daria, calculado na memória
+    """
+    component_scales, score_scales = column_scales(components, precision), column_scales(scores, precision)
+    components = quantize(components, component_scales, precision).astype(np.float32) * component_scales
+    scores = quantize(scores, score_scales, precision).astype(np.float32) * score_scales
+    reconstructed = (np.clip(scores @ components.T + mean, 0, 1) * 255).astype(np.uint8)
+    mse = np.mean(np.square(np.rint(img_float * 255) - reconstructed))
+    return 10 * np.log10(255 ** 2 / mse) if mse > 0 else float('inf')
+
+
+def compress_plane(img_float, k_components, compressed_path, solver='auto', precision='int8', backend='numpy',
+                   target_variance=None, target_psnr=None, max_bytes=None):
+    """
+    PCA de um plano (imagem em tons de cinza ou um canal) gravado em um arquivo PCAQ
+
+    Com target_psnr, k sai da estimativa de select_components (espectro +
+    quantização + uint8) e o PSNR é conferido uma vez, na memória; só se a
+    estimativa falhar k é buscado por bisseção entre ela e o máximo permitido.
+    :param img_float: plano (H, W) float32 com valores em [0, 1]
+    :param k_components: número de componentes ou 'auto' (ver pca_compress)
+    :return: dicionário com k_components, eigenvalues, total_variance e compressed_size
+    """
+    height, width = img_float.shape
+
+    mean = np.mean(img_float, axis=0)  # Calcula a média de intensidade para cada coluna de pixels na imagem
+
+    centered = img_float - mean  # Centraliza os dados subtraindo a média de cada coluna (preparação para PCA)
+
+    total_variance = np.sum(np.var(centered, axis=0, ddof=1))  # Traço da covariância: soma de todos os autovalores
+
+    auto = k_components == 'auto'
+    if auto:
+        # Uma única decomposição completa; k sai do espectro
+        if target_variance is None and target_psnr is None and max_bytes is None:
+            target_variance = 0.99
+        eigenvalues, all_components = pca_fit(centered, width, 'eigh', backend)
+        errors = None
+        if target_psnr is not None:
+            all_scores = np.dot(centered, all_components)
+            errors = quantization_mse(all_components, all_scores, precision)
+        k_components = select_components(eigenvalues, height, width, target_variance, target_psnr,
+                                         max_bytes, precision, total_variance, errors)
+        if target_psnr is not None:
+            k_max = select_components(eigenvalues, height, width, max_bytes=max_bytes, precision=precision)
+
+            def meets(k):
+                return quantized_psnr(img_float, mean, all_components[:, :k], all_scores[:, :k],
+                                      precision) >= target_psnr
+
+            if k_components < k_max and not meets(k_components):
+                # Estimativa otimista: bisseção no menor k que atinge a meta (ou k_max)
+                low, high = k_components, k_max
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if meets(middle):
+                        high = middle
+                    else:
+                        low = middle
+                k_components = high
+        components = all_components[:, :k_components]
+    else:
+        eigenvalues, components = pca_fit(centered, k_components, solver, backend)  # Autovalores (importância) e os k autovetores mais significativos (componentes principais)
+        k_components = components.shape[1]  # k maior que a largura é limitado pelo solver
+
+    if auto and target_psnr is not None:
+        scores = all_scores[:, :k_components]  # os mesmos scores conferidos acima
+    else:
+        scores = np.dot(centered,components)  # Transforma os dados originais para o novo espaço dimensional reduzido (projeção PCA)
+
+    # Formato PCAQ, ver pca_container
+    compressed_size = write_pca_file(compressed_path, mean, components, scores, precision)
+    return {
+        'k_components': k_components,
+        'eigenvalues': eigenvalues,
+        'total_variance': total_variance,
+        'compressed_size': compressed_size,
+    }
+
+
+def pca_compress(image_path, k_components=30, output_dir='output', show_plot=True, verbose=True,
+                 solver='auto', precision='int8', target_variance=None, target_psnr=None, max_bytes=None,
+                 backend='auto', cache_dir=None, cache_max_bytes=1 << 30):
+    """
+    Compressão de imagem com PCA e salvamento dos resultados
+    :param k_components: número de componentes ou 'auto' (escolhido por select_components a
+                         partir do espectro completo; sem metas, usa target_variance=0.99)
+    :param target_variance, target_psnr, max_bytes: metas do modo 'auto' (ver select_components)
+    :param solver: método de cálculo dos componentes (ver pca_fit)
+    :param backend: 'numpy', 'torch-cpu', 'cuda' ou 'auto' (o melhor disponível, ver pca_backend)
+    :param precision: precisão de componentes e scores no arquivo ('float32', 'float16' ou 'int8')
+    :param show_plot: plota a comparação (e grava comparison.png); False não usa o matplotlib
+    :param verbose: imprime o resumo no terminal
+    :param cache_dir: diretório do cache de resultados (ver cache_resultados); num acerto
+                      o arquivo PCAQ e as métricas vêm do cache, sem recalcular o PCA nem
+                      plotar ('cached' indica o acerto)
+    :param cache_max_bytes: tamanho máximo do cache
+    """
+    start_time = time.time()
 
     # Criar diretório de saída
     os.makedirs(output_dir, exist_ok=True)
@@ -37,36 +222,25 @@ def pca_compress(image_path, k_components=30, output_dir='output'):
     original_size = os.path.getsize(image_path)
     img_float = img.astype(np.float32) / 255.0  # Converte a imagem para float32 e normaliza os pixels para [0, 1]
 
-    # 2. Calcular PCA (Análise de componente principal(PCA) )
-
-    mean = np.mean(img_float, axis=0)  # Calcula a média de intensidade para cada coluna de pixels na imagem
-
-    centered = img_float - mean  # Centraliza os dados subtraindo a média de cada coluna (preparação para PCA)
-
-    cov = np.cov(centered,rowvar=False)  # Calcula matriz de covariância entre colunas (mostra como pixels variam conjuntamente)
-
-    eigenvalues, eigenvectors = np.linalg.eig(cov)  # Obtém autovalores (importância) e autovetores (direções principais) da covariância
-
-    eigenvectors = np.real(eigenvectors[:, np.argsort(-np.real(eigenvalues))])  # Ordena autovetores do mais para o menos importante
-
-    components = eigenvectors[:,:k_components]  # Seleciona apenas os k autovetores mais significativos (componentes principais)
-
-    scores = np.dot(centered,components)  # Transforma os dados originais para o novo espaço dimensional reduzido (projeção PCA)
-
-    # 3. Salvar dados comprimidos
-    compressed_path = os.path.join(output_dir, 'compressed_data.npz')
-    np.savez_compressed(
-        compressed_path,
-        mean=mean.astype(np.float32),
-        components=components.astype(np.float32),
-        scores=scores.astype(np.float32),
-        original_shape=img.shape
-    )
-    compressed_size = os.path.getsize(compressed_path)
-
-    # 4. Reconstruir imagem
-    reconstructed = np.dot(scores, components.T) + mean
-    reconstructed = np.clip(reconstructed, 0, 1)
+    # 2. Calcular PCA (Análise de componente principal(PCA) ) e 3. salvar dados comprimidos
+    backend = resolve_backend(backend, solver)
+    compressed_path = os.path.join(output_dir, 'compressed_data.pcaq')
+    cache = metrics = None
+    if cache_dir:
+        cache = ResultCache(cache_dir, cache_max_bytes)
+        key = cache.key(image_path, 'pca', {'k': k_components, 'solver': solver, 'precision': precision,
+                                            'target_variance': target_variance, 'target_psnr': target_psnr,
+                                            'max_bytes': max_bytes, 'backend': backend})
+        metrics = cache.fetch(key, compressed_path)
+    if metrics is None:
+        fitted = compress_plane(img_float, k_components, compressed_path, solver, precision, backend,
+                                target_variance, target_psnr, max_bytes)
+        k_components, compressed_size = fitted['k_components'], fitted['compressed_size']
+    else:
+        k_components, compressed_size = metrics['k_components'], os.path.getsize(compressed_path)
+
+    # 4. Reconstruir imagem a partir do arquivo (inclui o erro da quantização)
+    reconstructed = reconstruct(read_pca_file(compressed_path))
     reconstructed_img = (reconstructed * 255).astype(np.uint8)
 
     # 5. Salvar imagens para comparação
@@ -76,13 +250,50 @@ def pca_compress(image_path, k_components=30, output_dir='output'):
     original_path = os.path.join(output_dir, 'original.jpg')
     cv2.imwrite(original_path, img)
 
+    if metrics is None:
+        psnr_value = psnr(img, reconstructed_img)
+        ssim_value = ssim(img, reconstructed_img)
+        if cache is not None:
+            cache.put(key, compressed_path, {'psnr': float(psnr_value), 'ssim': float(ssim_value),
+                                             'k_components': int(k_components)})
+    else:
+        psnr_value, ssim_value = metrics['psnr'], metrics['ssim']
+    compression_time = time.time() - start_time
+
     # 6. Mostrar resultados
-    print(f"\n{' RESULTADOS ':=^40}")
-    print(f"Original: {original_size / 1024:.1f} KB")
-    print(f"Comprimido: {compressed_size / 1024:.1f} KB")
-    print(f"Taxa de compressão: {original_size / compressed_size:.1f}x")
+    if verbose:
+        print(f"\n{' RESULTADOS ':=^40}")
+        print(f"Original: {original_size / 1024:.1f} KB")
+        print(f"Comprimido: {compressed_size / 1024:.1f} KB")
+        print(f"Taxa de compressão: {original_size / compressed_size:.1f}x")
+        print(f"Componentes: {k_components} (backend {backend})")
+
+    # 7. Plotar comparação (num acerto do cache os autovalores não existem)
+    if show_plot and metrics is None:
+        plot_comparison(img, reconstructed, fitted['eigenvalues'], k_components, output_dir,
+                        fitted['total_variance'])
+
+    return {
+        'original': original_path,
+        'compressed': compressed_path,
+        'reconstructed': reconstructed_path,
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'psnr': psnr_value,
+        'ssim': ssim_value,
+        'k_components': k_components,
+        'backend': backend,
+        'compression_time': compression_time,
+        'cached': metrics is not None
+    }
+
 
-    # 7. Plotar comparação
+def plot_comparison(img, reconstructed, eigenvalues, k_components, output_dir, total_variance=None):
+    """
+    Plota original, reconstrução e variância explicada; grava comparison.png
+    :param total_variance: soma de todos os autovalores, quando eigenvalues traz só os primeiros
+    """
+    total_variance = np.sum(eigenvalues) if total_variance is None else total_variance
     plt.figure(figsize=(12, 4))
 
     plt.subplot(1, 3, 1)
@@ -96,7 +307,7 @@ def pca_compress(image_path, k_components=30, output_dir='output'):
     plt.axis('off')
 
     plt.subplot(1, 3, 3)
-    explained_variance = np.cumsum(np.real(eigenvalues)) / np.sum(np.real(eigenvalues))
+    explained_variance = np.cumsum(eigenvalues) / total_variance
     plt.plot(explained_variance)
     plt.axvline(k_components, color='r', linestyle='--')
     plt.title('Variância Explicada')
@@ -106,13 +317,498 @@ def pca_compress(image_path, k_components=30, output_dir='output'):
     plt.savefig(os.path.join(output_dir, 'comparison.png'))
     plt.show()
 
+
+
+class IncrementalPCA:
+    """
+    PCA ajustado por lotes de amostras, sem guardar os dados
+
+    Cada lote é combinado ao estado acumulado (número de amostras, média e
+    matriz de dispersão, isto é, a soma dos produtos dos desvios) pela fórmula
+    de Chan et al.; o estado tem tamanho fixo (n_features x n_features), não
+    importa quantas imagens ou patches passem por partial_fit. O estado pode ser
+    gravado em um checkpoint e retomado depois; source identifica os dados de
+    entrada (ex.: hash da lista de imagens) para conferir o checkpoint ao retomar.
+    """
+
+    CHECKPOINT_VERSION = 2
+
+    def __init__(self, source=''):
+        self.count = 0
+        self.batches = 0
+        self.mean = None
+        self.scatter = None
+        self.source = source
+
+    def partial_fit(self, batch):
+        """
+        Acrescenta um lote de amostras
+        :param batch: array (n_amostras, n_features)
+        :return: self
+        """
+        batch = np.asarray(batch, dtype=np.float64)
+        if batch.ndim != 2:
+            raise ValueError(f"Esperado lote 2D (amostras x features), recebido shape {batch.shape}")
+        if self.mean is None:
+            self.mean = np.zeros(batch.shape[1])
+            self.scatter = np.zeros((batch.shape[1], batch.shape[1]))
+        elif batch.shape[1] != self.mean.shape[0]:
+            raise ValueError(f"Lote com {batch.shape[1]} features; esperado {self.mean.shape[0]}")
+
+        n = batch.shape[0]
+        if n:
+            batch_mean = batch.mean(axis=0)
+            centered = batch - batch_mean
+            delta = batch_mean - self.mean
+            total = self.count + n
+            self.mean += delta * n / total
+            self.scatter += centered.T @ centered + np.outer(delta, delta) * self.count * n / total
+            self.count = total
+        self.batches += 1
+        return self
+
+    def fit(self, batches, checkpoint_path=None, checkpoint_every=1):
+        """
+        Consome um iterável (ou gerador) de lotes
+        :param checkpoint_path: grava o estado a cada checkpoint_every lotes e no final
+        :return: self
+        """
+        for batch in batches:
+            self.partial_fit(batch)
+            if checkpoint_path and self.batches % checkpoint_every == 0:
+                self.save(checkpoint_path)
+        if checkpoint_path:
+            self.save(checkpoint_path)
+        return self
+
+    def covariance(self):
+        """Matriz de covariância das amostras vistas até agora"""
+        if self.count < 2:
+            raise ValueError("São necessárias ao menos 2 amostras")
+        return self.scatter / (self.count - 1)
+
+    def components(self, k_components, solver='eigh'):
+        """
+        :param solver: 'eigh' ou 'eig' (ver principal_components)
+        :return: autovalores em ordem decrescente e os componentes (n_features x k)
+        """
+        return principal_components(self.covariance(), k_components, solver)
+
+    def total_variance(self):
+        """Soma de todos os autovalores (traço da covariância)"""
+        return float(np.trace(self.covariance()))
+
+    def save(self, path):
+        """
+        Grava o estado (checkpoint); a escrita é atômica, um checkpoint
+        interrompido no meio não substitui o anterior
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, version=self.CHECKPOINT_VERSION, count=self.count, batches=self.batches,
+                 mean=self.mean, scatter=self.scatter, source=self.source)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Retoma o estado gravado por save"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != cls.CHECKPOINT_VERSION:
+                raise ValueError(f"Versão {int(data['version'])} do checkpoint não suportada")
+            pca = cls(str(data['source']))
+            pca.count, pca.batches = int(data['count']), int(data['batches'])
+            pca.mean, pca.scatter = data['mean'].copy(), data['scatter'].copy()
+        return pca
+
+
+def pca_compress_stream(input_path, shape=None, k_components=30, output_dir='output',
+                        strip_rows=1024, reconstructed_path=None, solver='eigh', precision='int8'):
+    """
+    Compressão PCA lendo a imagem em faixas de linhas (duas passagens pelo arquivo)
+
+    A primeira passagem ajusta um IncrementalPCA faixa a faixa (média e
+    covariância das colunas); a segunda projeta cada faixa nos componentes. O pico de
+    memória depende de strip_rows * largura e da covariância (largura x largura),
+    nunca da altura da imagem.
+
+    :param input_path: imagem em tons de cinza (.npy ou raw uint8)
+    :param shape: (altura, largura), obrigatório para arquivos raw
+    :param k_components: número de componentes principais
+    :param output_dir: diretório onde compressed_data.pcaq é gravado
+    :param strip_rows: linhas por faixa
+    :param reconstructed_path: grava a imagem reconstruída (.npy ou raw), opcional
+    :param solver: 'eigh' ou 'eig' (ver principal_components)
+    :param precision: precisão de componentes e scores no arquivo (ver pca_container)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    image = open_image_memmap(input_path, shape)
+    height, width = image.shape
+
+    # 1. Primeira passagem: média e covariância das colunas (cada linha é uma amostra)
+    fitted = IncrementalPCA().fit(np.asarray(strip, dtype=np.float64) / 255.0
+                                  for _, strip in iter_strips(image, strip_rows))
+    mean = fitted.mean
+    _, components = fitted.components(k_components, solver)
+
+    # 2. Segunda passagem: projeção (scores) em um arquivo temporário no disco; a
+    # quantização int8 precisa do maior valor de cada coluna antes de gravar
+    fd, scores_path = tempfile.mkstemp(dir=output_dir, prefix='.scores-', suffix='.f32')
+    os.close(fd)
+    try:
+        scores = np.memmap(scores_path, dtype=np.float32, mode='w+', shape=(height, components.shape[1]))
+        for y, strip in iter_strips(image, strip_rows):
+            centered = np.asarray(strip, dtype=np.float32) / 255.0 - mean
+            scores[y:y + strip.shape[0]] = centered @ components
+        scores.flush()
+
+        # 3. Salvar dados comprimidos (mesmo formato de pca_compress), lendo os scores em blocos
+        compressed_path = os.path.join(output_dir, 'compressed_data.pcaq')
+        compressed_size = write_pca_file(compressed_path, mean, components, scores, precision)
+        del scores
+    finally:
+        os.remove(scores_path)
+
+    # 4. Reconstrução opcional, decodificando o próprio arquivo em faixas
+    if reconstructed_path:
+        pca_decompress(compressed_path, reconstructed_path, strip_rows)
+
     return {
-        'original': original_path,
         'compressed': compressed_path,
-        'reconstructed': reconstructed_path
+        'reconstructed': reconstructed_path,
+        'original_size': os.path.getsize(input_path),
+        'compressed_size': compressed_size
     }
 
 
+def pca_decompress(path, output_path=None, strip_rows=1024):
+    """
+    Decodifica um arquivo PCAQ gravado por pca_compress ou pca_compress_stream
+
+    O arquivo é lido com np.memmap; com output_path a reconstrução é feita em
+    faixas de linhas e gravada direto no disco, sem carregar os scores inteiros.
+
+    :param output_path: grava a imagem reconstruída (.npy ou raw); sem ele, retorna o array
+    :return: imagem uint8 (ou o np.memmap gravado em output_path)
+    """
+    container = read_pca_file(path)
+    height, width = container['height'], container['width']
+    if output_path is None:
+        return (reconstruct(container) * 255).astype(np.uint8)
+
+    image = create_image_memmap(output_path, (height, width))
+    for y in range(0, height, strip_rows):
+        rows = slice(y, min(y + strip_rows, height))
+        image[rows] = (reconstruct(container, rows) * 255).astype(np.uint8)
+    image.flush()
+    return image
+
+
+def pca_decompress_window(source, rows, cols, n_components=None):
+    """
+    Decodifica só uma janela de um arquivo PCAQ (acesso aleatório, para visualizadores)
+
+    :param source: caminho do arquivo ou o resultado de read_pca_file (reaproveitado
+                   entre chamadas para evitar reabrir o arquivo a cada movimento)
+    :param rows: (primeira, última + 1) linha da janela, ou um slice
+    :param cols: (primeira, última + 1) coluna da janela, ou um slice
+    :param n_components: número de componentes usados (padrão: todos)
+    :return: janela uint8
+    """
+    container = read_pca_file(source) if isinstance(source, (str, os.PathLike)) else source
+    rows = rows if isinstance(rows, slice) else slice(*rows)
+    cols = cols if isinstance(cols, slice) else slice(*cols)
+    return (reconstruct(container, rows, cols, n_components) * 255).astype(np.uint8)
+
+
+COLOR_CHANNELS = {'rgb': ('r', 'g', 'b'), 'ycbcr': ('y', 'cb', 'cr')}
+
+
+def to_color_planes(img, color_space='ycbcr'):
+    """
+    Converte uma imagem BGR (ordem do OpenCV) para os planos do espaço de cor
+    :param color_space: 'rgb' ou 'ycbcr' (JFIF, faixa completa; Cb e Cr centrados em 0.5)
+    :return: array float32 (H, W, 3) com valores em [0, 1], canais na ordem de COLOR_CHANNELS
+    """
+    img_float = img.astype(np.float32) / 255.0
+    if color_space == 'rgb':
+        return np.ascontiguousarray(img_float[..., ::-1])
+    if color_space == 'ycbcr':
+        return cv2.cvtColor(img_float, cv2.COLOR_BGR2YCrCb)[..., [0, 2, 1]]
+    raise ValueError(f"Espaço de cor desconhecido: {color_space!r} (use 'rgb' ou 'ycbcr')")
+
+
+def from_color_planes(planes, color_space='ycbcr'):
+    """Operação inversa de to_color_planes: imagem BGR uint8"""
+    if color_space == 'rgb':
+        img_float = planes[..., ::-1]
+    else:
+        img_float = cv2.cvtColor(np.ascontiguousarray(planes[..., [0, 2, 1]], dtype=np.float32),
+                                 cv2.COLOR_YCrCb2BGR)
+    return (np.clip(img_float, 0, 1) * 255).astype(np.uint8)
+
+
+def color_data_paths(output_dir, color_space='ycbcr', joint=False):
+    """
+    Arquivos PCAQ de uma imagem colorida: um por canal (compressed_data.y.pcaq, ...)
+    ou um só com a base conjunta (compressed_data.ycbcr.pcaq)
+    """
+    names = [color_space] if joint else COLOR_CHANNELS[color_space]
+    return [os.path.join(output_dir, f'compressed_data.{name}.pcaq') for name in names]
+
+
+def pca_compress_color(image_path, k_components=(30, 10, 10), output_dir='output', color_space='ycbcr',
+                       joint=False, workers=3, solver='auto', precision='int8', backend='auto', verbose=True,
+                       target_variance=None, target_psnr=None):
+    """
+    Compressão PCA de imagens coloridas
+
+    Dois modos:
+
+    - por canal (padrão): cada canal tem seu próprio PCA e seu próprio k; os
+      canais são decompostos em paralelo (threads; o NumPy libera o GIL), então
+      o tempo total fica próximo ao de uma passagem em tons de cinza. Em YCbCr
+      a crominância aceita k bem menor que a luminância;
+    - conjunto (joint=True): as linhas dos três canais são concatenadas
+      (largura 3W) e uma única base é compartilhada por eles.
+
+    :param k_components: k de cada canal (sequência de 3), um k para todos, ou 'auto'
+                         (ver pca_compress); no modo conjunto, um único k
+    :param color_space: 'ycbcr' ou 'rgb'
+    :param joint: usa uma base conjunta para os três canais
+    :param workers: threads usadas no modo por canal
+    :param solver, precision, backend: ver pca_compress
+    :param target_variance, target_psnr: metas do modo 'auto' (ver pca_compress), aplicadas
+                                         a cada plano do espaço de cor (ou aos planos
+                                         concatenados, no modo conjunto); em YCbCr o PSNR
+                                         da imagem BGR fica abaixo da meta, porque a
+                                         conversão amplifica o erro de Cb e Cr
+    :return: dicionário com as métricas (mesmas chaves de pca_compress; 'compressed' é a lista de arquivos)
+    """
+    start_time = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+
+    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f"Imagem não encontrada em {image_path}")
+    original_size = os.path.getsize(image_path)
+
+    planes = to_color_planes(img, color_space)
+    paths = color_data_paths(output_dir, color_space, joint)
+    backend = resolve_backend(backend, solver)
+
+    if joint:
+        if not (k_components == 'auto' or np.isscalar(k_components)):
+            raise ValueError("No modo conjunto use um único k_components")
+        stacked = np.concatenate([planes[..., channel] for channel in range(3)], axis=1)
+        fitted = [compress_plane(stacked, k_components, paths[0], solver, precision, backend,
+                                 target_variance, target_psnr)]
+    else:
+        if k_components == 'auto' or np.isscalar(k_components):
+            k_components = (k_components,) * 3
+        if len(k_components) != 3:
+            raise ValueError(f"Esperados 3 valores de k (um por canal), recebido {k_components!r}")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fitted = list(executor.map(
+                lambda channel: compress_plane(np.ascontiguousarray(planes[..., channel]), k_components[channel],
+                                               paths[channel], solver, precision, backend,
+                                               target_variance, target_psnr),
+                range(3)))
+
+    k_components = tuple(result['k_components'] for result in fitted)
+    compressed_size = sum(result['compressed_size'] for result in fitted)
+
+    reconstructed_img = pca_decompress_color(output_dir, color_space, joint)
+    reconstructed_path = os.path.join(output_dir, 'reconstructed_PCA_color.jpg')
+    cv2.imwrite(reconstructed_path, reconstructed_img)
+
+    psnr_value = psnr(img, reconstructed_img)
+    ssim_value = ssim(img, reconstructed_img, channel_axis=2)
+    compression_time = time.time() - start_time
+
+    if verbose:
+        print(f"\n{' RESULTADOS (COR) ':=^40}")
+        print(f"Original: {original_size / 1024:.1f} KB")
+        print(f"Comprimido: {compressed_size / 1024:.1f} KB")
+        print(f"Taxa de compressão: {original_size / compressed_size:.1f}x")
+        print(f"Componentes: {k_components} ({color_space}, {'base conjunta' if joint else 'por canal'})")
+
+    return {
+        'original': image_path,
+        'compressed': paths,
+        'reconstructed': reconstructed_path,
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'psnr': psnr_value,
+        'ssim': ssim_value,
+        'k_components': k_components,
+        'backend': backend,
+        'compression_time': compression_time
+    }
+
+
+def pca_decompress_color(output_dir, color_space='ycbcr', joint=False):
+    """
+    Decodifica os arquivos gravados por pca_compress_color
+    :return: imagem BGR uint8
+    """
+    containers = [read_pca_file(path) for path in color_data_paths(output_dir, color_space, joint)]
+    if joint:
+        stacked = reconstruct(containers[0])
+        width = containers[0]['width'] // 3
+        planes = np.stack([stacked[:, channel * width:(channel + 1) * width] for channel in range(3)], axis=-1)
+    else:
+        planes = np.stack([reconstruct(container) for container in containers], axis=-1)
+    return from_color_planes(planes, color_space)
+
+
+CODEBOOK_VERSION = 1  # versão do arquivo de codebook (base compartilhada de patches)
+
+
+def image_to_patches(img, patch_size=8):
+    """
+    Divide a imagem em patches quadrados, cada um virando uma amostra (linha)
+    :param img: imagem (H, W); as bordas são completadas repetindo a última linha/coluna
+    :return: array (n_patches, patch_size * patch_size) e o shape da imagem completada
+    """
+    pad_y, pad_x = -img.shape[0] % patch_size, -img.shape[1] % patch_size
+    padded = np.pad(img, ((0, pad_y), (0, pad_x)), mode='edge')
+    rows, cols = padded.shape[0] // patch_size, padded.shape[1] // patch_size
+    patches = padded.reshape(rows, patch_size, cols, patch_size).swapaxes(1, 2)
+    return patches.reshape(rows * cols, patch_size * patch_size), padded.shape
+
+
+def patches_to_image(patches, padded_shape, original_shape, patch_size=8):
+    """Operação inversa de image_to_patches, cortando o preenchimento das bordas"""
+    rows, cols = padded_shape[0] // patch_size, padded_shape[1] // patch_size
+    image = patches.reshape(rows, cols, patch_size, patch_size).swapaxes(1, 2).reshape(padded_shape)
+    return image[:original_shape[0], :original_shape[1]]
+
+
+def iter_image_patches(image_paths, patch_size=8, max_patches_per_image=None, seed=0, start=0):
+    """
+    Gera os patches de cada imagem, um lote por imagem (valores em [0, 1])
+    :param max_patches_per_image: amostra aleatória de patches por imagem (None = todos)
+    :param start: começa pela imagem de índice start, sem ler as anteriores; o
+                  sorteio de cada imagem depende só de (seed, índice), então o
+                  resultado é o mesmo de uma passagem completa
+    """
+    for index in range(start, len(image_paths)):
+        img = cv2.imread(image_paths[index], cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise FileNotFoundError(f"Imagem não encontrada em {image_paths[index]}")
+        patches, _ = image_to_patches(img.astype(np.float32) / 255.0, patch_size)
+        if max_patches_per_image and len(patches) > max_patches_per_image:
+            rng = np.random.default_rng((seed, index))
+            patches = patches[rng.choice(len(patches), max_patches_per_image, replace=False)]
+        yield patches
+
+
+def train_patch_codebook(image_paths, patch_size=8, k_components=16, codebook_path='output/codebook.npz',
+                         max_patches_per_image=None, solver='eigh', seed=0, checkpoint_path=None):
+    """
+    Aprende uma base PCA de patches, compartilhada por todas as imagens
+
+    As imagens são lidas uma por vez e acumuladas em um IncrementalPCA, então
+    o conjunto de treino não precisa caber na memória.
+
+    :param image_paths: imagens de treino (tons de cinza)
+    :param patch_size: lado do patch (8 ou 16, tipicamente)
+    :param k_components: número de componentes da base
+    :param codebook_path: arquivo .npz onde a base é gravada
+    :param max_patches_per_image: amostra aleatória de patches por imagem (None = todos)
+    :param solver: 'eigh' ou 'eig' (ver principal_components)
+    :param checkpoint_path: grava o estado após cada imagem; se o arquivo já existe,
+                            o treino continua de onde parou (as imagens já vistas não são
+                            lidas); o checkpoint só vale para a mesma lista de imagens, na
+                            mesma ordem, e os mesmos patch_size, max_patches_per_image e seed
+    :return: codebook (mesmo conteúdo de load_patch_codebook)
+    """
+    image_paths = list(image_paths)
+    source = hashlib.sha256(json.dumps([image_paths, patch_size, max_patches_per_image, seed]).encode()).hexdigest()
+    fitted = IncrementalPCA(source)
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        fitted = IncrementalPCA.load(checkpoint_path)
+        if fitted.source != source:
+            raise ValueError(f"O checkpoint {checkpoint_path} foi gravado com outra lista de imagens ou outros "
+                             f"parâmetros de patches; apague-o para recomeçar o treino")
+
+    fitted.fit(iter_image_patches(image_paths, patch_size, max_patches_per_image, seed, start=fitted.batches),
+               checkpoint_path)
+
+    eigenvalues, components = fitted.components(k_components, solver)
+    return save_patch_codebook(codebook_path, fitted.mean, components, eigenvalues[:k_components], patch_size)
+
+
+def save_patch_codebook(codebook_path, mean, components, eigenvalues, patch_size):
+    """
+    Grava a base de patches com versão e identificador (hash do conteúdo)
+    :return: codebook gravado
+    """
+    mean, components = mean.astype(np.float32), components.astype(np.float32)
+    codebook_id = hashlib.sha256(mean.tobytes() + components.tobytes()).hexdigest()[:16]
+    os.makedirs(os.path.dirname(codebook_path) or '.', exist_ok=True)
+    np.savez(codebook_path, version=CODEBOOK_VERSION, codebook_id=codebook_id, patch_size=patch_size,
+             mean=mean, components=components, eigenvalues=np.asarray(eigenvalues, dtype=np.float32))
+    return load_patch_codebook(codebook_path)
+
+
+def load_patch_codebook(codebook_path):
+    """
+    Lê uma base de patches gravada por train_patch_codebook
+    :return: dicionário com version, codebook_id, patch_size, mean, components e eigenvalues
+    """
+    with np.load(codebook_path, allow_pickle=False) as data:
+        codebook = {key: data[key] for key in data.files}
+    codebook['version'] = int(codebook['version'])
+    if codebook['version'] != CODEBOOK_VERSION:
+        raise ValueError(f"Versão {codebook['version']} do codebook não suportada")
+    codebook['codebook_id'] = str(codebook['codebook_id'])
+    codebook['patch_size'] = int(codebook['patch_size'])
+    return codebook
+
+
+def patch_pca_encode(image_path, codebook, output_path, precision='int8'):
+    """
+    Codifica uma imagem com a base compartilhada: uma única multiplicação de matrizes
+    :param image_path: imagem em tons de cinza
+    :param codebook: base de load_patch_codebook
+    :param output_path: arquivo .npz com os scores (a base não é copiada para ele)
+    :param precision: precisão dos scores, com as mesmas escalas por coluna do
+                      formato PCAQ (ver pca_container)
+    :return: caminho e tamanho do arquivo gravado
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisão desconhecida: {precision!r} (use {', '.join(PRECISIONS)})")
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(f"Imagem não encontrada em {image_path}")
+
+    patches, padded_shape = image_to_patches(img.astype(np.float32) / 255.0, codebook['patch_size'])
+    scores = (patches - codebook['mean']) @ codebook['components']
+    score_scales = column_scales(scores, precision)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    np.savez_compressed(output_path, codebook_id=codebook['codebook_id'], original_shape=img.shape,
+                        padded_shape=padded_shape, precision=precision, score_scales=score_scales,
+                        scores=quantize(scores, score_scales, precision))
+    return {'compressed': output_path, 'compressed_size': os.path.getsize(output_path)}
+
+
+def patch_pca_decode(path, codebook):
+    """
+    Reconstrói uma imagem codificada por patch_pca_encode
+    :return: imagem uint8
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if str(data['codebook_id']) != codebook['codebook_id']:
+            raise ValueError(f"{path} foi codificado com outro codebook ({data['codebook_id']})")
+        scores = data['scores'].astype(np.float32) * data['score_scales']
+        patches = scores @ codebook['components'].T + codebook['mean']
+        image = patches_to_image(patches, tuple(data['padded_shape']), tuple(data['original_shape']),
+                                 codebook['patch_size'])
+    return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
 # Exemplo de uso
 if __name__ == "__main__":
     # Configurações
@@ -1,108 +1,41 @@
-
-""""tem que baixar o CUDA da NVIDIA"""
-  # Importa a biblioteca PyTorch para computação tensorial com suporte a GPU
-
-import torch  # Importa a biblioteca PyTorch para computação tensorial com suporte a GPU
-import cv2
-import os
-import matplotlib.pyplot as plt
-import numpy as np
-
-
-def pca_gpu_compress(image_path, k_components=30, output_dir='output_gpu'):
-    """Compressão de imagem com PCA acelerado por GPU"""
-
-    # Criar diretório de saída
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 1. Carregar a imagem
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise FileNotFoundError(f"Imagem não encontrada em {image_path}")
-
-    original_size = os.path.getsize(image_path)
-
-    # 2. Converter para tensor GPU e normalizar
-    img_tensor = torch.from_numpy(img.astype(np.float32)).cuda() / 255.0
-
-    # 3. Calcular PCA na GPU
-    mean = torch.mean(img_tensor, dim=0)
-    centered = img_tensor - mean
-
-    # PCA via SVD (otimizado para GPU)
-    _, _, V = torch.pca_lowrank(centered, q=k_components)
-    components = V[:, :k_components]
-    scores = torch.matmul(centered, components)
-
-    # 4. Salvar dados comprimidos (convertendo para CPU/numpy)
-    compressed_path = os.path.join(output_dir, 'compressed_data.npz')
-    np.savez_compressed(
-        compressed_path,
-        mean=mean.cpu().numpy().astype(np.float32),
-        components=components.cpu().numpy().astype(np.float32),
-        scores=scores.cpu().numpy().astype(np.float32),
-        original_shape=img.shape
-    )
-    compressed_size = os.path.getsize(compressed_path)
-
-    # 5. Reconstruir imagem
-    reconstructed = torch.matmul(scores, components.T) + mean
-    reconstructed = torch.clamp(reconstructed, 0, 1)
-    reconstructed_img = (reconstructed.cpu().numpy() * 255).astype(np.uint8)
-
-    # 6. Salvar imagens
-    reconstructed_path = os.path.join(output_dir, 'reconstructed_PCA_GPU.jpg')
-    cv2.imwrite(reconstructed_path, reconstructed_img)
-
-    original_path = os.path.join(output_dir, 'original.jpg')
-    cv2.imwrite(original_path, img)
-
-    # 7. Mostrar resultados
-    print(f"\n{' RESULTADOS GPU ':=^40}")
-    print(f"Original: {original_size / 1024:.1f} KB")
-    print(f"Comprimido: {compressed_size / 1024:.1f} KB")
-    print(f"Taxa de compressão: {original_size / compressed_size:.1f}x")
-
-    # 8. Plotar comparação
-    eigenvalues = torch.sum(scores ** 2, dim=0) / (scores.shape[0] - 1)  # Autovalores aproximados
-
-    plt.figure(figsize=(12, 4))
-
-    plt.subplot(1, 3, 1)
-    plt.imshow(img, cmap='gray')
-    plt.title('Original')
-    plt.axis('off')
-
-    plt.subplot(1, 3, 2)
-    plt.imshow(reconstructed_img, cmap='gray')
-    plt.title(f'GPU Comprimida (k={k_components})')
-    plt.axis('off')
-
-    plt.subplot(1, 3, 3)
-    explained_variance = torch.cumsum(eigenvalues, dim=0) / torch.sum(eigenvalues)
-    plt.plot(explained_variance.cpu().numpy())
-    plt.axvline(k_components, color='r', linestyle='--')
-    plt.title('Variância Explicada (GPU)')
-    plt.xlabel('Componentes Principais')
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'comparison_gpu.png'))
-    plt.show()
-
-    return {
-        'original': original_path,
-        'compressed': compressed_path,
-        'reconstructed': reconstructed_path
-    }
+"""tem que baixar o CUDA da NVIDIA
+
+Compressão PCA na GPU. O cálculo fica em 1_comp_imagem_PCA.py (pca_compress)
+com o backend 'cuda'; sem GPU (ou sem PyTorch) o backend 'auto' cai para
+torch-cpu ou numpy, e o arquivo gerado (compressed_data.pcaq) é o mesmo.
+"""
+
+from carregar_script import load_script
+from pca_backend import available_backends, benchmark_backends
+
+
+def pca_gpu_compress(image_path, k_components=30, output_dir='output_gpu', show_plot=True, verbose=True,
+                     precision='int8', target_variance=None, target_psnr=None, max_bytes=None, backend='auto'):
+    """
+    Compressão de imagem com PCA acelerado por GPU, quando disponível
+    :param k_components: número de componentes ou 'auto' (ver pca_compress em 1_comp_imagem_PCA.py)
+    :param precision: precisão de componentes e scores no arquivo (ver pca_container)
+    :param target_variance, target_psnr, max_bytes: metas do modo 'auto'
+    :param backend: 'cuda', 'torch-cpu', 'numpy' ou 'auto' (GPU se houver, senão CPU)
+    :param show_plot: plota a comparação (e grava comparison.png); False não usa o matplotlib
+    :param verbose: imprime o resumo no terminal
+    """
+    pca = load_script('1_comp_imagem_PCA.py')
+    return pca.pca_compress(image_path, k_components, output_dir, show_plot, verbose, precision=precision,
+                            target_variance=target_variance, target_psnr=target_psnr, max_bytes=max_bytes,
+                            backend=backend)
 
 
 # Exemplo de uso
 if __name__ == "__main__":
+    import cv2
+    import numpy as np
+
     # Verificar se GPU está disponível
-    print(f"GPU disponível: {torch.cuda.is_available()}")
+    print(f"Backends disponíveis: {', '.join(available_backends())}")
 
     # Configurações
-    input_image = 'imgs/img_P.jpg'  # Substitua pelo seu caminho
+    input_image = 'imgs/kelry.jpeg'  # Substitua pelo seu caminho
     components = 100  # Número de componentes principais
 
     # Executar compressão
@@ -111,4 +44,10 @@ if __name__ == "__main__":
     print("\nArquivos salvos em:")
     print(f"- Original: {results['original']}")
     print(f"- Dados comprimidos: {results['compressed']}")
-    print(f"- Reconstruída: {results['reconstructed']}")
\ No newline at end of file
+    print(f"- Reconstruída: {results['reconstructed']}")
+
+    # Comparar os backends
+    img_float = cv2.imread(input_image, cv2.IMREAD_GRAYSCALE).astype(np.float32) / 255.0
+    print(f"\n{'backend':<10} {'tempo (ms)':>12} {'variância':>10}")
+    for row in benchmark_backends(img_float, k_components=components):
+        print(f"{row['backend']:<10} {row['time'] * 1000:>12.1f} {row['explained_variance']:>10.4f}")
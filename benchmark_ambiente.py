@@ -0,0 +1,34 @@
+"""
+Ambiente de execução dos benchmarks (benchmark_compressao, benchmark_rotas),
+gravado junto com os resultados para saber de onde veio cada medição.
+"""
+
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+from carregar_script import REPO_DIR
+
+
+def environment(**versions):
+    """
+    Commit e versões das bibliotecas
+    :param versions: versões de outras bibliotecas usadas pelo benchmark (ex.: opencv='4.9.0')
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        **versions,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
@@ -0,0 +1,293 @@
+"""
+Benchmark reprodutível dos codecs: DCT, PCA (em cada backend disponível) e o
+JPEG do OpenCV (cv2.imencode) como referência.
+
+As imagens de teste são geradas (sintéticas, com semente fixa) ou vêm de imgs/,
+redimensionadas para cada resolução pedida. Para cada imagem, codec e parâmetro
+(qualidade ou k) são medidos:
+
+- o tempo e a vazão (MB/s de pixels) da compressão, pelos mesmos pontos de
+  entrada usados no dia a dia (dct_compress, pca_compress e, nos backends
+  PyTorch, pca_gpu_compress), sem plotagem, e da decodificação do arquivo
+  gravado (melhor de N repetições);
+- o pico de memória alocada (tracemalloc, em uma execução separada);
+- os bytes gravados, PSNR e SSIM da imagem decodificada.
+
+O resultado é gravado em JSON, junto com o commit e as versões das bibliotecas,
+e pode ser comparado com o de outro commit para achar regressões.
+
+Exemplos:
+    python benchmark_compressao.py --sizes 256,512,1024 --output bench.json
+    python benchmark_compressao.py --baseline bench_main.json --output bench.json
+    python benchmark_compressao.py --results bench.json --baseline bench_main.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use('Agg')  # nunca abrir janelas, mesmo que algum código chame plt.show()
+
+import cv2
+import numpy as np
+from skimage.metrics import peak_signal_noise_ratio as psnr
+from skimage.metrics import structural_similarity as ssim
+
+from benchmark_ambiente import environment
+from carregar_script import REPO_DIR, load_script
+from compressao_lote import find_images
+from pca_backend import available_backends
+
+DEFAULT_SIZES = (256, 512, 1024)
+DEFAULT_QUALITIES = (25, 50, 75, 90)
+DEFAULT_K = (10, 30, 60)
+
+
+def synthetic_image(size, seed=0):
+    """
+    Imagem de teste em tons de cinza: gradiente, textura senoidal, retângulos e ruído
+    :param size: lado da imagem (quadrada)
+    :return: array uint8 (size, size)
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    image = 96 + 64 * x + 32 * y + 20 * np.sin(2 * np.pi * 12 * x) * np.cos(2 * np.pi * 7 * y)
+    for _ in range(12):
+        y0, x0 = rng.integers(0, size, 2)
+        h, w = rng.integers(size // 16, size // 4, 2)
+        image[y0:y0 + h, x0:x0 + w] = rng.uniform(0, 255)
+    image += rng.normal(0, 3, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def sample_images(sizes, bundled=True, synthetic=True):
+    """
+    Gera as imagens de teste
+    :param sizes: lados (maior dimensão) de cada resolução
+    :return: lista de (nome, imagem uint8)
+    """
+    images = []
+    for size in sizes:
+        if synthetic:
+            images.append(('sintetica', synthetic_image(size)))
+        if bundled:
+            for path in find_images(os.path.join(REPO_DIR, 'imgs')):
+                img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+                if img is None:
+                    continue
+                scale = size / max(img.shape)
+                resized = cv2.resize(img, (round(img.shape[1] * scale), round(img.shape[0] * scale)),
+                                     interpolation=cv2.INTER_AREA)
+                images.append((os.path.basename(path), resized))
+    return images
+
+
+def dct_pipeline(image_path, path, quality, block_size=8):
+    """Codec DCT: dct_compress (gravando o DCTB) e dct_decompress"""
+    dct = load_script('1_comp_imagem_DCT.py')
+
+    def compress(_):
+        dct.dct_compress(image_path, quality=quality, block_size=block_size, show_stats=False,
+                         output_path=path, show_plot=False)
+        return path
+
+    stages = [('compress', compress), ('decode', dct.dct_decompress)]
+    return stages, lambda: os.path.getsize(path)
+
+
+def pca_pipeline(image_path, output_dir, k_components, backend='numpy', precision='int8'):
+    """
+    Codec PCA: pca_compress (ou pca_gpu_compress nos backends PyTorch) e pca_decompress
+    """
+    pca = load_script('1_comp_imagem_PCA.py')
+    if backend == 'numpy':
+        compress_image = pca.pca_compress
+    else:
+        compress_image = load_script('1_comp_imagem_PCA_RTX_3050.py').pca_gpu_compress
+
+    def compress(_):
+        return compress_image(image_path, k_components, output_dir, show_plot=False, verbose=False,
+                              precision=precision, backend=backend)['compressed']
+
+    stages = [('compress', compress), ('decode', pca.pca_decompress)]
+    return stages, lambda: os.path.getsize(os.path.join(output_dir, 'compressed_data.pcaq'))
+
+
+def jpeg_pipeline(img, quality):
+    """Referência: JPEG do OpenCV (libjpeg), codificação e decodificação em memória"""
+    encoded = {}
+
+    def encode(_):
+        ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError("cv2.imencode falhou")
+        encoded['buffer'] = buffer
+        return buffer
+
+    def decode(buffer):
+        return cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+
+    return [('encode', encode), ('decode', decode)], lambda: len(encoded['buffer'])
+
+
+def run_pipeline(stages):
+    """Executa as etapas em sequência; :return: (saída final, segundos por etapa)"""
+    state, seconds = None, {}
+    for name, stage in stages:
+        start_time = time.perf_counter()
+        state = stage(state)
+        seconds[name] = time.perf_counter() - start_time
+    return state, seconds
+
+
+def measure(img, stages, size_of, repeats=3):
+    """
+    Mede um pipeline: melhor tempo de cada etapa, pico de memória, bytes e qualidade
+    :return: dicionário com stages, total_seconds, total_mb_per_s, peak_memory_bytes,
+             bytes, bits_per_pixel, psnr e ssim
+    """
+    megabytes = img.nbytes / 1e6
+    best = {}
+    for _ in range(repeats):
+        decoded, seconds = run_pipeline(stages)
+        for name, value in seconds.items():
+            best[name] = min(best.get(name, np.inf), value)
+
+    tracemalloc.start()
+    run_pipeline(stages)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total_seconds = sum(best.values())
+    compressed_bytes = size_of()
+    return {
+        'stages': {name: {'seconds': value, 'mb_per_s': megabytes / value if value else None}
+                   for name, value in best.items()},
+        'total_seconds': total_seconds,
+        'total_mb_per_s': megabytes / total_seconds if total_seconds else None,
+        'peak_memory_bytes': peak_memory,
+        'bytes': compressed_bytes,
+        'bits_per_pixel': 8 * compressed_bytes / img.size,
+        'psnr': float(psnr(img, decoded)),
+        'ssim': float(ssim(img, decoded)),
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, codecs=('dct', 'pca', 'jpeg'), qualities=DEFAULT_QUALITIES,
+                  k_values=DEFAULT_K, pca_backends=None, repeats=3, bundled=True, synthetic=True, log=sys.stderr):
+    """
+    Roda todas as combinações de imagem, codec e parâmetro
+    :param pca_backends: backends do PCA (padrão: todos os disponíveis, ver pca_backend)
+    :return: lista de resultados (um dicionário por combinação)
+    """
+    pca_backends = pca_backends or available_backends()
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, img in sample_images(sizes, bundled, synthetic):
+            # Os codecs leem a imagem do disco; o PNG não tem perdas, então img é a referência
+            image_path = os.path.join(temp_dir, 'entrada.png')
+            cv2.imwrite(image_path, img)
+            runs = []
+            if 'dct' in codecs:
+                runs += [('dct', {'quality': q}, dct_pipeline(image_path, os.path.join(temp_dir, 'b.dctb'), q))
+                         for q in qualities]
+            if 'pca' in codecs:
+                runs += [('pca', {'k': k, 'backend': backend},
+                          pca_pipeline(image_path, os.path.join(temp_dir, 'pca'), k, backend))
+                         for backend in pca_backends for k in k_values if k <= min(img.shape)]
+            if 'jpeg' in codecs:
+                runs += [('jpeg', {'quality': q}, jpeg_pipeline(img, q)) for q in qualities]
+
+            for codec, params, (stages, size_of) in runs:
+                result = {'image': name, 'height': img.shape[0], 'width': img.shape[1],
+                          'codec': codec, 'params': params}
+                result.update(measure(img, stages, size_of, repeats))
+                results.append(result)
+                print(f"{name} {img.shape[1]}x{img.shape[0]} {codec} {params}: "
+                      f"{result['total_mb_per_s']:.1f} MB/s, {result['bytes']} bytes, "
+                      f"PSNR {result['psnr']:.2f}", file=log)
+    return results
+
+
+def result_key(result):
+    """Identifica a mesma medição em execuções diferentes"""
+    return (result['image'], result['height'], result['width'], result['codec'],
+            json.dumps(result['params'], sort_keys=True))
+
+
+def compare_results(baseline, current, threshold=0.10, out=sys.stdout):
+    """
+    Compara duas execuções (conteúdo dos arquivos JSON)
+    :param threshold: variação relativa de tempo considerada regressão (0.10 = 10% mais lento)
+    :return: número de regressões (tempo, bytes a mais ou PSNR mais baixo)
+    """
+    base = {result_key(result): result for result in baseline['results']}
+    print(f"Comparando {baseline['environment'].get('commit')} -> {current['environment'].get('commit')}",
+          file=out)
+    print(f"{'imagem':<24} {'codec':<5} {'parâmetros':<28} {'tempo':>8} {'bytes':>8} {'ΔPSNR':>7}", file=out)
+    regressions = 0
+    for result in current['results']:
+        old = base.get(result_key(result))
+        if old is None:
+            continue
+        time_ratio = result['total_seconds'] / old['total_seconds']
+        size_ratio = result['bytes'] / old['bytes']
+        psnr_delta = result['psnr'] - old['psnr']
+        regression = time_ratio > 1 + threshold or size_ratio > 1.001 or psnr_delta < -0.01
+        regressions += regression
+        label = f"{result['image']} {result['width']}x{result['height']}"
+        params = json.dumps(result['params'], sort_keys=True)
+        print(f"{label:<24} {result['codec']:<5} {params:<28} {time_ratio:>7.2f}x {size_ratio:>7.3f}x "
+              f"{psnr_delta:>+7.2f}{'  REGRESSÃO' if regression else ''}", file=out)
+    return regressions
+
+
+def parse_list(value, cast=int):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos codecs DCT, PCA e JPEG (OpenCV)")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="maior dimensão de cada resolução, separadas por vírgula")
+    parser.add_argument('--codecs', default='dct,pca,jpeg', help="codecs medidos (dct, pca, jpeg)")
+    parser.add_argument('--qualities', default=','.join(map(str, DEFAULT_QUALITIES)),
+                        help="qualidades da DCT e do JPEG")
+    parser.add_argument('--k', default=','.join(map(str, DEFAULT_K)), help="componentes do PCA")
+    parser.add_argument('--pca-backends', default=None, help="backends do PCA (padrão: todos os disponíveis)")
+    parser.add_argument('--repeats', type=int, default=3, help="repetições (vale o melhor tempo)")
+    parser.add_argument('--no-bundled', action='store_true', help="não usa as imagens de imgs/")
+    parser.add_argument('--no-synthetic', action='store_true', help="não usa as imagens sintéticas")
+    parser.add_argument('--output', default='benchmark.json', help="arquivo JSON com os resultados")
+    parser.add_argument('--results', help="não roda o benchmark: usa este JSON como execução atual")
+    parser.add_argument('--baseline', help="JSON de outra execução para comparar")
+    parser.add_argument('--threshold', type=float, default=0.10, help="tolerância de tempo na comparação")
+    args = parser.parse_args(argv)
+
+    if args.results:
+        with open(args.results, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        results = run_benchmark(parse_list(args.sizes), parse_list(args.codecs, str), parse_list(args.qualities),
+                                parse_list(args.k), args.pca_backends and parse_list(args.pca_backends, str),
+                                args.repeats, not args.no_bundled, not args.no_synthetic)
+        current = {'environment': environment(opencv=cv2.__version__), 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=1)
+        print(f"Resultados gravados em {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        return 1 if compare_results(baseline, current, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
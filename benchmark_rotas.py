@@ -0,0 +1,169 @@
+"""
+Benchmark das consultas de rota ponto a ponto: Dijkstra (com parada no
+destino), A* e contraction hierarchies (grafo_ch), em grafos sintéticos com
+semente fixa:
+
+- grade: malha quadrada com pesos aleatórios (pior caso para as CH: não há
+  vias principais, todos os caminhos são parecidos);
+- geométrico: pontos aleatórios no quadrado, ligados aos vizinhos dentro de um
+  raio, com peso = distância x fator aleatório (próximo de uma malha viária).
+
+Para cada grafo são medidos o tempo de pré-processamento, o número de atalhos
+e o tamanho do índice, e, em consultas entre pares aleatórios, a mediana do
+tempo e dos vértices expandidos de cada método. Toda consulta confere se os
+três métodos chegam à mesma distância.
+
+Exemplos:
+    python benchmark_rotas.py --grid 50,100,200 --geometric 10000,50000 --output rotas.json
+    python benchmark_rotas.py --grid 100 --geometric 0 --queries 50
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from benchmark_ambiente import environment
+from grafo_ch import ContractionHierarchy
+from grafo_csr import CSRGraph, astar, shortest_path_tree
+
+DEFAULT_GRID_SIDES = (50, 100)
+DEFAULT_GEOMETRIC_NODES = (10000, 50000)
+GEOMETRIC_DEGREE = 8  # grau médio dos grafos geométricos
+
+
+def grid_graph(side, seed=0):
+    """
+    Grade side x side, com arestas nos dois sentidos e pesos aleatórios em [1, 2)
+    """
+    rng = np.random.default_rng(seed)
+    nodes = np.arange(side * side).reshape(side, side)
+    sources = np.concatenate([nodes[:, :-1].ravel(), nodes[:-1, :].ravel()])
+    targets = np.concatenate([nodes[:, 1:].ravel(), nodes[1:, :].ravel()])
+    graph = CSRGraph.from_edges(sources, targets, 1 + rng.random(len(sources)),
+                                [str(node) for node in range(side * side)], undirected=True)
+    rows, cols = np.divmod(np.arange(side * side), side)
+    return graph.set_coordinates(np.column_stack([rows, cols]).astype(np.float64))
+
+
+def geometric_graph(n_nodes, degree=GEOMETRIC_DEGREE, seed=0):
+    """
+    Grafo geométrico aleatório: n pontos no quadrado [0, 1000)², cada um ligado
+    aos pontos a menos de um raio escolhido para dar o grau médio pedido
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.random((n_nodes, 2)) * 1000
+    radius = 1000 * math.sqrt(degree / (math.pi * n_nodes))
+    # Pares com |dx| < raio: compara cada ponto com os seguintes na ordem de x
+    order = np.argsort(points[:, 0])
+    sorted_points = points[order]
+    sources, targets = [], []
+    for offset in range(1, n_nodes):
+        dx = sorted_points[offset:, 0] - sorted_points[:-offset, 0]
+        if dx.min() >= radius:
+            break
+        close = np.hypot(dx, sorted_points[offset:, 1] - sorted_points[:-offset, 1]) < radius
+        sources.append(order[:-offset][close])
+        targets.append(order[offset:][close])
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+    lengths = np.hypot(*(points[sources] - points[targets]).T)
+    weights = lengths * (1 + 0.5 * rng.random(len(lengths)))  # vias mais rápidas e mais lentas
+    graph = CSRGraph.from_edges(sources, targets, weights, [str(node) for node in range(n_nodes)], undirected=True)
+    return graph.set_coordinates(points)
+
+
+def sample_graphs(grid_sides=DEFAULT_GRID_SIDES, geometric_nodes=DEFAULT_GEOMETRIC_NODES):
+    """:return: lista de (tipo, grafo)"""
+    graphs = [('grade', grid_graph(side)) for side in grid_sides if side > 0]
+    graphs += [('geométrico', geometric_graph(n_nodes)) for n_nodes in geometric_nodes if n_nodes > 0]
+    return graphs
+
+
+def same_distance(a, b):
+    return a == b or math.isclose(a, b, rel_tol=1e-9)
+
+
+def run_queries(graph, index, n_queries=100, seed=0):
+    """
+    Consultas entre pares aleatórios com os três métodos
+    :return: dicionário método -> {'ms': tempos, 'expanded': vértices expandidos}
+    """
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, graph.n_nodes, size=(n_queries, 2)).tolist()
+    methods = {
+        'dijkstra': lambda s, t: shortest_path_tree(graph, s, t),
+        'astar': lambda s, t: astar(graph, s, t),
+    }
+    stats = {name: {'ms': [], 'expanded': []} for name in ('dijkstra', 'astar', 'ch')}
+    for source, target in pairs:
+        distances = {}
+        for name, search in methods.items():
+            start = time.perf_counter()
+            tree = search(source, target)
+            stats[name]['ms'].append((time.perf_counter() - start) * 1000)
+            stats[name]['expanded'].append(tree.expanded)
+            distances[name] = tree.distance(target)
+        start = time.perf_counter()
+        _, distances['ch'], expanded = index.query(source, target)
+        stats['ch']['ms'].append((time.perf_counter() - start) * 1000)
+        stats['ch']['expanded'].append(expanded)
+        if not all(same_distance(distance, distances['dijkstra']) for distance in distances.values()):
+            raise AssertionError(f"Distâncias diferentes de {source} a {target}: {distances}")
+    return stats
+
+
+def run_benchmark(grid_sides=DEFAULT_GRID_SIDES, geometric_nodes=DEFAULT_GEOMETRIC_NODES, n_queries=100,
+                  verbose=True):
+    results = []
+    for kind, graph in sample_graphs(grid_sides, geometric_nodes):
+        start = time.perf_counter()
+        index = ContractionHierarchy.build(graph)
+        build_time = time.perf_counter() - start
+        stats = run_queries(graph, index, n_queries)
+        result = {
+            'graph': kind,
+            'nodes': graph.n_nodes,
+            'edges': graph.n_edges,
+            'build_s': build_time,
+            'shortcuts': index.n_shortcuts,
+            'index_bytes': index.nbytes(),
+            'queries': n_queries,
+        }
+        for name, values in stats.items():
+            result[f'{name}_ms'] = float(np.median(values['ms']))
+            result[f'{name}_expanded'] = float(np.median(values['expanded']))
+        result['speedup'] = result['dijkstra_ms'] / result['ch_ms']
+        results.append(result)
+        if verbose:
+            print(f"{kind:<11} {graph.n_nodes:>8} vértices  pré-processamento {build_time:>7.1f} s  "
+                  f"dijkstra {result['dijkstra_ms']:>8.2f} ms  A* {result['astar_ms']:>8.2f} ms  "
+                  f"CH {result['ch_ms']:>6.2f} ms ({result['speedup']:.0f}x)", file=sys.stderr)
+    return results
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de Dijkstra, A* e contraction hierarchies")
+    parser.add_argument('--grid', default=','.join(map(str, DEFAULT_GRID_SIDES)),
+                        help="lados das grades, separados por vírgula (0 para nenhuma)")
+    parser.add_argument('--geometric', default=','.join(map(str, DEFAULT_GEOMETRIC_NODES)),
+                        help="vértices dos grafos geométricos, separados por vírgula (0 para nenhum)")
+    parser.add_argument('--queries', type=int, default=100, help="consultas por grafo")
+    parser.add_argument('--output', default='benchmark_rotas.json', help="arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(parse_list(args.grid), parse_list(args.geometric), args.queries)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1, ensure_ascii=False)
+    print(f"Resultados gravados em {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Cache de resultados de compressão endereçado pelo conteúdo.
+
+A chave é o SHA-256 de: bytes da imagem, codec, parâmetros e versão do código
+do codec (hash dos arquivos-fonte). Mudar qualquer um deles gera outra chave,
+então uma entrada nunca fica desatualizada, só deixa de ser usada.
+
+Cada entrada tem dois arquivos no diretório do cache:
+
+    <chave>.data   o arquivo comprimido (DCTB ou PCAQ)
+    <chave>.json   as métricas; gravado por último, marca a entrada como completa
+
+Os dois são gravados em um arquivo temporário no mesmo diretório e movidos
+com os.replace (atômico), de modo que processos concorrentes nunca veem
+arquivos pela metade. O tamanho total é limitado: as entradas usadas há mais
+tempo (LRU, pela data de modificação do .json, atualizada a cada acerto) são
+removidas primeiro. Arquivos órfãos deixados por um processo interrompido (um
+.data sem .json, temporários .tmp-*) também são removidos, depois de
+ORPHAN_GRACE_SECONDS, para não apagar uma entrada que outro processo ainda grava.
+
+dct_compress e pca_compress aceitam cache_dir e consultam o cache antes de
+comprimir; compressao_lote repassa o seu.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+
+from carregar_script import REPO_DIR
+
+# Arquivos-fonte de cada codec; o hash deles é a versão do código na chave
+CODEC_SOURCES = {
+    'dct': ('1_comp_imagem_DCT.py', 'dct_bitstream.py'),
+    'pca': ('1_comp_imagem_PCA.py', 'pca_backend.py', 'pca_container.py'),
+}
+CHUNK_SIZE = 1 << 20
+ORPHAN_GRACE_SECONDS = 600  # idade mínima de um arquivo órfão antes de ser removido
+
+
+def file_digest(path):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version(codec):
+    """Hash dos arquivos-fonte do codec (muda a cada alteração no código)"""
+    digest = hashlib.sha256()
+    for filename in CODEC_SOURCES[codec]:
+        digest.update(file_digest(os.path.join(REPO_DIR, filename)).encode())
+    return digest.hexdigest()[:16]
+
+
+def atomic_write(path, write):
+    """
+    Grava um arquivo de forma atômica
+    :param write: função que recebe o arquivo temporário aberto em modo binário
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(temp_path, 0o644)  # mkstemp cria com 0600
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_copy(source, destination):
+    """Copia um arquivo; quem lê o destino vê o arquivo antigo ou o novo, completo"""
+    with open(source, 'rb') as src:
+        atomic_write(destination, lambda dst: shutil.copyfileobj(src, dst, CHUNK_SIZE))
+
+
+class ResultCache:
+    """Cache de arquivos comprimidos e métricas, com limite de tamanho (LRU)"""
+
+    def __init__(self, cache_dir='.cache_compressao', max_bytes=1 << 30):
+        """
+        :param cache_dir: diretório das entradas
+        :param max_bytes: tamanho máximo somado de todas as entradas
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, image_path, codec, params):
+        """Chave da entrada: imagem, codec, parâmetros e versão do código"""
+        description = json.dumps({'image': file_digest(image_path), 'codec': codec, 'params': params,
+                                  'code_version': code_version(codec)}, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.data', base + '.json'
+
+    def get(self, key):
+        """
+        Procura uma entrada
+
+        Outro processo pode remover a entrada a qualquer momento (evict): quem
+        copia o arquivo devolvido deve tratar FileNotFoundError como ausência.
+        :return: (caminho do arquivo comprimido, métricas) ou None
+        """
+        data_path, metrics_path = self._paths(key)
+        try:
+            with open(metrics_path, encoding='utf-8') as f:
+                metrics = json.load(f)
+            os.utime(metrics_path)  # marca o uso recente (LRU)
+        except OSError:  # ausente ou removida por outro processo durante a leitura
+            return None
+        if not os.path.exists(data_path):  # removida por outro processo entre as duas leituras
+            return None
+        return data_path, metrics
+
+    def fetch(self, key, destination):
+        """
+        Copia o arquivo comprimido de uma entrada para destination
+        :return: métricas, ou None se a entrada não existe (ou foi removida por outro
+                 processo antes da cópia)
+        """
+        hit = self.get(key)
+        if hit is None:
+            return None
+        data_path, metrics = hit
+        try:
+            atomic_copy(data_path, destination)
+        except FileNotFoundError:
+            return None
+        return metrics
+
+    def put(self, key, compressed_path, metrics):
+        """
+        Guarda o arquivo comprimido e as métricas; remove entradas antigas se passar do limite
+        """
+        data_path, metrics_path = self._paths(key)
+        atomic_copy(compressed_path, data_path)
+        atomic_write(metrics_path, lambda f: f.write(json.dumps(metrics, ensure_ascii=False).encode('utf-8')))
+        self.evict()
+
+    def entries(self):
+        """Entradas completas: lista de (último uso, tamanho em bytes, chave)"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json') or name.startswith('.tmp-'):
+                continue
+            key = name[:-len('.json')]
+            data_path, metrics_path = self._paths(key)
+            try:
+                size = os.path.getsize(data_path) + os.path.getsize(metrics_path)
+                result.append((os.path.getmtime(metrics_path), size, key))
+            except FileNotFoundError:
+                continue
+        return result
+
+    def orphans(self):
+        """
+        Arquivos que não pertencem a nenhuma entrada completa (.data sem .json e
+        temporários), modificados há mais de ORPHAN_GRACE_SECONDS
+        """
+        result = []
+        deadline = time.time() - ORPHAN_GRACE_SECONDS
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            is_orphan = name.startswith('.tmp-') or (
+                name.endswith('.data') and not os.path.exists(path[:-len('.data')] + '.json'))
+            try:
+                if is_orphan and os.path.getmtime(path) < deadline:
+                    result.append(path)
+            except FileNotFoundError:
+                continue
+        return result
+
+    def evict(self):
+        """
+        Remove os arquivos órfãos e as entradas usadas há mais tempo até o total
+        caber em max_bytes
+        """
+        for path in self.orphans():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            # O .json sai primeiro: a entrada deixa de ser válida antes de perder os dados
+            for path in reversed(self._paths(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
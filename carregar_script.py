@@ -0,0 +1,34 @@
+"""
+Carrega os scripts numerados do repositório (ex.: 1_comp_imagem_DCT.py) como
+módulos. Nomes que começam com dígito não podem ser usados em 'import'.
+"""
+
+import importlib.util
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename, module_name=None):
+    """
+    Importa um script do repositório pelo nome do arquivo
+    :param filename: nome do arquivo, relativo à raiz do repositório
+    :param module_name: nome registrado em sys.modules (padrão: nome do arquivo sem .py)
+    :return: módulo carregado (reaproveitado se já estiver em sys.modules)
+    """
+    module_name = module_name or os.path.splitext(os.path.basename(filename))[0]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    # Registrado antes de executar para que funções do módulo possam ser
+    # serializadas (pickle) ao rodar em um ProcessPoolExecutor
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
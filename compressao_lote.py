@@ -0,0 +1,291 @@
+"""
+Compressão em lote, sem interface gráfica, de todas as imagens de um diretório
+(ou de um padrão glob) com o codec DCT ou PCA.
+
+Cada imagem processada gera uma linha JSON (JSONL) com tamanhos, PSNR, SSIM e
+tempos. Imagens cuja saída já existe, é mais nova que a entrada e foi gerada
+com o mesmo codec e parâmetros (registrados em <saída>.params.json) são
+puladas, o que permite retomar um lote interrompido. Cada saída é gravada em um
+arquivo temporário e movida com os.replace: um processo interrompido nunca
+deixa um arquivo comprimido pela metade. Com --cache-dir, resultados de
+execuções anteriores (mesma imagem, codec, parâmetros e versão do código) são
+copiados do cache em vez de recalculados, mesmo em outro diretório de saída.
+
+Exemplos:
+    python compressao_lote.py imgs --codec dct --quality 30 --output-dir saida
+    python compressao_lote.py "fotos/*.jpg" --codec pca --k 80 --jobs 8 --jsonl metricas.jsonl
+    python compressao_lote.py imgs --cache-dir ~/.cache/compressao --cache-max-mb 500
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use('Agg')  # nunca abrir janelas, mesmo que algum código chame plt.show()
+
+from cache_resultados import atomic_write
+from carregar_script import load_script
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def find_images(source):
+    """
+    Lista as imagens de um diretório ou de um padrão glob
+    :param source: diretório (busca recursiva) ou padrão como 'fotos/*.jpg'
+    :return: caminhos ordenados
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '**', '*')
+        candidates = glob.glob(pattern, recursive=True)
+    else:
+        candidates = glob.glob(source, recursive=True)
+    return sorted(p for p in candidates if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+
+
+def glob_root(pattern):
+    """Parte inicial do padrão sem curingas (ex.: 'fotos/2024' em 'fotos/2024/*.jpg')"""
+    parts = []
+    for part in pattern.split(os.sep):
+        if any(c in part for c in '*?['):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or '.'
+
+
+def output_path_for(image_path, source, output_dir, codec):
+    """Caminho de saída que espelha a estrutura de diretórios da entrada"""
+    base = source if os.path.isdir(source) else glob_root(source)
+    relative = os.path.relpath(image_path, base)
+    stem = os.path.splitext(relative)[0]
+    if codec == 'dct':
+        return os.path.join(output_dir, stem + '.dctb')
+    return os.path.join(output_dir, stem, 'compressed_data.pcaq')
+
+
+def settings_path_for(output_path):
+    """Arquivo com o codec e os parâmetros usados para gerar a saída"""
+    return output_path + '.params.json'
+
+
+def output_settings(codec, params):
+    """Codec e parâmetros serializados (tuplas viram listas, como ao reler o JSON)"""
+    return json.dumps({'codec': codec, 'params': params}, sort_keys=True)
+
+
+def is_up_to_date(image_path, output_path, codec, params):
+    """
+    A saída existe, foi gravada depois da última alteração da imagem e com o
+    mesmo codec e parâmetros
+    """
+    if not os.path.exists(output_path) or os.path.getmtime(output_path) < os.path.getmtime(image_path):
+        return False
+    try:
+        with open(settings_path_for(output_path), encoding='utf-8') as f:
+            return json.dumps(json.load(f), sort_keys=True) == output_settings(codec, params)
+    except (OSError, ValueError):
+        return False
+
+
+def publish_output(output_path, codec, params, write):
+    """
+    Grava a saída de forma atômica e registra codec e parâmetros
+    :param write: função que recebe o caminho temporário e grava a saída nele
+    """
+    settings_path = settings_path_for(output_path)
+    # O registro antigo sai antes: uma interrupção no meio nunca deixa saída nova com parâmetros velhos
+    if os.path.exists(settings_path):
+        os.remove(settings_path)
+    temp_path = os.path.join(os.path.dirname(output_path) or '.',
+                             f'.tmp-{os.getpid()}-{os.path.basename(output_path)}')
+    try:
+        write(temp_path)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    settings = output_settings(codec, params)
+    atomic_write(settings_path, lambda f: f.write(settings.encode('utf-8')))
+
+
+def compress_one(image_path, output_path, codec, params, cache_dir=None, cache_max_bytes=1 << 30):
+    """
+    Comprime uma imagem (executado em um processo do pool)
+    :param cache_dir: diretório do cache de resultados, repassado ao codec (ver
+                      cache_resultados); uma imagem já comprimida com o mesmo codec,
+                      parâmetros e versão do código é copiada do cache em vez de recomprimida
+    :param cache_max_bytes: tamanho máximo do cache
+    :return: dicionário com as métricas, pronto para virar uma linha JSON
+    """
+    start_time = time.time()
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    results = {}
+    if codec == 'dct':
+        dct = load_script('1_comp_imagem_DCT.py')
+
+        def write(temp_path):
+            results['dct'] = dct.dct_compress(image_path, quality=params['quality'], block_size=params['block_size'],
+                                              show_stats=False, output_path=temp_path, color=params['color'],
+                                              subsampling=params['subsampling'], show_plot=False,
+                                              cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+
+        publish_output(output_path, codec, params, write)
+        result = results['dct']
+        original_bytes = result['original_size'] * 1024
+        compressed_bytes = result['compressed_size'] * 1024
+    else:
+        pca = load_script('1_comp_imagem_PCA.py')
+        output_dir = os.path.dirname(output_path)
+
+        def write(temp_path):
+            # pca_compress grava em um diretório; as imagens auxiliares vão direto para o destino
+            work_dir = tempfile.mkdtemp(dir=output_dir, prefix='.tmp-')
+            try:
+                results['pca'] = pca.pca_compress(
+                    image_path, k_components=params['k'], output_dir=work_dir, show_plot=False, verbose=False,
+                    precision=params['precision'], target_variance=params['target_variance'],
+                    target_psnr=params['target_psnr'], max_bytes=params['max_bytes'],
+                    cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+                os.replace(os.path.join(work_dir, 'compressed_data.pcaq'), temp_path)
+                for name in os.listdir(work_dir):
+                    os.replace(os.path.join(work_dir, name), os.path.join(output_dir, name))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        publish_output(output_path, codec, params, write)
+        result = results['pca']
+        original_bytes = result['original_size']
+        compressed_bytes = result['compressed_size']
+
+    record = {
+        'image': image_path,
+        'output': output_path,
+        'codec': codec,
+        'status': 'ok',
+        'params': params,
+        'original_bytes': int(original_bytes),
+        'compressed_bytes': int(compressed_bytes),
+        'ratio': original_bytes / compressed_bytes if compressed_bytes else None,
+        'psnr': float(result['psnr']),
+        'ssim': float(result['ssim']),
+        'codec_time': result['compression_time'],
+        'total_time': time.time() - start_time,
+        'cached': result['cached'],
+    }
+    if codec == 'pca':
+        record['k_components'] = int(result['k_components'])
+    return record
+
+
+def run_batch(source, codec='dct', output_dir='output_lote', params=None, jobs=None, force=False, out=sys.stdout,
+              cache_dir=None, cache_max_bytes=1 << 30):
+    """
+    Processa todas as imagens em paralelo, emitindo uma linha JSON por imagem
+    :param source: diretório ou padrão glob de entrada
+    :param codec: 'dct' ou 'pca'
+    :param output_dir: diretório de saída
+    :param params: parâmetros do codec (quality, block_size, color, subsampling, k)
+    :param jobs: número de processos (padrão: número de CPUs)
+    :param force: recomprime mesmo as imagens com saída atualizada
+    :param out: arquivo de texto onde as linhas JSON são gravadas
+    :param cache_dir: diretório do cache de resultados (None desativa; ver compress_one)
+    :param cache_max_bytes: tamanho máximo do cache
+    :return: contagem de imagens por status
+    """
+    params = params or {}
+    counts = {'ok': 0, 'skipped': 0, 'error': 0}
+
+    def emit(record):
+        counts[record['status']] += 1
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+
+    pending = []
+    for image_path in find_images(source):
+        output_path = output_path_for(image_path, source, output_dir, codec)
+        if not force and is_up_to_date(image_path, output_path, codec, params):
+            emit({'image': image_path, 'output': output_path, 'codec': codec, 'status': 'skipped'})
+        else:
+            pending.append((image_path, output_path))
+
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = {pool.submit(compress_one, image_path, output_path, codec, params, cache_dir, cache_max_bytes):
+                   (image_path, output_path)
+                   for image_path, output_path in pending}
+        for future in as_completed(futures):
+            image_path, output_path = futures[future]
+            try:
+                emit(future.result())
+            except Exception as error:
+                emit({'image': image_path, 'output': output_path, 'codec': codec,
+                      'status': 'error', 'error': f"{type(error).__name__}: {error}"})
+    return counts
+
+
+def component_count(value):
+    """Argumento --k: inteiro positivo ou 'auto'"""
+    if value == 'auto':
+        return value
+    try:
+        count = int(value)
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"esperado inteiro positivo ou 'auto', recebido {value!r}")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressão em lote (DCT ou PCA) com métricas em JSONL")
+    parser.add_argument('source', help="diretório de imagens ou padrão glob (ex.: 'fotos/*.jpg')")
+    parser.add_argument('--codec', choices=['dct', 'pca'], default='dct')
+    parser.add_argument('--output-dir', default='output_lote')
+    parser.add_argument('--quality', type=int, default=50, help="qualidade da DCT (1-100)")
+    parser.add_argument('--block-size', type=int, default=8, help="tamanho do bloco da DCT")
+    parser.add_argument('--color', action='store_true', help="DCT colorida (YCbCr)")
+    parser.add_argument('--subsampling', default='4:2:0', help="subamostragem da crominância")
+    parser.add_argument('--k', type=component_count, default=30,
+                        help="componentes principais do PCA (número ou 'auto')")
+    parser.add_argument('--target-variance', type=float, help="PCA com --k auto: variância explicada mínima")
+    parser.add_argument('--target-psnr', type=float, help="PCA com --k auto: PSNR mínimo estimado (dB)")
+    parser.add_argument('--max-bytes', type=int, help="PCA com --k auto: tamanho máximo do arquivo")
+    parser.add_argument('--precision', choices=['float32', 'float16', 'int8'], default='int8',
+                        help="precisão dos dados do PCA no arquivo")
+    parser.add_argument('--jobs', type=int, default=None, help="processos em paralelo (padrão: CPUs)")
+    parser.add_argument('--jsonl', default='-', help="arquivo de saída das métricas ('-' = stdout)")
+    parser.add_argument('--force', action='store_true', help="recomprime imagens já atualizadas")
+    parser.add_argument('--cache-dir', help="cache de resultados por conteúdo (reaproveitado entre lotes)")
+    parser.add_argument('--cache-max-mb', type=float, default=1024, help="tamanho máximo do cache em MB")
+    args = parser.parse_args(argv)
+
+    if args.codec == 'dct':
+        params = {'quality': args.quality, 'block_size': args.block_size, 'color': args.color,
+                  'subsampling': args.subsampling}
+    else:
+        params = {'k': args.k, 'precision': args.precision, 'target_variance': args.target_variance,
+                  'target_psnr': args.target_psnr, 'max_bytes': args.max_bytes}
+
+    out = sys.stdout if args.jsonl == '-' else open(args.jsonl, 'a', encoding='utf-8')
+    try:
+        counts = run_batch(args.source, args.codec, args.output_dir, params, args.jobs, args.force, out,
+                           args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Concluído: {counts['ok']} comprimidas, {counts['skipped']} puladas, {counts['error']} com erro",
+          file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,499 @@
+"""
+Formato de arquivo (bitstream) para os coeficientes DCT quantizados.
+
+Segue as mesmas ideias do JPEG baseline:
+
+- varredura em zigue-zague de cada bloco;
+- codificação diferencial do coeficiente DC (diferença para o bloco anterior);
+- codificação por comprimento de sequência (run-length) dos zeros AC,
+  com os símbolos (run, size), ZRL (16 zeros) e EOB (fim de bloco);
+- códigos de Huffman canônicos otimizados para cada segmento;
+- seleção espectral (como no JPEG progressivo): cada faixa de linhas de
+  blocos é gravada em segmentos separados por banda de frequência (DC, AC
+  baixas, AC altas, ver spectral_bands), de modo que uma miniatura lê só os
+  segmentos das bandas de que precisa e pula os demais sem decodificá-los.
+
+Layout do arquivo (little-endian):
+
+    cabeçalho:  'DCTB' | versão u8 | block_size u8 | n_componentes u8 | qualidade u8
+                altura u32 | largura u32
+                por componente: linhas_de_blocos u32 | colunas_de_blocos u32
+                                subamostragem_horizontal u8 | subamostragem_vertical u8
+                                Q (N*N x u16)
+    segmentos:  componente u8 | primeira_linha_de_blocos u32 | n_linhas_de_blocos u32
+                início_da_banda u16 | fim_da_banda u16
+                tabela DC | tabela AC | n_bytes u32 | dados
+
+A banda é o intervalo [início, fim) de posições do zigue-zague gravado no
+segmento. A banda que começa em 0 tem o DC (diferencial) e os AC seguintes; nas
+outras, os zeros são contados a partir do início da banda e o EOB encerra a
+banda do bloco. Os segmentos são independentes (o preditor DC recomeça em zero
+em cada um) e são lidos até o fim do arquivo. Imagens coloridas usam três componentes
+(Y, Cb, Cr); os fatores de subamostragem indicam quantas vezes o plano do
+componente é menor que a imagem em cada direção (2 x 2 no 4:2:0).
+"""
+
+import heapq
+import struct
+from functools import lru_cache
+
+import numpy as np
+
+MAGIC = b'DCTB'
+VERSION = 3
+MAX_CODE_LENGTH = 16  # mesmo limite do JPEG
+EOB = 0x00  # fim de bloco: o restante dos coeficientes AC é zero
+ZRL = 0xF0  # sequência de 16 zeros
+
+_HEADER = struct.Struct('<4sBBBBII')
+_COMPONENT = struct.Struct('<IIBB')
+_SEGMENT = struct.Struct('<BIIHH')
+
+
+@lru_cache(maxsize=None)
+def zigzag_order(block_size=8):
+    """
+    Índices (em ordem raster) da varredura em zigue-zague de um bloco N x N
+    :param block_size: tamanho do bloco (N)
+    :return: array com N*N índices lineares, das baixas para as altas frequências
+    """
+    order = sorted(
+        ((y, x) for y in range(block_size) for x in range(block_size)),
+        key=lambda p: (p[0] + p[1], p[0] if (p[0] + p[1]) % 2 else p[1])
+    )
+    return np.array([y * block_size + x for y, x in order], dtype=np.intp)
+
+
+@lru_cache(maxsize=None)
+def corner_coefficients(block_size, k):
+    """
+    Quantas posições iniciais do zigue-zague cobrem o canto k x k de baixas
+    frequências do bloco (o que uma miniatura com k x k pixels por bloco usa)
+    """
+    order = zigzag_order(block_size)
+    corner = [y * block_size + x for y in range(k) for x in range(k)]
+    return int(max(np.flatnonzero(np.isin(order, corner)))) + 1
+
+
+@lru_cache(maxsize=None)
+def spectral_bands(block_size=8):
+    """
+    Bandas [início, fim) do zigue-zague gravadas em segmentos separados: o DC
+    (miniatura 1/N), as AC até o canto N/2 x N/2 (miniaturas 2/N a 1/2) e o resto
+    """
+    n_coefs = block_size * block_size
+    bounds = sorted({0, 1, corner_coefficients(block_size, max(block_size // 2, 1)), n_coefs})
+    return tuple(zip(bounds[:-1], bounds[1:]))
+
+
+def _size_category(values):
+    """Número de bits necessários para |valor| (categoria 'size' do JPEG)"""
+    magnitude = np.abs(values).astype(np.int64)
+    size = np.zeros(magnitude.shape, dtype=np.int64)
+    nonzero = magnitude > 0
+    size[nonzero] = np.floor(np.log2(magnitude[nonzero])).astype(np.int64) + 1
+    if size.size and size.max() > 15:
+        raise ValueError("Coeficiente quantizado grande demais para o formato (máx. 15 bits)")
+    return size
+
+
+def _amplitude_bits(values, size):
+    """Bits de amplitude: valores negativos usam complemento de um, como no JPEG"""
+    values = values.astype(np.int64)
+    return np.where(values >= 0, values, values + (1 << size) - 1)
+
+
+def _block_symbols(zigzag, has_dc=True):
+    """
+    Converte blocos em zigue-zague na sequência de símbolos do codificador
+    :param zigzag: array (n_blocos, n) de coeficientes quantizados; a coluna 0 é
+                   o DC (com has_dc=False, uma coluna de zeros que não é gravada)
+    :return: (is_ac, símbolo, size, amplitude) na ordem em que serão gravados
+    """
+    n_blocks, n_coefs = zigzag.shape
+
+    # DC: diferença para o bloco anterior
+    dc = zigzag[:, 0].astype(np.int64) if has_dc else np.zeros(0, dtype=np.int64)
+    dc_diff = np.diff(dc, prepend=0)
+    dc_size = _size_category(dc_diff)
+    dc_blocks = np.arange(n_blocks) if has_dc else np.zeros(0, dtype=np.int64)
+
+    # AC: posições (1..N*N-1) dos coeficientes não nulos de cada bloco
+    block_idx, pos = np.nonzero(zigzag[:, 1:])
+    pos = pos + 1
+    values = zigzag[block_idx, pos].astype(np.int64)
+    same_block = np.r_[False, block_idx[1:] == block_idx[:-1]]
+    previous = np.where(same_block, np.r_[0, pos[:-1]], 0)
+    run = pos - previous - 1
+    zrl_count = run // 16
+    ac_size = _size_category(values)
+    ac_symbol = ((run % 16) << 4) | ac_size
+
+    # Símbolos ZRL que antecedem coeficientes com 16 ou mais zeros antes
+    zrl_block = np.repeat(block_idx, zrl_count)
+    zrl_pos = np.repeat(pos, zrl_count)
+
+    # EOB apenas quando o último coeficiente do bloco é zero
+    last_pos = np.zeros(n_blocks, dtype=np.int64)
+    last_pos[block_idx] = pos  # posições crescentes: o último índice prevalece
+    eob_block = np.nonzero(last_pos < n_coefs - 1)[0]
+
+    # Ordenação: (bloco, posição, sub-ordem) -> DC, [ZRL..., AC]..., EOB
+    n_dc = len(dc_blocks)
+    blocks = np.concatenate([dc_blocks, zrl_block, block_idx, eob_block])
+    positions = np.concatenate([np.zeros(n_dc, np.int64), zrl_pos, pos,
+                                np.full(len(eob_block), n_coefs)])
+    sub = np.concatenate([np.zeros(n_dc, np.int64), np.zeros(len(zrl_block), np.int64),
+                          np.ones(len(block_idx), np.int64), np.zeros(len(eob_block), np.int64)])
+    order = np.lexsort((sub, positions, blocks))
+
+    is_ac = np.concatenate([np.zeros(n_dc, bool), np.ones(len(zrl_block) + len(block_idx) + len(eob_block), bool)])
+    symbol = np.concatenate([dc_size, np.full(len(zrl_block), ZRL), ac_symbol, np.full(len(eob_block), EOB)])
+    size = np.concatenate([dc_size, np.zeros(len(zrl_block), np.int64), ac_size, np.zeros(len(eob_block), np.int64)])
+    amplitude = np.concatenate([_amplitude_bits(dc_diff, dc_size), np.zeros(len(zrl_block), np.int64),
+                                _amplitude_bits(values, ac_size), np.zeros(len(eob_block), np.int64)])
+    return is_ac[order], symbol[order], size[order], amplitude[order]
+
+
+def huffman_code_lengths(frequencies, max_length=MAX_CODE_LENGTH):
+    """
+    Comprimentos de código de Huffman para cada símbolo com frequência > 0
+    :param frequencies: array com a contagem de cada símbolo
+    :param max_length: comprimento máximo permitido para um código
+    :return: array de comprimentos (0 para símbolos ausentes)
+    """
+    frequencies = np.asarray(frequencies, dtype=np.int64)
+    lengths = np.zeros(len(frequencies), dtype=np.int64)
+    used = np.nonzero(frequencies)[0]
+    if len(used) == 0:
+        return lengths
+    if len(used) == 1:
+        lengths[used] = 1
+        return lengths
+
+    while True:
+        heap = [(int(frequencies[s]), i, [int(s)]) for i, s in enumerate(used)]
+        heapq.heapify(heap)
+        depth = {int(s): 0 for s in used}
+        counter = len(heap)
+        while len(heap) > 1:
+            f1, _, s1 = heapq.heappop(heap)
+            f2, _, s2 = heapq.heappop(heap)
+            for s in s1 + s2:
+                depth[s] += 1
+            heapq.heappush(heap, (f1 + f2, counter, s1 + s2))
+            counter += 1
+        if max(depth.values()) <= max_length:
+            break
+        # Achata a distribuição até caber no limite de comprimento
+        frequencies = np.where(frequencies > 0, np.maximum(frequencies >> 1, 1), 0)
+
+    for s, d in depth.items():
+        lengths[s] = d
+    return lengths
+
+
+def canonical_codes(lengths):
+    """Códigos de Huffman canônicos a partir dos comprimentos"""
+    codes = np.zeros(len(lengths), dtype=np.int64)
+    code = 0
+    previous_length = 0
+    for symbol in sorted(np.nonzero(lengths)[0], key=lambda s: (lengths[s], s)):
+        code <<= int(lengths[symbol]) - previous_length
+        codes[symbol] = code
+        previous_length = int(lengths[symbol])
+        code += 1
+    return codes
+
+
+def _pack_bits(values, lengths):
+    """Concatena códigos de comprimento variável (até 31 bits cada) em bytes"""
+    total = int(lengths.sum())
+    if total == 0:
+        return b''
+    starts = np.cumsum(lengths) - lengths
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    offset = np.arange(total) - starts[owner]
+    bits = (values[owner] >> (lengths[owner] - 1 - offset)) & 1
+    return np.packbits(bits.astype(np.uint8)).tobytes()
+
+
+def _write_table(lengths):
+    symbols = np.nonzero(lengths)[0]
+    table = struct.pack('<H', len(symbols))
+    return table + b''.join(struct.pack('<BB', s, lengths[s]) for s in symbols)
+
+
+def _read_table(data, offset, n_symbols):
+    (count,) = struct.unpack_from('<H', data, offset)
+    offset += 2
+    lengths = np.zeros(n_symbols, dtype=np.int64)
+    for _ in range(count):
+        symbol, length = struct.unpack_from('<BB', data, offset)
+        lengths[symbol] = length
+        offset += 2
+    return lengths, offset
+
+
+def _band_statistics(quantized):
+    """Símbolos e tabelas de Huffman de cada banda (ver spectral_bands)"""
+    block_size = quantized.shape[-1]
+    zigzag = quantized.reshape(-1, block_size ** 2)[:, zigzag_order(block_size)]
+    for start, end in spectral_bands(block_size):
+        band = zigzag[:, start:end]
+        if start > 0:  # sem DC: coluna 0 de zeros, para as posições contarem a partir de 1
+            band = np.concatenate([np.zeros((len(band), 1), dtype=band.dtype), band], axis=1)
+        is_ac, symbol, size, amplitude = _block_symbols(band, has_dc=start == 0)
+        dc_lengths = huffman_code_lengths(np.bincount(symbol[~is_ac], minlength=16))
+        ac_lengths = huffman_code_lengths(np.bincount(symbol[is_ac], minlength=256))
+        yield (start, end), (is_ac, symbol, size, amplitude, dc_lengths, ac_lengths)
+
+
+def encode_segment(quantized, component=0, first_block_row=0):
+    """
+    Codifica um conjunto de linhas de blocos quantizados, um segmento por banda
+    :param quantized: coeficientes quantizados no formato (linhas, colunas, N, N)
+    :param component: índice do componente de cor (0 para tons de cinza)
+    :param first_block_row: linha de blocos onde o segmento começa na imagem
+    :return: bytes dos segmentos
+    """
+    segments = []
+    for (start, end), (is_ac, symbol, size, amplitude, dc_lengths, ac_lengths) in _band_statistics(quantized):
+        dc_codes, ac_codes = canonical_codes(dc_lengths), canonical_codes(ac_lengths)
+
+        code = np.where(is_ac, ac_codes[symbol], dc_codes[np.minimum(symbol, 15)])
+        code_length = np.where(is_ac, ac_lengths[symbol], dc_lengths[np.minimum(symbol, 15)])
+        payload = _pack_bits((code << size) | amplitude, code_length + size)
+
+        segments.append(_SEGMENT.pack(component, first_block_row, quantized.shape[0], start, end)
+                        + _write_table(dc_lengths) + _write_table(ac_lengths)
+                        + struct.pack('<I', len(payload)) + payload)
+    return b''.join(segments)
+
+
+def header_size(block_size=8, n_components=1):
+    """Tamanho em bytes do cabeçalho gravado por write_header"""
+    return _HEADER.size + n_components * (_COMPONENT.size + 2 * block_size * block_size)
+
+
+def estimate_size(quantized):
+    """
+    Tamanho em bytes que encode_segment produziria, sem empacotar os bits
+    :param quantized: coeficientes quantizados no formato (linhas, colunas, N, N)
+    """
+    total = 0
+    for _, (is_ac, symbol, size, _, dc_lengths, ac_lengths) in _band_statistics(quantized):
+        bits = ac_lengths[symbol[is_ac]].sum() + dc_lengths[symbol[~is_ac]].sum() + size.sum()
+        tables = 4 + 2 * (np.count_nonzero(dc_lengths) + np.count_nonzero(ac_lengths))
+        total += int(_SEGMENT.size + tables + 4 + (bits + 7) // 8)
+    return total
+
+
+def _decode_table(lengths):
+    """Tabela de busca indexada pelos próximos 16 bits: (símbolo, comprimento)"""
+    codes = canonical_codes(lengths)
+    lookup = [None] * (1 << MAX_CODE_LENGTH)
+    for symbol in np.nonzero(lengths)[0]:
+        shift = MAX_CODE_LENGTH - int(lengths[symbol])
+        first = int(codes[symbol]) << shift
+        entry = (int(symbol), int(lengths[symbol]))
+        for i in range(first, first + (1 << shift)):
+            lookup[i] = entry
+    return lookup
+
+
+def segment_info(data, offset):
+    """
+    Lê só o cabeçalho e o tamanho de um segmento, sem decodificá-lo
+    :return: (componente, primeira linha, n_linhas, (início, fim) da banda, offset do próximo segmento)
+    """
+    component, first_block_row, block_rows, start, end = _SEGMENT.unpack_from(data, offset)
+    offset += _SEGMENT.size
+    for _ in range(2):  # tabelas DC e AC: contagem u16 e 2 bytes por símbolo
+        (count,) = struct.unpack_from('<H', data, offset)
+        offset += 2 + 2 * count
+    (n_bytes,) = struct.unpack_from('<I', data, offset)
+    return component, first_block_row, block_rows, (start, end), offset + 4 + n_bytes
+
+
+def decode_segment(data, offset, block_cols, block_size):
+    """
+    Decodifica um segmento gravado por encode_segment
+    :param data: bytes do arquivo
+    :param offset: posição do início do segmento
+    :param block_cols: número de colunas de blocos do componente
+    :param block_size: tamanho do bloco (N)
+    :return: (componente, primeira linha, blocos quantizados (linhas, colunas, N, N), próximo offset);
+             os coeficientes fora da banda do segmento ficam zerados
+    """
+    n_coefs = block_size * block_size
+    component, first_block_row, block_rows, start, end = _SEGMENT.unpack_from(data, offset)
+    offset += _SEGMENT.size
+    dc_lengths, offset = _read_table(data, offset, 16)
+    ac_lengths, offset = _read_table(data, offset, 256)
+    (n_bytes,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    payload = bytes(data[offset:offset + n_bytes]) + bytes(8)
+    offset += n_bytes
+
+    dc_lookup, ac_lookup = _decode_table(dc_lengths), _decode_table(ac_lengths)
+    # Posições dentro da banda: 0 é o DC (ou a coluna de zeros das bandas sem DC)
+    has_dc = start == 0
+    band_coefs = end if has_dc else end - start + 1
+    shift = 0 if has_dc else start - 1
+    n_blocks = block_rows * block_cols
+    zigzag = [0] * (n_blocks * n_coefs)
+    from_bytes = int.from_bytes
+    pos = 0
+    dc = 0
+
+    def next_symbol(lookup):
+        nonlocal pos
+        window = (from_bytes(payload[pos >> 3:(pos >> 3) + 5], 'big') >> (8 - (pos & 7))) & 0xFFFFFFFF
+        symbol, length = lookup[window >> 16]
+        size = symbol & 0x0F
+        value = (window >> (32 - length - size)) & ((1 << size) - 1)
+        if size and value < (1 << (size - 1)):
+            value -= (1 << size) - 1
+        pos += length + size
+        return symbol, value
+
+    for block in range(n_blocks):
+        base = block * n_coefs + shift
+        if has_dc:
+            _, diff = next_symbol(dc_lookup)
+            dc += diff
+            zigzag[base] = dc
+        k = 1
+        while k < band_coefs:
+            symbol, value = next_symbol(ac_lookup)
+            if symbol == EOB:
+                break
+            if symbol == ZRL:
+                k += 16
+                continue
+            k += symbol >> 4
+            zigzag[base + k] = value
+            k += 1
+
+    coefficients = np.zeros((n_blocks, n_coefs), dtype=np.int32)
+    coefficients[:, zigzag_order(block_size)] = np.array(zigzag, dtype=np.int32).reshape(n_blocks, n_coefs)
+    quantized = coefficients.reshape(block_rows, block_cols, block_size, block_size)
+    return component, first_block_row, quantized, offset
+
+
+def iter_segments(data, offset, header, coefficients=None):
+    """
+    Decodifica os segmentos do arquivo, juntando as bandas de cada faixa de linhas
+    :param offset: posição do primeiro segmento (ver read_header)
+    :param coefficients: decodifica só as bandas que começam antes desta posição do
+                         zigue-zague (ex.: 1 para só o DC); as outras são puladas sem
+                         decodificar. None decodifica tudo
+    :return: gerador de (componente, primeira linha de blocos, blocos quantizados)
+    """
+    block_size = header['block_size']
+    pending = None
+    while offset < len(data):
+        index, first_row, block_rows, band, next_offset = segment_info(data, offset)
+        if coefficients is not None and band[0] >= coefficients:
+            quantized = None
+            offset = next_offset
+        else:
+            index, first_row, quantized, offset = decode_segment(
+                data, offset, header['components'][index]['block_cols'], block_size)
+        if pending is not None and (pending[0], pending[1]) != (index, first_row):
+            yield tuple(pending)
+            pending = None
+        if pending is None:
+            pending = [index, first_row, quantized]
+        elif quantized is not None:
+            pending[2] = quantized if pending[2] is None else pending[2] + quantized
+    if pending is not None:
+        yield tuple(pending)
+
+
+def write_header(f, height, width, block_size, quality, components, subsampling=None):
+    """
+    Grava o cabeçalho do arquivo
+    :param components: lista de (linhas_de_blocos, colunas_de_blocos, Q) por componente
+    :param subsampling: fatores (horizontal, vertical) de cada componente; padrão (1, 1)
+    """
+    subsampling = subsampling or [(1, 1)] * len(components)
+    f.write(_HEADER.pack(MAGIC, VERSION, block_size, len(components), int(quality), height, width))
+    for (block_rows, block_cols, Q), (h_factor, v_factor) in zip(components, subsampling):
+        f.write(_COMPONENT.pack(block_rows, block_cols, h_factor, v_factor))
+        f.write(np.asarray(Q, dtype='<u2').tobytes())
+
+
+def read_header(data):
+    """
+    Lê o cabeçalho do arquivo
+    :return: (dicionário com os metadados, offset do primeiro segmento)
+    """
+    magic, version, block_size, n_components, quality, height, width = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Arquivo não está no formato DCTB")
+    if version != VERSION:
+        raise ValueError(f"Versão {version} do formato DCTB não suportada")
+    offset = _HEADER.size
+    components = []
+    for _ in range(n_components):
+        block_rows, block_cols, h_factor, v_factor = _COMPONENT.unpack_from(data, offset)
+        offset += _COMPONENT.size
+        n_bytes = 2 * block_size * block_size
+        Q = np.frombuffer(data, dtype='<u2', count=block_size * block_size, offset=offset)
+        offset += n_bytes
+        components.append({
+            'block_rows': block_rows,
+            'block_cols': block_cols,
+            'subsampling': (h_factor, v_factor),
+            'Q': Q.reshape(block_size, block_size).astype(np.float32),
+        })
+    header = {
+        'height': height,
+        'width': width,
+        'block_size': block_size,
+        'quality': quality,
+        'components': components,
+    }
+    return header, offset
+
+
+def write_dct_file(path, height, width, block_size, quality, components, subsampling=None):
+    """
+    Grava os coeficientes quantizados em um arquivo DCTB
+    :param components: lista de (coeficientes quantizados (linhas, colunas, N, N), Q)
+    :param subsampling: fatores (horizontal, vertical) de cada componente; padrão (1, 1)
+    :return: tamanho do arquivo em bytes
+    """
+    with open(path, 'wb') as f:
+        write_header(f, height, width, block_size, quality,
+                     [(q.shape[0], q.shape[1], Q) for q, Q in components], subsampling)
+        for index, (quantized, _) in enumerate(components):
+            f.write(encode_segment(quantized, component=index))
+        return f.tell()
+
+
+def read_dct_file(path, scale=None):
+    """
+    Lê um arquivo DCTB
+    :param scale: lê só as bandas que cobrem o canto (N / scale) x (N / scale) de
+                  baixas frequências de cada bloco, o usado por uma miniatura
+                  reduzida scale vezes; os outros coeficientes ficam zerados.
+                  None lê tudo
+    :return: cabeçalho, com os coeficientes quantizados de cada componente em 'quantized'
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    header, offset = read_header(data)
+    block_size = header['block_size']
+    for component in header['components']:
+        component['quantized'] = np.zeros(
+            (component['block_rows'], component['block_cols'], block_size, block_size), dtype=np.int32)
+
+    coefficients = None if scale is None else corner_coefficients(block_size, max(block_size // scale, 1))
+    for index, first_row, quantized in iter_segments(data, offset, header, coefficients):
+        if quantized is not None:
+            header['components'][index]['quantized'][first_row:first_row + quantized.shape[0]] = quantized
+    return header
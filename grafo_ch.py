@@ -0,0 +1,378 @@
+"""
+Contraction hierarchies (CH) sobre o CSRGraph, para rotas ponto a ponto em
+malhas rodoviárias grandes.
+
+Pré-processamento (build): os vértices são contraídos um a um, do menos ao
+mais importante. Contrair v remove o vértice do grafo restante e, para cada par
+de vizinhos u -> v -> w cujo caminho mínimo passa por v, cria um atalho u -> w
+com o mesmo custo (a busca de testemunha, um Dijkstra limitado a partir de u
+sem passar por v, descarta os atalhos desnecessários). A ordem vem de uma fila
+de prioridade com atualização preguiçosa: diferença de arestas (atalhos criados
+menos arestas removidas) mais o número de vizinhos já contraídos, o que
+espalha a contração pelo grafo.
+
+O índice guarda, em arrays CSR, as arestas (originais e atalhos) que sobem na
+hierarquia:
+
+- up: arestas v -> w com rank[w] > rank[v] (busca a partir da origem);
+- down: arestas u -> v com rank[u] > rank[v], guardadas invertidas em v
+  (busca a partir do destino);
+- o vértice do meio de cada atalho, para desempacotar o caminho.
+
+Consulta (ContractionHierarchy.query): Dijkstra bidirecional, a partir da
+origem só pelas arestas up e a partir do destino só pelas down. As duas buscas
+visitam poucas centenas de vértices mesmo em grafos com milhões deles e se
+encontram no vértice de maior rank do caminho mínimo. Distâncias e
+predecessores ficam em dicionários: nenhuma consulta aloca arrays do tamanho
+do grafo.
+
+O índice é gravado em .npz junto com o hash do grafo (como a RouteTable de
+grafo_csr) e recalculado quando o grafo muda.
+
+Pré-processamento de uma malha em arquivo (CSV de arestas ou DOT):
+    python grafo_ch.py malha.csv --undirected --output output/malha_ch.npz
+    python grafo_ch.py malha.csv --undirected --output output/malha_ch.npz --route Natal Recife
+"""
+
+import argparse
+import heapq
+import os
+import sys
+import time
+
+import numpy as np
+
+from grafo_csr import CSRGraph
+
+CH_VERSION = 1
+WITNESS_MAX_SETTLED = 100  # vértices fechados por busca de testemunha (limita o pré-processamento)
+
+
+class _Contraction:
+    """Grafo restante durante o pré-processamento (dicionários de adjacência)"""
+
+    def __init__(self, graph):
+        n_nodes = graph.n_nodes
+        self.out = [{} for _ in range(n_nodes)]  # out[u][w] = peso da aresta u -> w
+        self.into = [{} for _ in range(n_nodes)]  # into[w][u] = peso da aresta u -> w
+        self.middles = {}  # (u, w) -> vértice contraído que o atalho u -> w substitui
+        sources = np.repeat(np.arange(n_nodes), np.diff(graph.offsets)).tolist()
+        for u, w, weight in zip(sources, graph.targets.tolist(), graph.weights.tolist()):
+            if u != w and weight < self.out[u].get(w, float('inf')):  # laços nunca estão em caminhos mínimos
+                self.out[u][w] = self.into[w][u] = weight
+        self.contracted_neighbors = [0] * n_nodes
+        self.level = [0] * n_nodes  # profundidade na hierarquia (1 + maior nível dos vizinhos contraídos)
+
+    def witness_distances(self, source, skip, targets, limit):
+        """
+        Dijkstra limitado de source no grafo restante, sem passar por skip
+        :return: distâncias encontradas (só as menores que limit são confiáveis)
+        """
+        out = self.out
+        inf = float('inf')
+        distances = {source: 0.0}
+        remaining = set(targets)
+        queue = [(0.0, source)]
+        settled = 0
+        while queue and remaining and settled < WITNESS_MAX_SETTLED:
+            cost, node = heapq.heappop(queue)
+            if cost > distances[node]:
+                continue
+            if cost > limit:
+                break
+            remaining.discard(node)
+            settled += 1
+            for neighbor, weight in out[node].items():
+                new_cost = cost + weight
+                if new_cost < distances.get(neighbor, inf) and neighbor != skip:
+                    distances[neighbor] = new_cost
+                    heapq.heappush(queue, (new_cost, neighbor))
+        return distances
+
+    def shortcuts(self, node):
+        """Atalhos necessários para contrair node: lista de (u, w, peso)"""
+        result = []
+        outgoing = self.out[node]
+        if not outgoing:
+            return result
+        max_out = max(outgoing.values())
+        for u, weight_in in self.into[node].items():
+            targets = [w for w in outgoing if w != u]
+            if not targets:
+                continue
+            distances = self.witness_distances(u, node, targets, weight_in + max_out)
+            for w in targets:
+                cost = weight_in + outgoing[w]
+                if distances.get(w, float('inf')) > cost:
+                    result.append((u, w, cost))
+        return result
+
+    def priority(self, node):
+        """Prioridade de contração (menor sai primeiro) e os atalhos que a contração criaria"""
+        shortcuts = self.shortcuts(node)
+        removed = len(self.out[node]) + len(self.into[node])
+        # Pesos da diferença de arestas, vizinhos contraídos e nível escolhidos em grades e grafos geométricos
+        return 2 * (len(shortcuts) - removed) + self.contracted_neighbors[node] + 2 * self.level[node], shortcuts
+
+    def contract(self, node, shortcuts):
+        """Remove node do grafo restante e acrescenta os atalhos"""
+        for u, w, cost in shortcuts:
+            if cost < self.out[u].get(w, float('inf')):
+                self.out[u][w] = self.into[w][u] = cost
+                self.middles[u, w] = node
+        level = self.level[node] + 1
+        for w in self.out[node]:
+            del self.into[w][node]
+            self.contracted_neighbors[w] += 1
+            self.level[w] = max(self.level[w], level)
+        for u in self.into[node]:
+            del self.out[u][node]
+            self.contracted_neighbors[u] += 1
+            self.level[u] = max(self.level[u], level)
+
+
+def _to_csr(adjacency, middles, reverse=False):
+    """
+    Lista de dicionários {vizinho: peso} -> offsets, targets, weights, middles
+    :param reverse: adjacency[v] tem as arestas que chegam em v (vizinho -> v)
+    """
+    n_nodes = len(adjacency)
+    offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum([len(neighbors) for neighbors in adjacency], out=offsets[1:])
+    count = int(offsets[-1])
+    targets = np.fromiter((w for neighbors in adjacency for w in neighbors), dtype=np.int32, count=count)
+    weights = np.fromiter((weight for neighbors in adjacency for weight in neighbors.values()),
+                          dtype=np.float64, count=count)
+    edges = (((w, v) if reverse else (v, w)) for v, neighbors in enumerate(adjacency) for w in neighbors)
+    middle = np.fromiter((middles.get(edge, -1) for edge in edges), dtype=np.int32, count=count)
+    return offsets, targets, weights, middle
+
+
+def contract_graph(graph, verbose=False):
+    """
+    Contrai todos os vértices do grafo
+    :return: (rank, up, down), com up e down no formato de _to_csr
+    """
+    n_nodes = graph.n_nodes
+    state = _Contraction(graph)
+    queue = [(state.priority(node)[0], node) for node in range(n_nodes)]
+    heapq.heapify(queue)
+    rank = np.full(n_nodes, -1, dtype=np.int32)
+    up = [None] * n_nodes
+    down = [None] * n_nodes
+    order = 0
+    while queue:
+        _, node = heapq.heappop(queue)
+        if rank[node] >= 0:
+            continue
+        # Prioridade preguiçosa: recalculada ao sair da fila; se piorou, volta para a fila
+        priority, shortcuts = state.priority(node)
+        if queue and priority > queue[0][0]:
+            heapq.heappush(queue, (priority, node))
+            continue
+        state.contract(node, shortcuts)
+        rank[node] = order
+        order += 1
+        # As arestas que sobraram ligam node a vértices contraídos depois (rank maior)
+        up[node], down[node] = state.out[node], state.into[node]
+        state.out[node] = state.into[node] = None
+        if verbose and order % 10000 == 0:
+            print(f"{order}/{n_nodes} vértices contraídos")
+    return rank, _to_csr(up, state.middles), _to_csr(down, state.middles, reverse=True)
+
+
+class ContractionHierarchy:
+    """Índice de contraction hierarchies de um grafo e consultas bidirecionais"""
+
+    def __init__(self, names, rank, up, down, graph_digest):
+        """
+        :param rank: ordem de contração de cada vértice
+        :param up, down: (offsets, targets, weights, middles) das arestas que sobem
+                         na hierarquia a partir da origem (up) e do destino (down)
+        :param graph_digest: CSRGraph.digest() do grafo pré-processado
+        """
+        self.names = list(names)
+        self.ids = {name: node for node, name in enumerate(self.names)}
+        self.rank = rank
+        self.up = up
+        self.down = down
+        self.graph_digest = graph_digest
+        self._middles = None
+
+    @classmethod
+    def build(cls, graph, verbose=False):
+        rank, up, down = contract_graph(graph, verbose)
+        return cls(graph.names, rank, up, down, graph.digest())
+
+    @property
+    def n_nodes(self):
+        return len(self.names)
+
+    @property
+    def n_shortcuts(self):
+        return int((self.up[3] >= 0).sum() + (self.down[3] >= 0).sum())
+
+    def nbytes(self):
+        return self.rank.nbytes + sum(array.nbytes for array in self.up + self.down)
+
+    def save(self, path):
+        """Grava o índice (.npz); a escrita é atômica"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = path + '.tmp.npz'
+        arrays = {f'{direction}_{name}': array for direction, csr in (('up', self.up), ('down', self.down))
+                  for name, array in zip(('offsets', 'targets', 'weights', 'middles'), csr)}
+        np.savez(temp_path, version=CH_VERSION, graph_digest=self.graph_digest, names=np.array(self.names),
+                 rank=self.rank, **arrays)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, graph=None):
+        """
+        :param graph: se informado, o índice só é aceito se foi calculado para este grafo
+        :return: ContractionHierarchy, ou None se o arquivo não existe, é de outra versão ou de outro grafo
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != CH_VERSION:
+                return None
+            digest = str(data['graph_digest'])
+            if graph is not None and digest != graph.digest():
+                return None
+            up, down = (tuple(data[f'{direction}_{name}'] for name in ('offsets', 'targets', 'weights', 'middles'))
+                        for direction in ('up', 'down'))
+            return cls(data['names'].tolist(), data['rank'], up, down, digest)
+
+    def _search(self, csr, node, cost, distances, predecessors, queue):
+        offsets, targets, weights, _ = csr
+        start, end = offsets[node], offsets[node + 1]
+        for neighbor, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            new_cost = cost + weight
+            if new_cost < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_cost
+                predecessors[neighbor] = node
+                heapq.heappush(queue, (new_cost, neighbor))
+
+    def _stalled(self, csr, node, cost, distances):
+        """
+        Stall-on-demand: se um vizinho de rank maior, já alcançado, chega a node
+        por menos que cost, node não está em nenhum caminho mínimo desta busca
+        (que só sobe na hierarquia) e não precisa ser expandido
+        :param csr: arestas da outra direção (as que descem até node)
+        """
+        offsets, targets, weights, _ = csr
+        start, end = offsets[node], offsets[node + 1]
+        for neighbor, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            if distances.get(neighbor, float('inf')) + weight < cost:
+                return True
+        return False
+
+    def query(self, source, target):
+        """
+        Dijkstra bidirecional sobre o índice
+        :param source, target: ids dos vértices
+        :return: (caminho como lista de ids, distância, vértices expandidos);
+                 ([], inf, expandidos) se o destino é inalcançável
+        """
+        searches = [(self.up, {source: 0.0}, {source: -1}, [(0.0, source)]),
+                    (self.down, {target: 0.0}, {target: -1}, [(0.0, target)])]
+        best, meeting, expanded = float('inf'), -1, 0
+        closed = [set(), set()]
+        while searches[0][3] or searches[1][3]:
+            # Avança a busca com o menor topo; cada uma para quando o topo passa de best
+            side = 0 if not searches[1][3] or (searches[0][3] and searches[0][3][0] <= searches[1][3][0]) else 1
+            csr, distances, predecessors, queue = searches[side]
+            cost, node = heapq.heappop(queue)
+            if cost >= best:
+                queue.clear()
+                continue
+            if node in closed[side]:
+                continue
+            closed[side].add(node)
+            expanded += 1
+            other = searches[1 - side][1].get(node)
+            if other is not None and cost + other < best:
+                best, meeting = cost + other, node
+            if not self._stalled(searches[1 - side][0], node, cost, distances):
+                self._search(csr, node, cost, distances, predecessors, queue)
+        if meeting < 0:
+            return [], float('inf'), expanded
+
+        upward = [meeting]
+        while searches[0][2][upward[-1]] >= 0:
+            upward.append(searches[0][2][upward[-1]])
+        downward = [meeting]
+        while searches[1][2][downward[-1]] >= 0:
+            downward.append(searches[1][2][downward[-1]])
+        hops = upward[::-1] + downward[1:]
+        return self.unpack(hops), best, expanded
+
+    def _middle(self, u, w):
+        """Vértice do meio do atalho u -> w (-1 se é uma aresta original)"""
+        if self._middles is None:
+            # Cada aresta u -> w está em up de u (rank[w] > rank[u]) ou, invertida, em down de w
+            self._middles = {}
+            for (offsets, targets, _, middles), reverse in ((self.up, False), (self.down, True)):
+                nodes = np.repeat(np.arange(self.n_nodes), np.diff(offsets))
+                shortcut = middles >= 0
+                pairs = zip(nodes[shortcut].tolist(), targets[shortcut].tolist(), middles[shortcut].tolist())
+                self._middles.update((((b, a) if reverse else (a, b)), m) for a, b, m in pairs)
+        return self._middles.get((u, w), -1)
+
+    def unpack(self, hops):
+        """Troca cada atalho da sequência de vértices pelos dois trechos que ele substitui"""
+        path = [hops[0]]
+        stack = [(u, w) for u, w in zip(hops[-2::-1], hops[:0:-1])]
+        while stack:
+            u, w = stack.pop()
+            middle = self._middle(u, w)
+            if middle < 0:
+                path.append(w)
+            else:
+                stack.append((middle, w))
+                stack.append((u, middle))
+        return path
+
+    def route(self, start, end):
+        """:return: (caminho com os nomes dos vértices, distância) entre dois vértices, pelos nomes"""
+        path, cost, _ = self.query(self.ids[start], self.ids[end])
+        return [self.names[node] for node in path], cost
+
+
+def contraction_hierarchy(graph, cache_path=None, verbose=False):
+    """
+    Índice CH do grafo, lido do disco quando ainda vale para ele
+    :param cache_path: arquivo .npz do índice; recalculado e regravado se não
+                       existir ou se o grafo mudou (hash diferente)
+    """
+    index = ContractionHierarchy.load(cache_path, graph) if cache_path else None
+    if index is None:
+        index = ContractionHierarchy.build(graph, verbose)
+        if cache_path:
+            index.save(cache_path)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-processa um grafo em contraction hierarchies")
+    parser.add_argument('graph', help="arquivo do grafo: CSV (origem, destino, peso) ou DOT")
+    parser.add_argument('--undirected', action='store_true', help="arestas do CSV valem nos dois sentidos")
+    parser.add_argument('--output', required=True, help="arquivo .npz do índice")
+    parser.add_argument('--route', nargs=2, metavar=('ORIGEM', 'DESTINO'), help="consulta uma rota no índice")
+    args = parser.parse_args(argv)
+
+    graph = CSRGraph.from_file(args.graph, args.undirected)
+    start = time.perf_counter()
+    index = contraction_hierarchy(graph, args.output, verbose=True)
+    print(f"{graph.n_nodes} vértices, {graph.n_edges} arestas, {index.n_shortcuts} atalhos "
+          f"({index.nbytes() / 1e6:.1f} MB) em {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    if args.route:
+        start = time.perf_counter()
+        path, cost = index.route(*args.route)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(' -> '.join(path) if path else "Sem caminho", f"({cost:g}, {elapsed:.2f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
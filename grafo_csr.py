@@ -0,0 +1,676 @@
+"""
+Grafo compacto em formato CSR (compressed sparse row) para os algoritmos de rotas.
+
+Os vértices são inteiros 0..n-1 e as arestas ficam em três arrays NumPy:
+
+- offsets (n + 1): as arestas que saem do vértice v estão nas posições
+  offsets[v]:offsets[v + 1] dos outros dois arrays;
+- targets: vértice de destino de cada aresta;
+- weights: peso (distância) de cada aresta.
+
+Uma tabela names / ids converte entre nomes (cidades) e ids. Cada aresta ocupa
+12 bytes (int32 + float64), contra centenas de bytes em um dicionário de
+dicionários, o que permite carregar malhas rodoviárias com milhões de arestas.
+
+Carregadores: dicionário de dicionários (formato dos scripts grafod.py e
+grafos_caminho_mais_curto.py), lista de arestas em CSV e arquivos DOT como
+grafo_turistico (from_file escolhe pela extensão). Com undirected=True cada aresta vale nos dois sentidos.
+
+Caminhos mínimos: shortest_path_tree roda o Dijkstra guardando apenas um array
+de distâncias e um de predecessores; a árvore resultante responde a distância
+e o caminho para qualquer destino a partir da mesma origem.
+
+Consultas repetidas: RouteTable guarda as matrizes de distâncias e de próximo
+salto de todos os pares (Floyd-Warshall vetorizado em grafos pequenos, Dijkstra
+a partir de cada origem, em paralelo, nos maiores), gravadas em disco junto com
+o hash do grafo; cada caminho sai em O(comprimento do caminho).
+
+A* (astar): com coordenadas nos vértices (plano ou latitude/longitude), a
+busca usa a distância em linha reta até o destino como estimativa admissível.
+"""
+
+import csv
+import hashlib
+import heapq
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+# Identificador DOT: nome simples, número ou texto entre aspas
+_DOT_ID = r'(?:"((?:[^"\\]|\\.)*)"|([\w.]+))'
+_DOT_EDGE = re.compile(_DOT_ID + r'\s*(->|--)\s*' + _DOT_ID + r'\s*(?:\[([^\]]*)\])?')
+_DOT_NODE = re.compile(r'^\s*' + _DOT_ID + r'\s*(?:\[([^\]]*)\])?\s*;?\s*$')
+_DOT_ATTRIBUTE = re.compile(r'(\w+)\s*=\s*(?:"((?:[^"\\]|\\.)*)"|([^\s,;]+))')
+_NUMBER = re.compile(r'[-+]?\d+(?:\.\d+)?')
+_DOT_KEYWORDS = {'graph', 'digraph', 'node', 'edge', 'subgraph', 'strict'}
+EARTH_RADIUS_KM = 6371.0088
+
+
+class CSRGraph:
+    """Grafo dirigido e ponderado com vértices inteiros, em arrays CSR"""
+
+    def __init__(self, offsets, targets, weights, names):
+        """
+        :param offsets: array (n + 1) com o início das arestas de cada vértice
+        :param targets: destino de cada aresta (int32)
+        :param weights: peso de cada aresta
+        :param names: nome de cada vértice (lista com n nomes)
+        """
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.names = list(names)
+        self.ids = {name: node for node, name in enumerate(self.names)}
+        self.coordinates = None  # (n, 2): (x, y) no plano ou (latitude, longitude) em graus
+        self.geographic = False
+        self._heuristic_scale = None
+        self._coordinate_lists = None
+
+    def set_coordinates(self, positions, geographic=False):
+        """
+        Coordenadas dos vértices, usadas pela heurística do A*
+        :param positions: dicionário nome -> (x, y) ou array (n, 2); vértices sem
+                          coordenada ficam com NaN (heurística zero para eles)
+        :param geographic: True se forem (latitude, longitude) em graus (distância haversine)
+        """
+        if isinstance(positions, dict):
+            coordinates = np.full((self.n_nodes, 2), np.nan)
+            for name, position in positions.items():
+                if name in self.ids:
+                    coordinates[self.ids[name]] = position
+        else:
+            coordinates = np.asarray(positions, dtype=np.float64).reshape(self.n_nodes, 2)
+        self.coordinates = coordinates
+        self.geographic = geographic
+        self._heuristic_scale = None
+        self._coordinate_lists = None
+        return self
+
+    @classmethod
+    def from_edges(cls, sources, targets, weights, names, undirected=False, weight_dtype=np.float64):
+        """
+        Monta o grafo a partir de uma lista de arestas com vértices inteiros
+        :param sources, targets, weights: arrays (ou sequências) com uma posição por aresta
+        :param names: nome de cada vértice
+        :param undirected: acrescenta a aresta inversa de cada aresta
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=weight_dtype)
+        if undirected:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            weights = np.concatenate([weights, weights])
+        if len(weights) and weights.min() < 0:
+            raise ValueError("Pesos negativos não são suportados")
+
+        n_nodes = len(names)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=offsets[1:])
+        return cls(offsets, targets[order].astype(np.int32), weights[order], names)
+
+    @classmethod
+    def from_named_edges(cls, edges, undirected=False, nodes=None):
+        """
+        :param edges: iterável de (origem, destino, peso) com nomes dos vértices
+        :param nodes: nomes dos vértices, inclusive os isolados (opcional; define a ordem dos ids)
+        """
+        ids = {}
+        for name in nodes or ():
+            ids.setdefault(name, len(ids))
+        sources, targets, weights = [], [], []
+        for source, target, weight in edges:
+            sources.append(ids.setdefault(source, len(ids)))
+            targets.append(ids.setdefault(target, len(ids)))
+            weights.append(weight)
+        return cls.from_edges(sources, targets, weights, list(ids), undirected)
+
+    @classmethod
+    def from_dict(cls, edges, undirected=False, nodes=None, positions=None, geographic=False):
+        """
+        :param edges: dicionário {origem: {destino: peso}} como nos scripts de grafos
+        :param nodes: nomes dos vértices, inclusive os isolados (ex.: city_positions)
+        :param positions: coordenadas dos vértices, nome -> (x, y) (ver set_coordinates)
+        """
+        graph = cls.from_named_edges(((source, target, weight) for source, neighbors in edges.items()
+                                      for target, weight in neighbors.items()), undirected, nodes)
+        if positions is not None:
+            graph.set_coordinates(positions, geographic)
+        return graph
+
+    @classmethod
+    def from_csv(cls, path, undirected=False, delimiter=',', nodes_path=None):
+        """
+        Lista de arestas em CSV: origem, destino, peso (cabeçalho opcional)
+        :param nodes_path: CSV opcional com as coordenadas: nome, x, y; com cabeçalho
+                           contendo lat e lon (ou lng), as colunas são latitude e
+                           longitude em graus e a heurística usa a distância haversine
+        """
+        def rows():
+            with open(path, newline='', encoding='utf-8') as f:
+                for index, row in enumerate(csv.reader(f, delimiter=delimiter)):
+                    if not row or row[0].startswith('#'):
+                        continue
+                    try:
+                        weight = float(row[2])
+                    except (IndexError, ValueError):
+                        if index == 0:
+                            continue  # cabeçalho
+                        raise ValueError(f"{path}, linha {index + 1}: esperado origem, destino, peso")
+                    yield row[0].strip(), row[1].strip(), weight
+
+        nodes, geographic = None, False
+        if nodes_path:
+            nodes, geographic = _read_node_csv(nodes_path, delimiter)
+        graph = cls.from_named_edges(rows(), undirected, nodes)
+        if nodes:
+            graph.set_coordinates(nodes, geographic)
+        return graph
+
+    @classmethod
+    def from_dot(cls, path, undirected=None, weight_attribute='weight'):
+        """
+        Arquivo DOT (Graphviz), como o grafo_turistico gerado por grafod.py
+
+        O peso vem do atributo weight_attribute ou, na falta dele, do primeiro
+        número do rótulo (label="180 km" -> 180). Coordenadas dos vértices vêm
+        dos atributos lat e lon (graus) ou pos="x,y".
+
+        :param undirected: padrão: True para 'graph' (arestas --), False para 'digraph'
+        """
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        if undirected is None:
+            undirected = not re.search(r'\bdigraph\b', text)
+
+        nodes, edges, positions, geographic = [], [], {}, False
+        for line in text.splitlines():
+            match = _DOT_EDGE.search(line)
+            if match:
+                source = _unquote(match.group(1), match.group(2))
+                target = _unquote(match.group(4), match.group(5))
+                edges.append((source, target, _dot_weight(match.group(6) or '', weight_attribute, line)))
+                continue
+            match = _DOT_NODE.match(line)
+            if match:
+                name = _unquote(match.group(1), match.group(2))
+                if match.group(1) is not None or name not in _DOT_KEYWORDS:
+                    nodes.append(name)
+                    attributes = _dot_attributes(match.group(3) or '')
+                    if 'lat' in attributes and 'lon' in attributes:
+                        positions[name], geographic = (float(attributes['lat']), float(attributes['lon'])), True
+                    elif 'pos' in attributes:
+                        positions[name] = tuple(float(value) for value in attributes['pos'].rstrip('!').split(',')[:2])
+        graph = cls.from_named_edges(edges, undirected, nodes)
+        if positions:
+            graph.set_coordinates(positions, geographic)
+        return graph
+
+    @classmethod
+    def from_file(cls, path, undirected=False, nodes_path=None):
+        """
+        Carrega um grafo de arquivo pela extensão: .dot / .gv (from_dot) ou CSV (from_csv)
+        :param undirected: arestas valem nos dois sentidos (no DOT, False segue o tipo do grafo)
+        :param nodes_path: CSV com as coordenadas dos vértices (só para CSV, ver from_csv)
+        """
+        if path.endswith('.dot') or path.endswith('.gv'):
+            if nodes_path:
+                raise ValueError("Arquivos DOT trazem as coordenadas nos atributos dos vértices (sem nodes_path)")
+            return cls.from_dot(path, undirected=undirected or None)
+        return cls.from_csv(path, undirected=undirected, nodes_path=nodes_path)
+
+    @property
+    def n_nodes(self):
+        return len(self.names)
+
+    @property
+    def n_edges(self):
+        return len(self.targets)
+
+    def id(self, name):
+        """Id do vértice com este nome"""
+        try:
+            return self.ids[name]
+        except KeyError:
+            raise KeyError(f"Vértice desconhecido: {name!r}") from None
+
+    def neighbors(self, node):
+        """:return: (destinos, pesos) das arestas que saem do vértice"""
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return self.targets[start:end], self.weights[start:end]
+
+    def degree(self, node):
+        return int(self.offsets[node + 1] - self.offsets[node])
+
+    def nbytes(self):
+        """Memória ocupada pelos arrays CSR"""
+        return self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes
+
+    def straight_line(self, nodes, target):
+        """
+        Distância em linha reta (euclidiana ou haversine, em km) de vértices até o destino
+        :param nodes: ids (array)
+        """
+        a, b = self.coordinates[nodes], self.coordinates[target]
+        if not self.geographic:
+            return np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1])
+        return haversine(a[..., 0], a[..., 1], b[..., 0], b[..., 1])
+
+    def heuristic_scale(self):
+        """
+        Menor razão peso / distância em linha reta entre as arestas
+
+        Toda aresta custa pelo menos escala * (linha reta entre as pontas), e pela
+        desigualdade triangular qualquer caminho também: escala * linha reta até o
+        destino nunca superestima o custo restante (heurística admissível e
+        consistente), em qualquer unidade de peso ou coordenada.
+
+        Se alguma aresta tem uma ponta sem coordenada, nenhum limite vale para os
+        caminhos que passam por ela e a escala é 0 (o A* vira um Dijkstra).
+        """
+        if self._heuristic_scale is None:
+            sources = np.repeat(np.arange(self.n_nodes), np.diff(self.offsets))
+            lengths = self.straight_line(sources, self.targets)
+            if not np.isfinite(lengths).all():
+                self._heuristic_scale = 0.0
+            else:
+                positive = lengths > 0
+                ratios = self.weights[positive] / lengths[positive]
+                # Folga mínima contra arredondamento, para não perder a admissibilidade
+                self._heuristic_scale = float(ratios.min()) * (1 - 1e-9) if len(ratios) else 0.0
+        return self._heuristic_scale
+
+    def heuristic(self, target):
+        """
+        Estimativa admissível do custo de um vértice até o destino
+        :return: função id -> estimativa, calculada só para os vértices consultados
+                 (sem trabalho proporcional ao tamanho do grafo a cada busca)
+        """
+        if self.coordinates is None:
+            raise ValueError("O grafo não tem coordenadas (ver set_coordinates)")
+        scale = self.heuristic_scale()
+        if self._coordinate_lists is None:
+            # Listas Python (uma vez por grafo): acesso a um elemento bem mais barato que no array
+            values = np.radians(self.coordinates) if self.geographic else self.coordinates
+            self._coordinate_lists = values[:, 0].tolist(), values[:, 1].tolist()
+        first, second = self._coordinate_lists
+        target_a, target_b = first[target], second[target]
+        if scale == 0 or not (math.isfinite(target_a) and math.isfinite(target_b)):
+            return lambda node: 0.0
+        if not self.geographic:
+            def estimate(node):
+                distance = math.hypot(first[node] - target_a, second[node] - target_b)
+                return scale * distance if distance == distance else 0.0  # NaN: vértice sem coordenada
+            return estimate
+
+        cos_target = math.cos(target_a)
+
+        def estimate(node):
+            lat, lon = first[node], second[node]
+            a = math.sin((target_a - lat) / 2) ** 2 + math.cos(lat) * cos_target * math.sin((target_b - lon) / 2) ** 2
+            if a != a:
+                return 0.0
+            return scale * 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+        return estimate
+
+    def digest(self):
+        """Hash do grafo (arestas, pesos e nomes): muda sempre que o grafo muda"""
+        digest = hashlib.sha256()
+        for array in (self.offsets, self.targets, self.weights):
+            digest.update(str(array.dtype).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update('\n'.join(self.names).encode())
+        return digest.hexdigest()[:16]
+
+
+class ShortestPathTree:
+    """Árvore de caminhos mínimos a partir de uma origem (distâncias e predecessores)"""
+
+    def __init__(self, graph, source, distances, predecessors, expanded=None):
+        """
+        :param distances: distância da origem a cada vértice (inf se inalcançável)
+        :param predecessors: vértice anterior no caminho mínimo (-1 na origem e nos inalcançáveis)
+        :param expanded: número de vértices retirados da fila e expandidos na busca
+        """
+        self.graph = graph
+        self.source = source
+        self.distances = distances
+        self.predecessors = predecessors
+        self.expanded = expanded
+
+    def distance(self, target):
+        """Distância até o vértice (id)"""
+        return float(self.distances[target])
+
+    def path(self, target):
+        """
+        Caminho da origem até o vértice, reconstruído pelos predecessores
+        :return: lista de ids (vazia se o destino é inalcançável)
+        """
+        if not np.isfinite(self.distances[target]):
+            return []
+        path = [int(target)]
+        while path[-1] != self.source:
+            path.append(int(self.predecessors[path[-1]]))
+        return path[::-1]
+
+    def path_names(self, target_name):
+        """:return: (caminho com os nomes dos vértices, distância) até o destino pelo nome"""
+        target = self.graph.id(target_name)
+        return [self.graph.names[node] for node in self.path(target)], self.distance(target)
+
+
+def shortest_path_tree(graph, source, target=None):
+    """
+    Dijkstra com heap binário sobre o grafo CSR
+
+    A fila guarda só (distância, vértice); o caminho é recuperado depois pelo
+    array de predecessores, sem copiar listas a cada inserção na fila.
+
+    :param graph: CSRGraph
+    :param source: id da origem
+    :param target: id do destino; se informado, a busca para quando ele é
+                   fechado (a árvore fica completa só até ele)
+    :return: ShortestPathTree
+    """
+    n_nodes = graph.n_nodes
+    distances = [float('inf')] * n_nodes
+    predecessors = [-1] * n_nodes
+    closed = [False] * n_nodes
+    offsets = graph.offsets
+    distances[source] = 0.0
+    queue = [(0.0, source)]
+    expanded = 0
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if closed[node]:
+            continue
+        closed[node] = True
+        expanded += 1
+        if node == target:
+            break
+        start, end = offsets[node], offsets[node + 1]
+        for neighbor, weight in zip(graph.targets[start:end].tolist(), graph.weights[start:end].tolist()):
+            new_cost = cost + weight
+            if new_cost < distances[neighbor]:
+                distances[neighbor] = new_cost
+                predecessors[neighbor] = node
+                heapq.heappush(queue, (new_cost, neighbor))
+    return ShortestPathTree(graph, source, np.array(distances), np.array(predecessors, dtype=np.int32), expanded)
+
+
+def astar(graph, source, target):
+    """
+    Busca A* de source até target, guiada pelas coordenadas dos vértices
+
+    Igual ao Dijkstra, mas a fila é ordenada por custo + estimativa até o
+    destino (CSRGraph.heuristic): a busca avança na direção do destino e
+    expande menos vértices, com o mesmo resultado.
+
+    :return: ShortestPathTree parcial (caminho e distância até target, e expanded)
+    """
+    estimate = graph.heuristic(target)
+    # Dicionários: o trabalho por consulta depende dos vértices visitados, não do tamanho do grafo
+    distances = {source: 0.0}
+    predecessors = {source: -1}
+    closed = set()
+    offsets = graph.offsets
+    queue = [(estimate(source), 0.0, source)]
+    expanded = 0
+    while queue:
+        _, cost, node = heapq.heappop(queue)
+        if node in closed:
+            continue
+        closed.add(node)
+        expanded += 1
+        if node == target:
+            break
+        start, end = offsets[node], offsets[node + 1]
+        for neighbor, weight in zip(graph.targets[start:end].tolist(), graph.weights[start:end].tolist()):
+            new_cost = cost + weight
+            if new_cost < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_cost
+                predecessors[neighbor] = node
+                heapq.heappush(queue, (new_cost + estimate(neighbor), new_cost, neighbor))
+
+    visited = np.fromiter(distances, dtype=np.int64, count=len(distances))
+    distance_array = np.full(graph.n_nodes, np.inf)
+    distance_array[visited] = list(distances.values())
+    predecessor_array = np.full(graph.n_nodes, -1, dtype=np.int32)
+    predecessor_array[visited] = list(predecessors.values())
+    return ShortestPathTree(graph, source, distance_array, predecessor_array, expanded)
+
+
+FLOYD_WARSHALL_MAX_NODES = 1000  # acima disso, Dijkstra a partir de cada origem (O(n^3) fica caro)
+ROUTE_TABLE_VERSION = 1
+
+
+def floyd_warshall(graph):
+    """
+    Distâncias e próximos saltos de todos os pares (Floyd-Warshall vetorizado)
+
+    Cada iteração k relaxa a matriz inteira de uma vez: dist[i, j] vira
+    dist[i, k] + dist[k, j] onde isso for menor. Memória O(n^2), tempo O(n^3).
+
+    :return: dist (n x n, inf se inalcançável) e next_hop (n x n, -1 se inalcançável)
+    """
+    n_nodes = graph.n_nodes
+    sources = np.repeat(np.arange(n_nodes), np.diff(graph.offsets))
+    dist = np.full((n_nodes, n_nodes), np.inf)
+    np.minimum.at(dist, (sources, graph.targets), graph.weights)
+    np.fill_diagonal(dist, 0)
+    next_hop = np.where(np.isfinite(dist), np.arange(n_nodes, dtype=np.int32), -1).astype(np.int32)
+
+    for k in range(n_nodes):
+        via_k = dist[:, k, None] + dist[None, k, :]
+        better = via_k < dist
+        dist = np.where(better, via_k, dist)
+        next_hop = np.where(better, next_hop[:, k, None], next_hop)
+    return dist, next_hop
+
+
+def _first_hops(tree):
+    """
+    Próximo salto da origem até cada vértice, a partir da árvore de caminhos mínimos
+
+    Cada vértice sobe pela cadeia de predecessores até um vértice já resolvido
+    (memoização): não depende da ordem das distâncias, que empatam quando há
+    arestas de peso zero.
+
+    >>> graph = CSRGraph.from_named_edges([('s', 'a', 0), ('a', 'b', 0), ('b', 'c', 0)], nodes=['c', 'b', 's', 'a'])
+    >>> bool((all_pairs_dijkstra(graph, workers=1)[1] == floyd_warshall(graph)[1]).all())
+    True
+    """
+    next_hop = np.full(tree.graph.n_nodes, -1, dtype=np.int32)
+    next_hop[tree.source] = tree.source
+    predecessors = tree.predecessors.tolist()
+    for node in np.flatnonzero(np.isfinite(tree.distances)).tolist():
+        chain = []
+        while next_hop[node] < 0 and predecessors[node] >= 0:
+            chain.append(node)
+            if predecessors[node] == tree.source:
+                next_hop[node] = node
+                break
+            node = predecessors[node]
+        hop = next_hop[node]
+        for link in chain:
+            next_hop[link] = hop
+    return next_hop
+
+
+_worker_graph = None
+
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _dijkstra_rows(sources):
+    trees = [shortest_path_tree(_worker_graph, source) for source in sources]
+    return [tree.distances for tree in trees], [_first_hops(tree) for tree in trees]
+
+
+def all_pairs_dijkstra(graph, workers=None, chunk_size=64):
+    """
+    Distâncias e próximos saltos de todos os pares: um Dijkstra por origem,
+    distribuídos entre processos
+    :param workers: número de processos (padrão: CPUs; 1 roda no processo atual)
+    :return: dist e next_hop, como em floyd_warshall
+    """
+    n_nodes = graph.n_nodes
+    dist = np.empty((n_nodes, n_nodes))
+    next_hop = np.empty((n_nodes, n_nodes), dtype=np.int32)
+    chunks = [range(start, min(start + chunk_size, n_nodes)) for start in range(0, n_nodes, chunk_size)]
+
+    if workers == 1:
+        _init_worker(graph)
+        results = map(_dijkstra_rows, chunks)
+    else:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(graph,))
+        results = executor.map(_dijkstra_rows, chunks)
+    try:
+        for rows, (row_dist, row_next) in zip(chunks, results):
+            dist[rows.start:rows.stop] = row_dist
+            next_hop[rows.start:rows.stop] = row_next
+    finally:
+        if workers != 1:
+            executor.shutdown()
+    return dist, next_hop
+
+
+class RouteTable:
+    """Distâncias e caminhos de todos os pares, pré-calculados"""
+
+    def __init__(self, names, dist, next_hop, graph_digest, cache_size=1024):
+        """
+        :param dist, next_hop: matrizes de floyd_warshall ou all_pairs_dijkstra
+        :param graph_digest: CSRGraph.digest() do grafo usado no cálculo
+        :param cache_size: caminhos recentes guardados em cache (LRU)
+        """
+        self.names = list(names)
+        self.ids = {name: node for node, name in enumerate(self.names)}
+        self.dist = dist
+        self.next_hop = next_hop
+        self.graph_digest = graph_digest
+        self.route = lru_cache(maxsize=cache_size)(self._route)
+
+    @classmethod
+    def build(cls, graph, method='auto', workers=None):
+        """
+        :param method: 'floyd-warshall', 'dijkstra' ou 'auto' (Floyd-Warshall
+                       até FLOYD_WARSHALL_MAX_NODES vértices)
+        """
+        if method == 'auto':
+            method = 'floyd-warshall' if graph.n_nodes <= FLOYD_WARSHALL_MAX_NODES else 'dijkstra'
+        if method == 'floyd-warshall':
+            dist, next_hop = floyd_warshall(graph)
+        elif method == 'dijkstra':
+            dist, next_hop = all_pairs_dijkstra(graph, workers)
+        else:
+            raise ValueError(f"Método desconhecido: {method!r} (use 'floyd-warshall', 'dijkstra' ou 'auto')")
+        return cls(graph.names, dist, next_hop, graph.digest())
+
+    def save(self, path):
+        """Grava as matrizes (.npz); a escrita é atômica"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, version=ROUTE_TABLE_VERSION, graph_digest=self.graph_digest,
+                 names=np.array(self.names), dist=self.dist, next_hop=self.next_hop)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, graph=None):
+        """
+        :param graph: se informado, a tabela só é aceita se foi calculada para este grafo
+        :return: RouteTable, ou None se o arquivo não existe, é de outra versão ou de outro grafo
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != ROUTE_TABLE_VERSION:
+                return None
+            digest = str(data['graph_digest'])
+            if graph is not None and digest != graph.digest():
+                return None
+            return cls(data['names'].tolist(), data['dist'], data['next_hop'], digest)
+
+    def distance(self, start, end):
+        """Distância entre dois vértices, pelos nomes"""
+        return float(self.dist[self.ids[start], self.ids[end]])
+
+    def _route(self, start, end):
+        source, target = self.ids[start], self.ids[end]
+        if self.next_hop[source, target] < 0:
+            return (), 0
+        path = [source]
+        while path[-1] != target:
+            path.append(int(self.next_hop[path[-1], target]))
+        return tuple(self.names[node] for node in path), float(self.dist[source, target])
+
+
+def route_table(graph, cache_path=None, method='auto', workers=None):
+    """
+    Tabela de rotas do grafo, lida do disco quando ainda vale para ele
+    :param cache_path: arquivo .npz da tabela; recalculada e regravada se não
+                       existir ou se o grafo mudou (hash diferente)
+    """
+    table = RouteTable.load(cache_path, graph) if cache_path else None
+    if table is None:
+        table = RouteTable.build(graph, method, workers)
+        if cache_path:
+            table.save(cache_path)
+    return table
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distância (km) no grande círculo entre pontos dados em graus"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _read_node_csv(path, delimiter=','):
+    """
+    CSV de vértices: nome, x, y ou, com cabeçalho lat/lon, nome, latitude, longitude
+    :return: (dicionário nome -> coordenadas, geographic)
+    """
+    positions, geographic, columns = {}, False, (1, 2)
+    with open(path, newline='', encoding='utf-8') as f:
+        for index, row in enumerate(csv.reader(f, delimiter=delimiter)):
+            if not row or row[0].startswith('#'):
+                continue
+            try:
+                positions[row[0].strip()] = (float(row[columns[0]]), float(row[columns[1]]))
+            except (IndexError, ValueError):
+                if index != 0:
+                    raise ValueError(f"{path}, linha {index + 1}: esperado nome e duas coordenadas")
+                header = [column.strip().lower() for column in row]
+                if 'lat' in header and ('lon' in header or 'lng' in header):
+                    geographic = True
+                    columns = (header.index('lat'), header.index('lon' if 'lon' in header else 'lng'))
+    return positions, geographic
+
+
+def _unquote(quoted, plain):
+    if quoted is None:
+        return plain
+    return quoted.replace('\\"', '"')
+
+
+def _dot_attributes(attributes):
+    return {key: quoted or plain for key, quoted, plain in _DOT_ATTRIBUTE.findall(attributes)}
+
+
+def _dot_weight(attributes, weight_attribute, line):
+    values = _dot_attributes(attributes)
+    for key in (weight_attribute, 'label'):
+        if key in values:
+            number = _NUMBER.search(values[key])
+            if number:
+                return float(number.group())
+    raise ValueError(f"Aresta sem peso (atributo {weight_attribute} ou label numérico): {line.strip()}")
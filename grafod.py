@@ -5,13 +5,14 @@
 # - Visualização gráfica com Tkinter.
 # - Exportação do grafo com caminho mais curto para Graphviz (.dot).
 
+import argparse
 import tkinter as tk
-import heapq
 import time
 import os
+import sys
 
-# Bibliotecas para exportar com Graphviz
-from graphviz import Digraph
+from grafo_ch import contraction_hierarchy
+from grafo_csr import CSRGraph, astar, route_table, shortest_path_tree
 
 # Cidades (22 vértices)
 city_positions = {
@@ -39,7 +40,7 @@ city_positions = {
     "Serra da Capivara": (350, 50)  # Destino turístico
 }
 
-# Arestas com pesos aproximados (em km)
+# Arestas com pesos aproximados (em km); cada estrada aparece uma vez e vale nos dois sentidos
 edges = {
     "Natal": {"João Pessoa": 180, "Fortaleza": 530},
     "João Pessoa": {"Recife": 120},
@@ -62,25 +63,61 @@ edges = {
     "Vitória da Conquista": {"Ilhéus": 200}
 }
 
-# Algoritmo de Dijkstra
+# Grafo com ids inteiros (CSR); estradas não dirigidas, então Fortaleza -> Natal também existe
+# Posições no canvas: heurística euclidiana do A* (escalada para km pelas arestas)
+graph = CSRGraph.from_dict(edges, undirected=True, nodes=city_positions, positions=city_positions)
+
+# Algoritmo de Dijkstra: uma busca a partir da origem responde a todos os destinos
+def routes_from(start):
+    return shortest_path_tree(graph, graph.id(start))
+
 def dijkstra(start, end):
-    queue = [(0, start, [])]
-    visited = set()
-    while queue:
-        (cost, node, path) = heapq.heappop(queue)
-        if node in visited:
-            continue
-        path = path + [node]
-        if node == end:
-            return path, cost
-        visited.add(node)
-        for neighbor, weight in edges.get(node, {}).items():
-            if neighbor not in visited:
-                heapq.heappush(queue, (cost + weight, neighbor, path))
-    return [], 0
+    path, cost = routes_from(start).path_names(end)
+    return path, (cost if path else 0)
+
+def astar_route(start, end):
+    """A* guiado pelas posições das cidades: (caminho, custo, vértices expandidos)"""
+    tree = astar(graph, graph.id(start), graph.id(end))
+    path, cost = tree.path_names(end)
+    return path, (cost if path else 0), tree.expanded
+
+# Rotas pré-calculadas, guardadas em disco (recalculadas se o grafo mudar): tabela de todos
+# os pares em grafos pequenos; em malhas viárias carregadas de arquivo (load_graph), onde a
+# tabela n x n não cabe, índice de contraction hierarchies (grafo_ch)
+ROUTE_TABLE_MAX_NODES = 5000
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+ROUTES_PATH = os.path.join(OUTPUT_DIR, "rotas_turisticas.npz")
+CH_PATH = os.path.join(OUTPUT_DIR, "rotas_turisticas_ch.npz")
+routes = None
+
+def load_graph(path, undirected=False, nodes_path=None):
+    """
+    Troca o grafo das cidades por uma malha viária lida de arquivo (CSV ou DOT,
+    ver CSRGraph.from_file); as rotas pré-calculadas ficam em output/<nome>_*.npz
+    """
+    global graph, routes, ROUTES_PATH, CH_PATH
+    graph = CSRGraph.from_file(path, undirected, nodes_path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    ROUTES_PATH = os.path.join(OUTPUT_DIR, f"{name}_rotas.npz")
+    CH_PATH = os.path.join(OUTPUT_DIR, f"{name}_ch.npz")
+    routes = None
+    return graph
+
+def route(start, end):
+    global routes
+    if routes is None:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        if graph.n_nodes <= ROUTE_TABLE_MAX_NODES:
+            routes = route_table(graph, ROUTES_PATH)
+        else:
+            routes = contraction_hierarchy(graph, CH_PATH)
+    path, cost = routes.route(start, end)
+    return list(path), (cost if path else 0)
 
 # Exporta o grafo para Graphviz com destaque para o caminho
 def export_to_graphviz(path):
+    from graphviz import Digraph  # Biblioteca para exportar com Graphviz (só necessária aqui)
+
     dot = Digraph()
     for city in city_positions:
         dot.node(city)
@@ -125,7 +162,7 @@ class GraphApp:
             self.canvas.create_text(x, y, text=city, font=("Arial", 7), anchor="nw")
 
     def animate_path(self):
-        path, total = dijkstra("Natal", "Serra da Capivara")
+        path, total = route("Natal", "Serra da Capivara")
         for i in range(len(path) - 1):
             a, b = path[i], path[i + 1]
             x1, y1 = city_positions[a]
@@ -135,8 +172,24 @@ class GraphApp:
             time.sleep(1)
         export_to_graphviz(path)
 
-# Executa app
-root = tk.Tk()
-app = GraphApp(root)
-root.mainloop()
+# Executa app (sem argumentos) ou consulta uma rota em um grafo de arquivo
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roteiros turísticos: interface com as 22 cidades ou "
+                                                 "rotas em uma malha viária de arquivo")
+    parser.add_argument('--graph', help="arquivo do grafo: CSV (origem, destino, peso) ou DOT")
+    parser.add_argument('--undirected', action='store_true', help="arestas do CSV valem nos dois sentidos")
+    parser.add_argument('--nodes', help="CSV com as coordenadas dos vértices (nome, x, y ou lat/lon)")
+    parser.add_argument('--route', nargs=2, metavar=('ORIGEM', 'DESTINO'), help="rota consultada no grafo")
+    args = parser.parse_args()
+
+    if args.graph:
+        load_graph(args.graph, args.undirected, args.nodes)
+        start, end = args.route or (graph.names[0], graph.names[-1])
+        path, total = route(start, end)
+        print(' -> '.join(path) if path else "Sem caminho", f"({total:g})")
+        sys.exit(0)
+
+    root = tk.Tk()
+    app = GraphApp(root)
+    root.mainloop()
 
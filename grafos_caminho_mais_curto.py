@@ -1,7 +1,8 @@
 import tkinter as tk
-import heapq
 import time
 
+from grafo_csr import CSRGraph, shortest_path_tree
+
 # Definição dos nós e posições no canvas
 nodes = {
     'A': (100, 100),
@@ -22,22 +23,13 @@ edges = {
     'F': {'B': 4, 'E': 1}
 }
 
-# Função de Dijkstra
+# Grafo com ids inteiros (CSR)
+graph = CSRGraph.from_dict(edges, nodes=nodes)
+
+# Função de Dijkstra (distâncias e predecessores; o caminho é montado no final)
 def dijkstra(start, end):
-    queue = [(0, start, [])]
-    visited = set()
-    while queue:
-        (cost, node, path) = heapq.heappop(queue)
-        if node in visited:
-            continue
-        path = path + [node]
-        if node == end:
-            return path
-        visited.add(node)
-        for neighbor, weight in edges.get(node, {}).items():
-            if neighbor not in visited:
-                heapq.heappush(queue, (cost + weight, neighbor, path))
-    return []
+    tree = shortest_path_tree(graph, graph.id(start), graph.id(end))
+    return tree.path_names(end)[0]
 
 # Interface principal
 class GraphApp:
@@ -0,0 +1,59 @@
+"""
+Leitura e escrita de imagens grandes em arquivos mapeados em memória.
+
+Aceita dois formatos:
+
+- .npy: o arquivo já guarda dimensões e tipo (np.load com mmap_mode);
+- raw: pixels sem cabeçalho, em ordem de linhas; exige informar shape e dtype.
+
+Assim as imagens podem ser processadas em faixas de linhas sem carregar o
+arquivo inteiro na memória.
+"""
+
+import numpy as np
+
+
+def open_image_memmap(path, shape=None, dtype=np.uint8):
+    """
+    Abre uma imagem em tons de cinza para leitura sem carregá-la na memória
+    :param path: caminho do arquivo (.npy ou raw)
+    :param shape: (altura, largura), obrigatório para arquivos raw
+    :param dtype: tipo dos pixels em arquivos raw
+    :return: array somente leitura (np.memmap)
+    """
+    if str(path).endswith('.npy'):
+        image = np.load(path, mmap_mode='r')
+    else:
+        if shape is None:
+            raise ValueError("Informe shape=(altura, largura) para arquivos raw")
+        image = np.memmap(path, dtype=dtype, mode='r', shape=tuple(shape))
+    if image.ndim != 2:
+        raise ValueError(f"Esperada imagem 2D (tons de cinza), recebido shape {image.shape}")
+    return image
+
+
+def create_image_memmap(path, shape, dtype=np.uint8):
+    """
+    Cria um arquivo de imagem para escrita incremental
+    :param path: caminho do arquivo (.npy grava cabeçalho; outros nomes geram raw)
+    :param shape: (altura, largura)
+    :param dtype: tipo dos pixels
+    :return: array gravável (np.memmap)
+    """
+    if str(path).endswith('.npy'):
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    return np.memmap(path, dtype=dtype, mode='w+', shape=tuple(shape))
+
+
+def iter_strips(image, strip_rows, align=1):
+    """
+    Percorre a imagem em faixas horizontais
+    :param image: array (H, W), normalmente um np.memmap
+    :param strip_rows: número de linhas por faixa
+    :param align: as faixas começam e terminam em múltiplos deste valor
+                  (por exemplo, o tamanho do bloco da DCT)
+    :return: gerador de (linha inicial, faixa)
+    """
+    strip_rows = max(align, strip_rows - strip_rows % align)
+    for y in range(0, image.shape[0], strip_rows):
+        yield y, image[y:y + strip_rows]
@@ -0,0 +1,202 @@
+"""
+Cálculo dos componentes principais com backends de computação selecionáveis.
+
+- numpy: covariância + eig/eigh, SVD aleatorizada ou Lanczos (scipy);
+- torch-cpu: PyTorch na CPU, com várias threads;
+- cuda: PyTorch na GPU NVIDIA.
+
+O backend 'auto' escolhe cuda quando há GPU, torch-cpu quando só o PyTorch
+está instalado e numpy nos demais casos (ou quando o solver pedido não existe
+no PyTorch, como o 'lanczos'). Todos devolvem arrays NumPy, então
+o restante do pipeline (arquivo PCAQ, métricas, gráficos) é o mesmo.
+"""
+
+import time
+
+import numpy as np
+
+BACKENDS = ('numpy', 'torch-cpu', 'cuda')
+TORCH_SOLVERS = ('auto', 'randomized', 'eig', 'eigh')  # solvers suportados por torch_components
+
+
+def _torch():
+    """Importa o PyTorch sob demanda (dependência opcional)"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch
+
+
+def available_backends():
+    """Backends que podem ser usados nesta máquina"""
+    torch = _torch()
+    backends = ['numpy']
+    if torch is not None:
+        backends.append('torch-cpu')
+        if torch.cuda.is_available():
+            backends.append('cuda')
+    return backends
+
+
+def resolve_backend(backend='auto', solver='auto'):
+    """
+    Converte 'auto' no melhor backend disponível e valida os demais nomes
+    :param solver: solver que será usado (ver pca_fit); 'auto' fica no numpy se
+                   o PyTorch não tiver esse solver
+    :return: 'numpy', 'torch-cpu' ou 'cuda'
+    """
+    available = available_backends()
+    if backend == 'auto':
+        return available[-1] if solver in TORCH_SOLVERS else 'numpy'
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend!r} (use {', '.join(BACKENDS)} ou 'auto')")
+    if backend not in available:
+        raise RuntimeError(f"Backend {backend!r} indisponível nesta máquina (disponíveis: {', '.join(available)})")
+    return backend
+
+
+def principal_components(cov, k_components, solver='eig'):
+    """
+    Autovalores e os k autovetores principais de uma matriz de covariância
+    :param cov: matriz de covariância (W x W)
+    :param k_components: número de componentes principais mantidos
+    :param solver: 'eig' (solver geral, referência) ou 'eigh' (simétrico; com o
+                   scipy instalado calcula apenas os k maiores autovalores)
+    :return: autovalores em ordem decrescente e os componentes (W x k)
+    """
+    k_components = min(k_components, cov.shape[0])
+    if solver == 'eigh':
+        width = cov.shape[0]
+        try:
+            from scipy.linalg import eigh
+            eigenvalues, eigenvectors = eigh(cov, subset_by_index=[width - k_components, width - 1])
+        except ImportError:
+            eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        # eigh devolve em ordem crescente
+        return eigenvalues[::-1], eigenvectors[:, ::-1][:, :k_components]
+
+    eigenvalues, eigenvectors = np.linalg.eig(cov)  # Obtém autovalores (importância) e autovetores (direções principais) da covariância
+
+    order = np.argsort(-np.real(eigenvalues))
+    eigenvectors = np.real(eigenvectors[:, order])  # Ordena autovetores do mais para o menos importante
+
+    return np.real(eigenvalues[order]), eigenvectors[:, :k_components]
+
+
+def randomized_components(centered, k_components, oversampling=10, power_iterations=4, seed=0):
+    """
+    k componentes principais por SVD aleatorizada (Halko, Martinsson e Tropp),
+    direto dos dados centralizados, sem montar a covariância
+    :param centered: dados centralizados (H x W)
+    :param oversampling: colunas extras da projeção aleatória (melhora a precisão)
+    :param power_iterations: iterações de potência (necessárias quando o espectro decai devagar)
+    :return: os k maiores autovalores da covariância e os componentes (W x k)
+    """
+    rng = np.random.default_rng(seed)
+    n_samples, width = centered.shape
+    k_components = min(k_components, width)
+    rank = min(k_components + oversampling, n_samples, width)
+
+    # Base ortonormal para a imagem de centered, refinada por iterações de potência
+    basis, _ = np.linalg.qr(centered @ rng.standard_normal((width, rank)).astype(centered.dtype))
+    for _ in range(power_iterations):
+        basis, _ = np.linalg.qr(centered.T @ basis)
+        basis, _ = np.linalg.qr(centered @ basis)
+
+    # SVD da matriz pequena (rank x W)
+    _, singular_values, vt = np.linalg.svd(basis.T @ centered, full_matrices=False)
+    eigenvalues = singular_values[:k_components] ** 2 / (n_samples - 1)
+    return eigenvalues, vt[:k_components].T
+
+
+def lanczos_components(centered, k_components):
+    """
+    k componentes principais pelo método de Lanczos (scipy.sparse.linalg.svds)
+    :return: os k maiores autovalores da covariância e os componentes (W x k)
+    """
+    from scipy.sparse.linalg import svds
+
+    k_components = min(k_components, min(centered.shape) - 1)  # o svds exige k < min(H, W)
+    _, singular_values, vt = svds(centered.astype(np.float64), k=k_components)
+    order = np.argsort(-singular_values)
+    return singular_values[order] ** 2 / (centered.shape[0] - 1), vt[order].T
+
+
+def pca_fit(centered, k_components, solver='auto', backend='numpy'):
+    """
+    Componentes principais dos dados centralizados
+    :param centered: dados centralizados (H x W), uma linha por amostra
+    :param k_components: número de componentes principais
+    :param solver: 'eig' (covariância completa + solver geral, o método original),
+                   'eigh' (covariância + solver simétrico), 'randomized' (SVD aleatorizada),
+                   'lanczos' (requer scipy) ou 'auto' (randomized quando k é pequeno)
+    :param backend: 'numpy', 'torch-cpu', 'cuda' ou 'auto' (ver resolve_backend)
+    :return: autovalores em ordem decrescente (ao menos k) e os componentes (W x k)
+    """
+    backend = resolve_backend(backend, solver)
+    if backend != 'numpy':
+        return torch_components(centered, k_components, solver, 'cuda' if backend == 'cuda' else 'cpu')
+
+    if solver == 'auto':
+        solver = 'randomized' if k_components <= min(centered.shape) // 4 else 'eigh'
+
+    if solver in ('eig', 'eigh'):
+        cov = np.cov(centered, rowvar=False)  # Calcula matriz de covariância entre colunas (mostra como pixels variam conjuntamente)
+        return principal_components(cov, k_components, solver)
+    if solver == 'randomized':
+        return randomized_components(centered, k_components)
+    if solver == 'lanczos':
+        return lanczos_components(centered, k_components)
+    raise ValueError(f"Solver desconhecido: {solver!r} (use 'eig', 'eigh', 'randomized', 'lanczos' ou 'auto')")
+
+
+def torch_components(centered, k_components, solver='auto', device='cpu'):
+    """
+    Componentes principais com o PyTorch (CPU ou GPU)
+    :param solver: 'randomized' ou 'auto' (torch.pca_lowrank, SVD aleatorizada)
+                   ou 'eigh' / 'eig' (covariância + torch.linalg.eigh)
+    :param device: 'cpu' (usa todas as threads configuradas no PyTorch) ou 'cuda'
+    :return: autovalores em ordem decrescente e os componentes (W x k), como arrays NumPy
+    """
+    torch = _torch()
+    data = torch.from_numpy(np.ascontiguousarray(centered, dtype=np.float32)).to(device)
+    n_samples = data.shape[0]
+    k_components = min(k_components, data.shape[1])
+
+    if solver in ('auto', 'randomized'):
+        _, singular_values, V = torch.pca_lowrank(data, q=min(k_components + 10, *data.shape), center=False, niter=4)
+        eigenvalues = singular_values[:k_components] ** 2 / (n_samples - 1)
+        components = V[:, :k_components]
+    elif solver in ('eig', 'eigh'):
+        cov = data.T @ data / (n_samples - 1)
+        eigenvalues, eigenvectors = torch.linalg.eigh(cov.double())  # ordem crescente
+        eigenvalues, components = eigenvalues.flip(0), eigenvectors.flip(1)[:, :k_components]
+    else:
+        raise ValueError(f"Solver {solver!r} não disponível no PyTorch (use 'randomized', 'eigh' ou 'auto')")
+    return eigenvalues.cpu().numpy(), components.cpu().numpy()
+
+
+def benchmark_backends(img_float, k_components=30, solver='auto', repeats=3, backends=None):
+    """
+    Compara o tempo de cálculo dos componentes em cada backend disponível
+    :param img_float: imagem (H x W) em float, valores em [0, 1]
+    :param backends: lista de backends (padrão: todos os disponíveis)
+    :return: lista de dicionários com backend, melhor tempo (s) e variância explicada
+    """
+    centered = img_float - img_float.mean(axis=0)
+    total_variance = np.sum(np.var(centered, axis=0, ddof=1))
+    results = []
+    for backend in backends or available_backends():
+        pca_fit(centered, k_components, solver, backend)  # aquecimento (inicialização da GPU, threads)
+        times = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            eigenvalues, _ = pca_fit(centered, k_components, solver, backend)
+            times.append(time.perf_counter() - start_time)
+        results.append({
+            'backend': backend,
+            'time': min(times),
+            'explained_variance': float(np.sum(eigenvalues[:k_components]) / total_variance),
+        })
+    return results
@@ -0,0 +1,171 @@
+"""
+Formato de arquivo para imagens comprimidas com PCA (média, componentes e scores).
+
+Os dados ficam sem compressão zlib e com cada seção alinhada, de modo que o
+decodificador pode abrir o arquivo com np.memmap e ler só as linhas e os
+componentes de que precisa, sem copiar o payload inteiro.
+
+Layout do arquivo (little-endian):
+
+    cabeçalho:  'PCAQ' | versão u8 | precisão u8 | reservado u16
+                altura u32 | largura u32 | k u32
+    seções (cada uma começa em múltiplo de ALIGNMENT bytes):
+                média                  largura x f32
+                escalas dos componentes    k x f32
+                escalas dos scores         k x f32
+                componentes            largura x k (precisão)
+                scores                  altura x k (precisão)
+
+Precisões: float32 (sem perda), float16 ou int8. No int8 cada componente
+(coluna) tem sua própria escala: valor = inteiro * escala, com a escala
+escolhida para que o maior valor absoluto da coluna vire 127. Nas outras
+precisões as escalas são 1.
+"""
+
+import struct
+
+import numpy as np
+
+MAGIC = b'PCAQ'
+VERSION = 1
+ALIGNMENT = 64  # alinhamento das seções, em bytes (linha de cache)
+ROWS_PER_CHUNK = 65536  # linhas quantizadas por vez ao gravar os scores
+
+PRECISIONS = {'float32': (0, '<f4'), 'float16': (1, '<f2'), 'int8': (2, 'i1')}
+_PRECISION_NAMES = {code: name for name, (code, _) in PRECISIONS.items()}
+
+_HEADER = struct.Struct('<4sBBHIII')
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def layout(height, width, k_components, precision):
+    """
+    Calcula a posição de cada seção no arquivo
+    :return: (dicionário nome -> (offset, dtype, shape), tamanho total em bytes)
+    """
+    dtype = PRECISIONS[precision][1]
+    sections = [
+        ('mean', '<f4', (width,)),
+        ('component_scales', '<f4', (k_components,)),
+        ('score_scales', '<f4', (k_components,)),
+        ('components', dtype, (width, k_components)),
+        ('scores', dtype, (height, k_components)),
+    ]
+    offset = _HEADER.size
+    result = {}
+    for name, section_dtype, shape in sections:
+        offset = _align(offset)
+        result[name] = (offset, section_dtype, shape)
+        offset += int(np.prod(shape)) * np.dtype(section_dtype).itemsize
+    return result, offset
+
+
+def column_scales(values, precision):
+    """
+    Escala de quantização de cada coluna
+    :param values: array (linhas, k); pode ser um np.memmap (percorrido em blocos de linhas)
+    """
+    if precision != 'int8':
+        return np.ones(values.shape[1], dtype=np.float32)
+    peak = np.zeros(values.shape[1], dtype=np.float32)
+    for start in range(0, values.shape[0], ROWS_PER_CHUNK):
+        chunk = np.asarray(values[start:start + ROWS_PER_CHUNK], dtype=np.float32)
+        peak = np.maximum(peak, np.abs(chunk).max(axis=0, initial=0))
+    return np.where(peak > 0, peak / 127, 1).astype(np.float32)
+
+
+def quantize(values, scales, precision):
+    """
+    Converte valores float para a precisão do arquivo
+    """
+    dtype = PRECISIONS[precision][1]
+    if precision != 'int8':
+        return np.asarray(values, dtype=np.float32).astype(dtype)
+    return np.clip(np.rint(np.asarray(values, dtype=np.float32) / scales), -127, 127).astype(dtype)
+
+
+def write_pca_file(path, mean, components, scores, precision='int8'):
+    """
+    Grava os dados do PCA no formato PCAQ
+    :param mean: média de cada coluna da imagem (largura,)
+    :param components: componentes principais (largura, k)
+    :param scores: projeção das linhas nos componentes (altura, k); pode ser um np.memmap
+    :param precision: 'float32', 'float16' ou 'int8'
+    :return: tamanho do arquivo em bytes
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisão desconhecida: {precision!r} (use {', '.join(PRECISIONS)})")
+    width, k_components = components.shape
+    height = scores.shape[0]
+    sections, total_size = layout(height, width, k_components, precision)
+
+    component_scales = column_scales(components, precision)
+    score_scales = column_scales(scores, precision)
+    contents = {
+        'mean': np.asarray(mean, dtype='<f4'),
+        'component_scales': component_scales.astype('<f4'),
+        'score_scales': score_scales.astype('<f4'),
+        'components': quantize(components, component_scales, precision),
+    }
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, PRECISIONS[precision][0], 0, height, width, k_components))
+        for name, array in contents.items():
+            f.seek(sections[name][0])
+            f.write(array.tobytes())
+
+        # Scores em blocos de linhas: a versão quantizada nunca existe inteira na memória
+        f.seek(sections['scores'][0])
+        for start in range(0, height, ROWS_PER_CHUNK):
+            f.write(quantize(scores[start:start + ROWS_PER_CHUNK], score_scales, precision).tobytes())
+        f.truncate(total_size)
+    return total_size
+
+
+def read_pca_file(path):
+    """
+    Abre um arquivo PCAQ sem carregá-lo na memória
+    :return: dicionário com height, width, k_components, precision e as seções
+             (mean, component_scales, score_scales, components, scores) como np.memmap
+    """
+    with open(path, 'rb') as f:
+        magic, version, code, _, height, width, k_components = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Arquivo não está no formato PCAQ")
+    if version != VERSION:
+        raise ValueError(f"Versão {version} do formato PCAQ não suportada")
+    if code not in _PRECISION_NAMES:
+        raise ValueError(f"Precisão {code} do formato PCAQ não suportada")
+
+    precision = _PRECISION_NAMES[code]
+    sections, _ = layout(height, width, k_components, precision)
+    container = {'height': height, 'width': width, 'k_components': k_components, 'precision': precision}
+    for name, (offset, dtype, shape) in sections.items():
+        container[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    return container
+
+
+def reconstruct(container, rows=slice(None), cols=slice(None), n_components=None):
+    """
+    Reconstrói uma janela da imagem (valores em [0, 1]) a partir de um arquivo aberto
+
+    Só as linhas pedidas dos scores e as linhas dos componentes correspondentes
+    às colunas pedidas são lidas do disco: o custo depende do tamanho da janela
+    e de n_components, não do tamanho da imagem.
+
+    :param container: resultado de read_pca_file
+    :param rows: fatia das linhas da imagem
+    :param cols: fatia das colunas da imagem
+    :param n_components: usa só os primeiros componentes (padrão: todos); menos
+                         componentes dão uma prévia mais rápida e de menor qualidade
+    :return: array float32 (linhas, colunas)
+    """
+    n = container['k_components'] if n_components is None else n_components
+    if not 0 <= n <= container['k_components']:
+        raise ValueError(f"n_components deve estar entre 0 e {container['k_components']}, recebido {n}")
+    components = container['components'][cols, :n] * container['component_scales'][:n]
+    scores = container['scores'][rows, :n] * container['score_scales'][:n]
+    return np.clip(scores @ components.T + container['mean'][cols], 0, 1)